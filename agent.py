@@ -1,31 +1,247 @@
-from langchain_openai import ChatOpenAI
-from langchain.agents import initialize_agent
-from langchain.memory import ConversationBufferMemory
-from tools import tools, schedule_event
+from tools import schedule_event, serpapi_search
+from analysis import aanalyze_transcript, analyze_transcript
+from clients import get_calendar_service, get_chat_llm, get_openai_client
+from dates import extract_datetimes
+from tracing import in_current_context, record_llm_call, record_tool_call, span
+import asyncio
+import functools
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import re
+import threading
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Per-tool deadline for the async path; slower tools are reported as timed out
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "20"))
+
+# Tools run on their own pool rather than the loop's default executor, so
+# asyncio.run() does not wait on a timed-out tool before returning
+_tool_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_MAX_WORKERS", "8")), thread_name_prefix="tool")
+
+
+@functools.lru_cache(maxsize=None)
+def _tracing_callback_handler_class():
+    # Defined on first use so that importing this module does not import LangChain
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        """Records the ReAct agent's LLM round trips, token usage and tool calls."""
+
+        def on_llm_end(self, response, **kwargs):
+            usage = (response.llm_output or {}).get("token_usage", {})
+            record_llm_call(
+                (response.llm_output or {}).get("model_name", "unknown"),
+                usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0),
+                stage="react"
+            )
+
+        def on_tool_start(self, serialized, input_str, **kwargs):
+            record_tool_call((serialized or {}).get("name", "unknown"), "started")
+
+    return TracingCallbackHandler
+
+
+def __getattr__(name):
+    if name == "TracingCallbackHandler":
+        return _tracing_callback_handler_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class SalesCallAgent:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4-turbo-preview",
-            temperature=0.7,
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-        self.agent = initialize_agent(
-            tools=tools,
-            llm=self.llm,
-            agent="chat-conversational-react-description",
-            memory=self.memory,
-            verbose=True
-        )
+    def __init__(self, mode: str = None):
+        # "structured" runs one schema-constrained completion and then the tools;
+        # "react" runs the original multi-round-trip LangChain agent
+        self.mode = mode or os.getenv("AGENT_MODE", "structured")
+        if self.mode not in ("structured", "react"):
+            raise ValueError(f"Unknown agent mode: {self.mode}")
+        self._agent = None
+        self._agent_lock = threading.Lock()
+        # The agent's memory is per-call state, so runs on a shared agent are serialized
+        self._react_lock = threading.Lock()
+
+    @property
+    def agent(self):
+        """
+        The LangChain ReAct agent, built on first use (None in structured
+        mode). Building it imports LangChain, which takes about a second.
+        """
+        if self.mode != "react":
+            return None
+        with self._agent_lock:
+            if self._agent is None:
+                from langchain.agents import initialize_agent
+                from langchain.memory import ConversationBufferMemory
+                from tools import tools
+                self.llm = get_chat_llm()
+                self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+                self._agent = initialize_agent(
+                    tools=tools,
+                    llm=self.llm,
+                    agent="chat-conversational-react-description",
+                    memory=self.memory,
+                    verbose=os.getenv("AGENT_VERBOSE", "0") == "1"
+                )
+            return self._agent
+
+    def warmup(self):
+        """
+        Load everything the first call would otherwise wait for: the API
+        clients, the ReAct agent in react mode, and the tools' lazily imported
+        dependencies. Safe to call more than once, and from a background thread.
+        """
+        with span("agent.warmup", mode=self.mode):
+            get_openai_client()
+            if self.mode == "react":
+                self.agent  # noqa: B018
+            from serpapi import GoogleSearch  # noqa: F401
+            try:
+                get_calendar_service()
+            except Exception:
+                # No token.json yet; scheduling reports the problem when it is first used
+                pass
 
     def process_transcription(self, transcription: str) -> dict:
+        """
+        Analyze the transcription and run the calendar and web search tools it calls for.
+        Returns a dict with keys: summary, action_items, calendar, web_search
+        """
+        with span("agent", mode=self.mode):
+            if self.mode == "react":
+                self.agent  # noqa: B018
+                with self._react_lock:
+                    self.memory.clear()
+                    return self._process_with_react_agent(transcription)
+            try:
+                analysis = analyze_transcript(transcription)
+                return self.run_tools(analysis)
+            except Exception as e:
+                raise Exception(f"Failed to process transcription: {str(e)}")
+
+    def _tool_calls(self, analysis: dict) -> list:
+        """List the (section, label, function, args) tool calls a structured analysis asks for."""
+        calls = [
+            ("calendar", meeting["title"], schedule_event,
+             (meeting["title"], meeting["start_time"], meeting.get("duration_minutes") or 30))
+            for meeting in analysis.get("meetings", [])
+        ]
+        calls += [
+            ("web_search", query, serpapi_search, (query,))
+            for query in analysis.get("search_queries", [])
+        ]
+        return calls
+
+    def _assemble_output(self, analysis: dict, calls: list, results: list) -> dict:
+        """Combine the analysis and tool results into the output dict."""
+        calendar_results = [result for (section, _, _, _), result in zip(calls, results) if section == "calendar"]
+        search_results = [
+            f"{label}:\n{result}"
+            for (section, label, _, _), result in zip(calls, results) if section == "web_search"
+        ]
+        return {
+            "summary": analysis.get("summary", ""),
+            "action_items": analysis.get("action_items", []),
+            "calendar": "\n".join(calendar_results),
+            "web_search": "\n\n".join(search_results),
+            "analysis": analysis
+        }
+
+    def run_tools(self, analysis: dict) -> dict:
+        """
+        Deterministically run the tools requested by a structured analysis.
+        Returns a dict with keys: summary, action_items, calendar, web_search, analysis
+        """
+        calls = self._tool_calls(analysis)
+        results = [func(*args) for _, _, func, args in calls]
+        return self._assemble_output(analysis, calls, results)
+
+    async def _arun_tool(self, section: str, label: str, func, args: tuple, timeout: float):
+        """
+        Run one blocking tool in a worker thread, bounded by timeout.
+        The thread cannot be cancelled, so a calendar call that times out may
+        still create its event; it is reported as pending, not failed.
+        Returns (result, timed_out)
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            call = loop.run_in_executor(_tool_executor, in_current_context(functools.partial(func, *args)))
+            return await asyncio.wait_for(call, timeout), False
+        except asyncio.TimeoutError:
+            if section == "calendar":
+                return (f"Event creation pending: '{label}' did not finish within {timeout:g}s and may still be created. "
+                        "Scheduling it again will not create a duplicate."), True
+            return f"Search timed out after {timeout:g}s", True
+        except Exception as e:
+            if section == "calendar":
+                return f"Failed to create event: {e}", False
+            return f"Search failed: {e}", False
+
+    async def arun_tools(self, analysis: dict, tool_timeout: float = None, on_update=None) -> dict:
+        """
+        Run every tool requested by a structured analysis concurrently.
+        Each call gets its own timeout; slow or failing tools are reported in
+        place of their result instead of failing the whole call.
+        on_update(section, value), if given, is called with the calendar or
+        web_search section so far each time one of its tools finishes.
+        Returns the same dict as run_tools, plus timed_out: the tool calls that hit their deadline
+        """
+        timeout = tool_timeout or TOOL_TIMEOUT_SECONDS
+        calls = self._tool_calls(analysis)
+        outcomes = [None] * len(calls)
+
+        async def run(index, section, label, func, args):
+            outcomes[index] = await self._arun_tool(section, label, func, args, timeout)
+            if on_update:
+                finished = [(call, outcome[0]) for call, outcome in zip(calls, outcomes) if outcome is not None]
+                partial = self._assemble_output(analysis, [call for call, _ in finished], [result for _, result in finished])
+                on_update(section, partial[section])
+
+        await asyncio.gather(*(run(index, *call) for index, call in enumerate(calls)))
+        output = self._assemble_output(analysis, calls, [result for result, _ in outcomes])
+        output["timed_out"] = [
+            f"{section}: {label}"
+            for (section, label, _, _), (_, timed_out) in zip(calls, outcomes) if timed_out
+        ]
+        return output
+
+    async def aprocess_transcription(self, transcription: str, tool_timeout: float = None, on_update=None) -> dict:
+        """
+        Async version of process_transcription that fans out tool calls concurrently,
+        so total tool latency is that of the slowest tool rather than the sum.
+
+        on_update(section, value), if given, streams results as they are
+        produced, on the event loop's thread: "summary" as its tokens arrive,
+        "action_items" once the analysis is done, then "calendar" and
+        "web_search" independently as their tools return.
+        Returns a dict with keys: summary, action_items, calendar, web_search, analysis, timed_out
+        """
+        if self.mode == "react":
+            output = await asyncio.to_thread(self.process_transcription, transcription)
+            if on_update:
+                for section in ("summary", "action_items", "calendar", "web_search"):
+                    on_update(section, output.get(section))
+            return output
+        with span("agent", mode=self.mode):
+            try:
+                if on_update:
+                    analysis = await aanalyze_transcript(
+                        transcription, on_summary=lambda summary: on_update("summary", summary)
+                    )
+                else:
+                    analysis = await aanalyze_transcript(transcription)
+            except Exception as e:
+                raise Exception(f"Failed to process transcription: {str(e)}")
+            if on_update:
+                on_update("summary", analysis.get("summary", ""))
+                on_update("action_items", analysis.get("action_items", []))
+            return await self.arun_tools(analysis, tool_timeout, on_update)
+
+    def _process_with_react_agent(self, transcription: str) -> dict:
         """
         Process the transcription and let the agent use tools to generate summary, action items, and take actions.
         Returns a dict with keys: summary, action_items, calendar, web_search
@@ -63,7 +279,7 @@ class SalesCallAgent:
                 Here is the transcription:
                 """ + transcription
             )
-            result = self.agent.run(prompt)
+            result = self.agent.run(prompt, callbacks=[_tracing_callback_handler_class()()])
             
             # Parse the result into sections
             output = {"summary": "", "action_items": [], "calendar": "", "web_search": ""}
@@ -90,11 +306,11 @@ class SalesCallAgent:
             # Additional calendar processing if needed
             cal_output = output.get("calendar", "")
             if cal_output and "Event created:" not in cal_output and "http" not in cal_output:
-                # Try to extract date and summary
-                date_match = re.search(r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})", cal_output)
-                if date_match:
-                    start_time = date_match.group(1)
-                    summary = cal_output.split(start_time)[0].strip()
+                # Take the first date/time mentioned (ISO or spoken) and the text before it as the summary
+                mentions = extract_datetimes(cal_output)
+                if mentions:
+                    start_time = mentions[0].value.isoformat()
+                    summary = cal_output[:mentions[0].start].strip(" :-,")
                     if not summary:
                         summary = "Follow-up Meeting"
                     # Schedule the event
@@ -103,4 +319,46 @@ class SalesCallAgent:
 
             return output
         except Exception as e:
-            raise Exception(f"Failed to process transcription with agent: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Failed to process transcription with agent: {str(e)}")
+
+
+_agents = {}
+_agents_lock = threading.Lock()
+
+
+def get_sales_agent(mode: str = None) -> SalesCallAgent:
+    """
+    Return the process-wide SalesCallAgent for mode, so Streamlit reruns and
+    worker threads reuse one agent instead of rebuilding it per call.
+    """
+    mode = mode or os.getenv("AGENT_MODE", "structured")
+    with _agents_lock:
+        if mode not in _agents:
+            _agents[mode] = SalesCallAgent(mode=mode)
+        return _agents[mode]
+
+
+def warmup(mode: str = None, background: bool = False):
+    """
+    Warm up the shared agent for mode (see SalesCallAgent.warmup), so the
+    first call does not pay for imports and client setup.
+
+    Args:
+        mode (str, optional): Agent mode; defaults to AGENT_MODE
+        background (bool): Warm up on a daemon thread and return immediately
+
+    Returns:
+        threading.Thread or None: The warm-up thread when background is set
+    """
+    def run():
+        try:
+            get_sales_agent(mode).warmup()
+        except Exception as e:
+            logger.warning("Agent warm-up failed: %s", e)
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="agent-warmup", daemon=True)
+    thread.start()
+    return thread
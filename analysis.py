@@ -0,0 +1,395 @@
+import asyncio
+import functools
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dotenv import load_dotenv
+from clients import get_async_openai_client, get_openai_client
+from ratelimit import get_limiter
+from tracing import in_current_context, record_llm_response, span
+
+# Load environment variables
+load_dotenv()
+
+# Needs a model that supports json_schema structured outputs
+ANALYSIS_MODEL = os.getenv("ANALYSIS_MODEL", "gpt-4o-mini")
+
+# Transcripts above this many tokens are analyzed map-reduce style in windows
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("MAP_REDUCE_THRESHOLD_TOKENS", "12000"))
+MAP_CHUNK_TOKENS = int(os.getenv("MAP_CHUNK_TOKENS", "4000"))
+MAP_MAX_WORKERS = int(os.getenv("MAP_MAX_WORKERS", "8"))
+
+ANALYSIS_SCHEMA = {
+    "name": "sales_call_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "summary": {
+                "type": "string",
+                "description": "Concise executive summary of the call."
+            },
+            "action_items": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Specific, self-contained follow-up tasks."
+            },
+            "meetings": {
+                "type": "array",
+                "description": "Meetings, demos or follow-ups that were agreed or are needed.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "title": {"type": "string"},
+                        "start_time": {
+                            "type": "string",
+                            "description": "ISO 8601 local date time, e.g. 2025-06-26T14:00:00, or the spoken phrase if it cannot be resolved."
+                        },
+                        "duration_minutes": {"type": "integer"}
+                    },
+                    "required": ["title", "start_time", "duration_minutes"],
+                    "additionalProperties": False
+                }
+            },
+            "search_queries": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Web searches about competitors, products or market trends mentioned on the call."
+            }
+        },
+        "required": ["summary", "action_items", "meetings", "search_queries"],
+        "additionalProperties": False
+    }
+}
+
+ANALYSIS_PROMPT = """
+You are an expert AI sales assistant. Analyze the sales call transcription you are given and return:
+1. summary: a concise executive summary
+2. action_items: a list of specific action items
+3. meetings: every meeting, demo or follow-up that is mentioned or needed. Resolve relative dates
+   against today's date ({today}) and give start_time as YYYY-MM-DDTHH:MM:SS. Default duration is 30 minutes.
+4. search_queries: short web search queries for any competitor, product or market trend that is mentioned.
+   Leave the list empty if nothing is worth looking up.
+"""
+
+
+MAP_PROMPT_SUFFIX = """
+You are seeing part {part} of {parts} of a longer call. Only report what is in this part;
+the summary should cover this part alone.
+"""
+
+REDUCE_PROMPT = """
+You are an expert AI sales assistant. Below are summaries of consecutive parts of one sales call.
+Merge them into a single concise executive summary of the whole call. Return only the summary text.
+"""
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+# The summary value in a possibly incomplete JSON analysis, up to the last complete escape
+PARTIAL_SUMMARY = re.compile(r'"summary"\s*:\s*"((?:[^"\\]|\\.)*)')
+INCOMPLETE_UNICODE_ESCAPE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+WORD_CHARS = re.compile(r"[a-z0-9]+")
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    """Return the tiktoken encoding for model, or None if unavailable."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken missing, or its BPE files cannot be fetched
+        return None
+
+
+def count_tokens(text, model=None):
+    """
+    Count tokens in text for model, approximating with 4 characters per
+    token when tiktoken is unavailable.
+    """
+    encoding = _encoding(model or ANALYSIS_MODEL)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def chunk_transcript(transcription, max_tokens=None, model=None):
+    """
+    Split a transcript into windows of at most max_tokens, breaking on
+    sentence boundaries where possible.
+
+    Args:
+        transcription (str): Call transcript
+        max_tokens (int, optional): Token budget per window
+        model (str, optional): Model whose tokenizer is used for counting
+
+    Returns:
+        list: Transcript windows in order
+    """
+    max_tokens = max_tokens or MAP_CHUNK_TOKENS
+    chunks, current, current_tokens = [], [], 0
+    for sentence in SENTENCE_BOUNDARY.split(transcription):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        tokens = count_tokens(sentence, model)
+        if tokens > max_tokens:
+            # A single run-on "sentence" longer than the window: split on words
+            words = sentence.split()
+            step = max(1, len(words) * max_tokens // tokens)
+            pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        else:
+            pieces = [sentence]
+        for piece in pieces:
+            piece_tokens = count_tokens(piece, model) if len(pieces) > 1 else tokens
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _normalize(text):
+    return " ".join(WORD_CHARS.findall(text.lower()))
+
+
+def _dedupe(items, key):
+    """Keep the first item for each normalized key, preserving order."""
+    seen, unique = set(), []
+    for item in items:
+        item_key = key(item)
+        if item_key and item_key not in seen:
+            seen.add(item_key)
+            unique.append(item)
+    return unique
+
+
+def _meeting_key(meeting):
+    """Two meetings can share a time slot, so a meeting is its time and title; the title alone when it has no time."""
+    start_time, title = meeting["start_time"].strip(), _normalize(meeting["title"])
+    return (start_time, title) if start_time or title else None
+
+
+def merge_partial_analyses(partials, summary):
+    """
+    Merge per-window analyses into one result, deduplicating action items,
+    meetings and search queries across windows.
+
+    Args:
+        partials (list): Per-window results matching ANALYSIS_SCHEMA
+        summary (str): Reduced summary of the whole call
+
+    Returns:
+        dict: Merged result matching ANALYSIS_SCHEMA
+    """
+    return {
+        "summary": summary,
+        "action_items": _dedupe(
+            [item for partial in partials for item in partial["action_items"]],
+            _normalize
+        ),
+        "meetings": _dedupe(
+            [meeting for partial in partials for meeting in partial["meetings"]],
+            _meeting_key
+        ),
+        "search_queries": _dedupe(
+            [query for partial in partials for query in partial["search_queries"]],
+            # Word order and casing do not change what a search finds
+            lambda query: " ".join(sorted(_normalize(query).split()))
+        ),
+    }
+
+
+def _analysis_request(transcription, model=None, part=None, parts=None):
+    """Build the keyword arguments for the analysis completion."""
+    prompt = ANALYSIS_PROMPT.format(today=datetime.now().strftime("%A %Y-%m-%d"))
+    if parts and parts > 1:
+        prompt += MAP_PROMPT_SUFFIX.format(part=part, parts=parts)
+    return {
+        "model": model or ANALYSIS_MODEL,
+        "temperature": 0,
+        "response_format": {"type": "json_schema", "json_schema": ANALYSIS_SCHEMA},
+        "messages": [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": transcription}
+        ]
+    }
+
+
+def _reduce_request(partials, model=None):
+    """Build the keyword arguments for the summary reduce completion."""
+    summaries = "\n\n".join(
+        f"Part {i}: {partial['summary']}" for i, partial in enumerate(partials, 1)
+    )
+    return {
+        "model": model or ANALYSIS_MODEL,
+        "temperature": 0,
+        "messages": [
+            {"role": "system", "content": REDUCE_PROMPT},
+            {"role": "user", "content": summaries}
+        ]
+    }
+
+
+def partial_summary(content):
+    """
+    Decode as much of the summary as has arrived in a streamed JSON analysis.
+    The schema lists summary first, so it streams before the other fields.
+    """
+    match = PARTIAL_SUMMARY.search(content)
+    if not match:
+        return ""
+    raw = INCOMPLETE_UNICODE_ESCAPE.sub("", match.group(1))
+    try:
+        return json.loads(f'"{raw}"')
+    except ValueError:
+        return ""
+
+
+def _parse_analysis(response):
+    """Decode the structured result from a chat completion response."""
+    message = response.choices[0].message
+    if getattr(message, "refusal", None):
+        raise ValueError(f"Analysis refused: {message.refusal}")
+    return json.loads(message.content)
+
+
+def _complete(client, request, stage="analysis"):
+    """Send a chat completion through the shared OpenAI rate limiter, recording usage."""
+    with span(f"llm.{stage}", model=request["model"]):
+        response = get_limiter("openai").call(client.chat.completions.create, **request)
+        record_llm_response(response, stage)
+    return response
+
+
+async def _acomplete(client, request, stage="analysis"):
+    """Async version of _complete."""
+    with span(f"llm.{stage}", model=request["model"]):
+        response = await get_limiter("openai").acall(client.chat.completions.create, **request)
+        record_llm_response(response, stage)
+    return response
+
+
+async def _astream(client, request, stage, on_text):
+    """
+    Stream a chat completion through the shared OpenAI rate limiter, calling
+    on_text with the accumulated content as each token arrives.
+
+    Returns:
+        str: The complete message content
+    """
+    with span(f"llm.{stage}", model=request["model"], streamed=True) as s:
+        started = time.perf_counter()
+        # The concurrency slot is held until the whole stream has been read
+        async with get_limiter("openai").ahold(
+            client.chat.completions.create,
+            stream=True,
+            stream_options={"include_usage": True},
+            **request
+        ) as stream:
+            content, refusal = "", ""
+            async for chunk in stream:
+                # The final chunk has no choices, only usage
+                if chunk.usage:
+                    record_llm_response(chunk, stage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                refusal += getattr(delta, "refusal", None) or ""
+                if delta.content:
+                    if not content:
+                        s.set(first_token_seconds=round(time.perf_counter() - started, 3))
+                    content += delta.content
+                    on_text(content)
+    if refusal:
+        raise ValueError(f"Analysis refused: {refusal}")
+    return content
+
+
+def analyze_transcript(transcription, client=None, model=None):
+    """
+    Extract summary, action items, meetings and search queries from a call
+    in a single JSON-schema-constrained completion.
+
+    Transcripts longer than MAP_REDUCE_THRESHOLD_TOKENS are split into windows
+    that are analyzed in parallel, then merged with one reduce completion.
+
+    Args:
+        transcription (str): Call transcript
+        client (OpenAI, optional): Client to use
+        model (str, optional): Chat model; defaults to ANALYSIS_MODEL
+
+    Returns:
+        dict: Parsed result matching ANALYSIS_SCHEMA
+    """
+    client = client or get_openai_client()
+    if count_tokens(transcription, model) <= MAP_REDUCE_THRESHOLD_TOKENS:
+        response = _complete(client, _analysis_request(transcription, model))
+        return _parse_analysis(response)
+
+    chunks = chunk_transcript(transcription, model=model)
+
+    def analyze_chunk(indexed_chunk):
+        part, chunk = indexed_chunk
+        response = _complete(client, _analysis_request(chunk, model, part, len(chunks)), "map")
+        return _parse_analysis(response)
+
+    with ThreadPoolExecutor(max_workers=MAP_MAX_WORKERS) as pool:
+        partials = list(pool.map(in_current_context(analyze_chunk), enumerate(chunks, 1)))
+    response = _complete(client, _reduce_request(partials, model), "reduce")
+    return merge_partial_analyses(partials, response.choices[0].message.content.strip())
+
+
+async def aanalyze_transcript(transcription, client=None, model=None, on_summary=None):
+    """
+    Async version of analyze_transcript.
+
+    Args:
+        transcription (str): Call transcript
+        client (AsyncOpenAI, optional): Client to use
+        model (str, optional): Chat model; defaults to ANALYSIS_MODEL
+        on_summary (callable, optional): Stream the summary: called with the
+            summary text so far each time it grows
+
+    Returns:
+        dict: Parsed result matching ANALYSIS_SCHEMA
+    """
+    client = client or get_async_openai_client()
+    if count_tokens(transcription, model) <= MAP_REDUCE_THRESHOLD_TOKENS:
+        if on_summary is None:
+            response = await _acomplete(client, _analysis_request(transcription, model))
+            return _parse_analysis(response)
+        shown = [""]
+
+        def on_text(content):
+            summary = partial_summary(content)
+            if summary != shown[0]:
+                shown[0] = summary
+                on_summary(summary)
+
+        content = await _astream(client, _analysis_request(transcription, model), "analysis", on_text)
+        return json.loads(content)
+
+    chunks = chunk_transcript(transcription, model=model)
+    semaphore = asyncio.Semaphore(MAP_MAX_WORKERS)
+
+    async def analyze_chunk(part, chunk):
+        async with semaphore:
+            response = await _acomplete(client, _analysis_request(chunk, model, part, len(chunks)), "map")
+        return _parse_analysis(response)
+
+    partials = await asyncio.gather(*(analyze_chunk(part, chunk) for part, chunk in enumerate(chunks, 1)))
+    if on_summary is None:
+        response = await _acomplete(client, _reduce_request(partials, model), "reduce")
+        return merge_partial_analyses(partials, response.choices[0].message.content.strip())
+    # The reduce step returns plain text, so its tokens stream straight through
+    summary = await _astream(client, _reduce_request(partials, model), "reduce", on_summary)
+    return merge_partial_analyses(partials, summary.strip())
@@ -2,12 +2,39 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from transcriber import transcribe_audio
-from agent import SalesCallAgent
-import tempfile
+from agent import get_sales_agent, warmup
+from archive import archive_call
+from clients import run_async, submit_async
+from similarity import index_call_in_background, similar_calls
+from tracing import span, start_metrics_server
+from uploads import UploadTooLarge, remove_file, save_upload
+import queue
+import re
 
 # Load environment variables
 load_dotenv()
 
+# Show each section as soon as its results arrive instead of after the whole run.
+# Off by default: streaming transcribes in 30 second chunks, which is slower
+# than one request for the whole recording.
+STREAM_RESULTS = os.getenv("STREAM_RESULTS", "0") == "1"
+
+# Load the agent's dependencies and clients in the background while the page renders
+WARMUP = os.getenv("WARMUP", "1") != "0"
+
+# Expose Prometheus metrics alongside the UI when configured
+if os.getenv("METRICS_PORT"):
+    start_metrics_server()
+
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    """Warm up the agent once per server process, not on every rerun."""
+    return warmup(background=True)
+
+
+if WARMUP:
+    start_warmup()
+
 # Set page config
 st.set_page_config(
     page_title="AI Sales Call Assistant",
@@ -70,6 +97,7 @@ with st.sidebar:
     
     **Upload an MP3 file to get started!**
     """)
+    stream_results = st.toggle("Stream results as they arrive", value=STREAM_RESULTS)
 
 # Initialize session state
 if 'transcription' not in st.session_state:
@@ -82,6 +110,113 @@ if 'calendar' not in st.session_state:
     st.session_state.calendar = None
 if 'web_search' not in st.session_state:
     st.session_state.web_search = None
+if 'similar_calls' not in st.session_state:
+    st.session_state.similar_calls = None
+if 'indexing' not in st.session_state:
+    # (call_id, future) while the finished call is being embedded
+    st.session_state.indexing = None
+if 'processed_upload' not in st.session_state:
+    st.session_state.processed_upload = None
+
+def render_calendar(cal_result):
+    """Render the calendar tool's result."""
+    if "Event created:" in cal_result and "http" in cal_result:
+        # Extract the link
+        match = re.search(r"(https?://[\w./?=&%-]+)", cal_result)
+        if match:
+            link = match.group(1)
+            st.success(f"Meeting scheduled! [View in Google Calendar]({link})")
+        else:
+            st.success(cal_result)
+    elif "Failed to create event" in cal_result:
+        st.error(cal_result)
+    elif "Event creation pending" in cal_result:
+        st.warning(cal_result)
+    else:
+        st.info(cal_result)
+
+
+def render_web_search(ws_result):
+    """Render the web search tool's results."""
+    # Try to extract URLs and titles if present
+    urls = re.findall(r"(https?://[\w./?=&%-]+)", ws_result)
+    if urls:
+        st.markdown('<div class="summary-box"><b>Top Results:</b><ul>', unsafe_allow_html=True)
+        for url in urls:
+            st.markdown(f'<li><a href="{url}" target="_blank">{url}</a></li>', unsafe_allow_html=True)
+        st.markdown('</ul></div>', unsafe_allow_html=True)
+    else:
+        # Try to extract a web search section from the agent output
+        match = re.search(r'Web Search:(.*?)(?:\n\n|$)', ws_result, re.DOTALL)
+        if match:
+            st.markdown(f'<div class="summary-box">{match.group(1).strip()}</div>', unsafe_allow_html=True)
+        else:
+            st.markdown(f'<div class="summary-box">{ws_result}</div>', unsafe_allow_html=True)
+
+
+def process_streaming(audio_file_path):
+    """
+    Transcribe and analyze a call, filling in each section as soon as its
+    results arrive: transcript chunks, then summary tokens, then the calendar
+    and web search results as each tool returns. The live view is cleared at
+    the end so the results render as usual.
+    """
+    live = st.empty()
+    with live.container():
+        status = st.empty()
+        sections = {name: st.empty() for name in ("transcription", "summary", "action_items", "calendar", "web_search")}
+    titles = {
+        "transcription": "📝 Transcription",
+        "summary": "📊 Executive Summary",
+        "action_items": "✅ Action Items",
+        "calendar": "📅 Calendar",
+        "web_search": "🌐 Web Search",
+    }
+
+    def show(section, value):
+        if not value:
+            return
+        with sections[section].container():
+            st.markdown(f'<div class="section-title">{titles[section]}</div>', unsafe_allow_html=True)
+            if section == "transcription":
+                st.write(value)
+            elif section == "summary":
+                st.markdown(f'<div class="summary-box">{value}</div>', unsafe_allow_html=True)
+            elif section == "action_items":
+                st.markdown("\n".join(f"- {item}" for item in value))
+            elif section == "calendar":
+                render_calendar(value)
+            else:
+                render_web_search(value)
+
+    pieces = []
+
+    def on_chunk(text, segments):
+        pieces.append(text)
+        show("transcription", " ".join(piece for piece in pieces if piece))
+
+    status.caption("Transcribing audio...")
+    transcription = transcribe_audio(audio_file_path, on_chunk=on_chunk)
+    st.session_state.transcription = transcription
+    show("transcription", transcription)
+
+    status.caption("Analyzing call content...")
+    agent = get_sales_agent()
+    updates = queue.Queue()
+    future = submit_async(agent.aprocess_transcription(transcription, on_update=lambda *update: updates.put(update)))
+    # Streamlit elements can only be updated from the script thread, not the event loop's
+    while not (future.done() and updates.empty()):
+        try:
+            show(*updates.get(timeout=0.1))
+        except queue.Empty:
+            pass
+    agent_output = future.result()
+    st.session_state.summary = agent_output.get('summary', '')
+    st.session_state.action_items = agent_output.get('action_items', [])
+    st.session_state.calendar = agent_output.get('calendar', '')
+    st.session_state.web_search = agent_output.get('web_search', '')
+    live.empty()
+
 
 def main():
     # Only render the main content container if there is content or always for the main UI
@@ -101,33 +236,58 @@ def main():
     # File uploader with clear label
     uploaded_file = st.file_uploader("Upload an MP3 file", type=['mp3'])
 
+    # The widget keeps the file across reruns (e.g. ticking an action item), so process each upload once
+    upload_key = None
     if uploaded_file is not None:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_file_path = tmp_file.name
+        upload_key = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    if uploaded_file is not None and upload_key != st.session_state.processed_upload:
+        st.session_state.similar_calls = None
+        with span("call", filename=uploaded_file.name, bytes=uploaded_file.size):
+            # Stream the upload to a temporary file in chunks rather than copying it whole
+            try:
+                with span("upload"):
+                    uploaded_file.seek(0)
+                    tmp_file_path = save_upload(uploaded_file, suffix='.mp3')
+            except UploadTooLarge as e:
+                st.error(str(e))
+                return
 
-        try:
-            with st.spinner('Transcribing audio...'):
-                # Transcribe audio
-                transcription = transcribe_audio(tmp_file_path)
-                st.session_state.transcription = transcription
-
-            # Initialize agent and process transcription
-            with st.spinner('Analyzing call content...'):
-                agent = SalesCallAgent()
-                agent_output = agent.process_transcription(transcription)
-                st.session_state.summary = agent_output.get('summary', '')
-                st.session_state.action_items = agent_output.get('action_items', [])
-                st.session_state.calendar = agent_output.get('calendar', '')
-                st.session_state.web_search = agent_output.get('web_search', '')
-
-            # Clean up temporary file
-            os.unlink(tmp_file_path)
-
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
-            return
+            try:
+                if stream_results:
+                    process_streaming(tmp_file_path)
+                else:
+                    with st.spinner('Transcribing audio...'):
+                        # Transcribe audio
+                        transcription = transcribe_audio(tmp_file_path)
+                        st.session_state.transcription = transcription
+
+                    # Initialize agent and process transcription
+                    with st.spinner('Analyzing call content...'):
+                        agent = get_sales_agent()
+                        agent_output = run_async(agent.aprocess_transcription(transcription))
+                        st.session_state.summary = agent_output.get('summary', '')
+                        st.session_state.action_items = agent_output.get('action_items', [])
+                        st.session_state.calendar = agent_output.get('calendar', '')
+                        st.session_state.web_search = agent_output.get('web_search', '')
+
+                # Keep the call searchable after the session ends
+                result = {
+                    "transcription": st.session_state.transcription,
+                    "summary": st.session_state.summary,
+                    "action_items": st.session_state.action_items,
+                    "calendar": st.session_state.calendar,
+                    "web_search": st.session_state.web_search,
+                }
+                call_id = archive_call(result, tmp_file_path, filename=uploaded_file.name)
+                st.session_state.indexing = (call_id, index_call_in_background(call_id, result))
+                st.session_state.processed_upload = upload_key
+
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
+                return
+            finally:
+                # Clean up temporary file, even when processing failed
+                remove_file(tmp_file_path)
 
     # Divider for results (only if there is any result)
     if (
@@ -155,7 +315,6 @@ def main():
         action_items = st.session_state.action_items
         # If action_items is a single string, split by numbering or newlines
         if isinstance(action_items, str):
-            import re
             # Split by numbered list or newlines
             items = re.split(r'\d+\.\s+', action_items)
             items = [item.strip() for item in items if item.strip()]
@@ -168,40 +327,30 @@ def main():
     # Only render Calendar section if there is content
     if st.session_state.calendar:
         st.markdown('<div class="section-title">📅 Calendar</div>', unsafe_allow_html=True)
-        cal_result = st.session_state.calendar
-        if "Event created:" in cal_result and "http" in cal_result:
-            # Extract the link
-            import re
-            match = re.search(r"(https?://[\w./?=&%-]+)", cal_result)
-            if match:
-                link = match.group(1)
-                st.success(f"Meeting scheduled! [View in Google Calendar]({link})")
-            else:
-                st.success(cal_result)
-        elif "Failed to create event" in cal_result:
-            st.error(cal_result)
-        else:
-            st.info(cal_result)
+        render_calendar(st.session_state.calendar)
 
     # Only render Web Search section if there is content
     if st.session_state.web_search:
         st.markdown('<div class="section-title">🌐 Web Search</div>', unsafe_allow_html=True)
-        ws_result = st.session_state.web_search
-        import re
-        # Try to extract URLs and titles if present
-        urls = re.findall(r"(https?://[\w./?=&%-]+)", ws_result)
-        if urls:
-            st.markdown('<div class="summary-box"><b>Top Results:</b><ul>', unsafe_allow_html=True)
-            for url in urls:
-                st.markdown(f'<li><a href="{url}" target="_blank">{url}</a></li>', unsafe_allow_html=True)
-            st.markdown('</ul></div>', unsafe_allow_html=True)
+        render_web_search(st.session_state.web_search)
+
+    # Similar calls are looked up once the background indexing has finished
+    if st.session_state.indexing is not None:
+        call_id, future = st.session_state.indexing
+        if future.done():
+            st.session_state.indexing = None
+            if future.result():
+                st.session_state.similar_calls = similar_calls(call_id)
         else:
-            # Try to extract a web search section from the agent output
-            match = re.search(r'Web Search:(.*?)(?:\n\n|$)', ws_result, re.DOTALL)
-            if match:
-                st.markdown(f'<div class="summary-box">{match.group(1).strip()}</div>', unsafe_allow_html=True)
-            else:
-                st.markdown(f'<div class="summary-box">{ws_result}</div>', unsafe_allow_html=True)
+            st.caption("Finding similar past calls...")
+            st.button("Refresh similar calls")
+
+    # Only render Similar Calls section if there is content
+    if st.session_state.similar_calls:
+        st.markdown('<div class="section-title">🔁 Similar Past Calls</div>', unsafe_allow_html=True)
+        for call in st.session_state.similar_calls:
+            st.markdown(f"**{call['filename'] or 'Call'}** ({call['score']:.0%} similar)")
+            st.caption(call["summary"])
 
     st.markdown('</div>', unsafe_allow_html=True)
 
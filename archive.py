@@ -0,0 +1,262 @@
+"""
+Persistent archive of processed calls with full-text search.
+
+Each call's transcript, summary, action items, calendar and web search
+results are stored in SQLite. An FTS5 index over the text fields is kept
+up to date by triggers, so every insert is searchable immediately and
+keyword searches across tens of thousands of calls take milliseconds.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from cache import hash_audio_file
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TERMS = re.compile(r"\w+", re.UNICODE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    filename TEXT NOT NULL DEFAULT '',
+    audio_key TEXT UNIQUE,
+    transcription TEXT NOT NULL DEFAULT '',
+    summary TEXT NOT NULL DEFAULT '',
+    action_items TEXT NOT NULL DEFAULT '[]',
+    calendar TEXT NOT NULL DEFAULT '',
+    web_search TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS calls_created_at ON calls (created_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS calls_fts USING fts5(
+    filename, transcription, summary, action_items, calendar, web_search,
+    content='calls', content_rowid='id', tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS calls_ai AFTER INSERT ON calls BEGIN
+    INSERT INTO calls_fts (rowid, filename, transcription, summary, action_items, calendar, web_search)
+    VALUES (new.id, new.filename, new.transcription, new.summary, new.action_items, new.calendar, new.web_search);
+END;
+CREATE TRIGGER IF NOT EXISTS calls_ad AFTER DELETE ON calls BEGIN
+    INSERT INTO calls_fts (calls_fts, rowid, filename, transcription, summary, action_items, calendar, web_search)
+    VALUES ('delete', old.id, old.filename, old.transcription, old.summary, old.action_items, old.calendar, old.web_search);
+END;
+CREATE TRIGGER IF NOT EXISTS calls_au AFTER UPDATE ON calls BEGIN
+    INSERT INTO calls_fts (calls_fts, rowid, filename, transcription, summary, action_items, calendar, web_search)
+    VALUES ('delete', old.id, old.filename, old.transcription, old.summary, old.action_items, old.calendar, old.web_search);
+    INSERT INTO calls_fts (rowid, filename, transcription, summary, action_items, calendar, web_search)
+    VALUES (new.id, new.filename, new.transcription, new.summary, new.action_items, new.calendar, new.web_search);
+END;
+"""
+
+# Re-processing a recording (a Streamlit rerun, a batch retry) updates its row instead of adding another
+UPSERT = """
+INSERT INTO calls (created_at, filename, audio_key, transcription, summary, action_items, calendar, web_search)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (audio_key) DO UPDATE SET
+    created_at = excluded.created_at, filename = excluded.filename,
+    transcription = excluded.transcription, summary = excluded.summary,
+    action_items = excluded.action_items, calendar = excluded.calendar, web_search = excluded.web_search
+RETURNING id
+"""
+
+COLUMNS = "id, created_at, filename, transcription, summary, action_items, calendar, web_search"
+
+
+def fts_query(text):
+    """
+    Turn free text into an FTS5 query that matches calls containing every
+    word. Words are quoted, so punctuation and FTS operators in the input
+    cannot cause syntax errors; the last word also matches as a prefix.
+    """
+    terms = SEARCH_TERMS.findall(text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class CallArchive:
+    """
+    SQLite store of processed calls with an FTS5 index. One connection is
+    shared by all threads behind a lock; WAL mode lets other processes (the
+    archive page, batch jobs) read while a call is being written.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def _row(self, result, filename=None, audio_key=None, created_at=None):
+        return (
+            created_at or time.time(),
+            filename or "",
+            audio_key,
+            result.get("transcription") or "",
+            result.get("summary") or "",
+            json.dumps(result.get("action_items") or []),
+            result.get("calendar") or "",
+            result.get("web_search") or "",
+        )
+
+    def add(self, result, filename=None, audio_key=None, created_at=None):
+        """
+        Store one processed call.
+
+        Args:
+            result (dict): Pipeline output with transcription, summary,
+                action_items, calendar and web_search
+            filename (str, optional): Original recording name
+            audio_key (str, optional): Content hash of the recording; a call
+                with the same key replaces the earlier entry
+            created_at (float, optional): Unix time; defaults to now
+
+        Returns:
+            int: The call's ID
+        """
+        with self._lock, self._db:
+            return self._db.execute(UPSERT, self._row(result, filename, audio_key, created_at)).fetchone()[0]
+
+    def add_many(self, results):
+        """
+        Store many calls in one transaction, e.g. to backfill from batch output.
+
+        Args:
+            results (iterable): Dicts as for add(), optionally with filename,
+                audio_key and created_at keys
+
+        Returns:
+            int: Number of calls stored
+        """
+        rows = [
+            self._row(result, result.get("filename"), result.get("audio_key"), result.get("created_at"))
+            for result in results
+        ]
+        with self._lock, self._db:
+            for row in rows:
+                self._db.execute(UPSERT, row).fetchone()
+        return len(rows)
+
+    def _to_dict(self, row):
+        call = dict(row)
+        if "action_items" in call:
+            call["action_items"] = json.loads(call["action_items"])
+        return call
+
+    def get(self, call_id):
+        """Return one call by ID, or None."""
+        with self._lock:
+            row = self._db.execute(f"SELECT {COLUMNS} FROM calls WHERE id = ?", (call_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def recent(self, limit=20, offset=0):
+        """Return the most recently archived calls, newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {COLUMNS} FROM calls ORDER BY created_at DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def search(self, query, limit=20, offset=0, raw=False):
+        """
+        Full-text search over every archived call, best matches first.
+
+        Args:
+            query (str): Words that must all appear (the last may be a prefix)
+            limit (int): Maximum number of results
+            offset (int): Results to skip, for paging
+            raw (bool): Pass query to FTS5 unchanged, allowing phrases, OR,
+                NEAR and column filters such as summary:acme
+
+        Returns:
+            list: Calls as dicts (without the transcript) with a highlighted
+                snippet of the matching text and a rank (lower is better)
+        """
+        match = query if raw else fts_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT c.id, c.created_at, c.filename, c.summary, c.action_items, c.calendar, c.web_search, "
+                "snippet(calls_fts, -1, '**', '**', '…', 16) AS snippet, calls_fts.rank AS rank "
+                "FROM calls_fts JOIN calls c ON c.id = calls_fts.rowid "
+                "WHERE calls_fts MATCH ? ORDER BY calls_fts.rank LIMIT ? OFFSET ?",
+                (match, limit, offset)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+
+    def delete(self, call_id):
+        """Remove a call from the archive and the index."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM calls WHERE id = ?", (call_id,))
+
+    def optimize(self):
+        """Merge the index's segments; worth running after large backfills."""
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO calls_fts (calls_fts) VALUES ('optimize')")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_call_archive = None
+_call_archive_lock = threading.Lock()
+
+
+def get_call_archive():
+    """
+    Return the process-wide call archive, configured from the environment.
+
+    CALL_ARCHIVE=0 disables archiving; CALL_ARCHIVE_PATH sets the database
+    file (default data/calls.sqlite3).
+    """
+    global _call_archive
+    if os.getenv("CALL_ARCHIVE", "1") == "0":
+        return None
+    with _call_archive_lock:
+        if _call_archive is None:
+            _call_archive = CallArchive(os.getenv("CALL_ARCHIVE_PATH", os.path.join("data", "calls.sqlite3")))
+        return _call_archive
+
+
+def archive_call(result, audio_file_path=None, filename=None, archive=None):
+    """
+    Store a processed call in the archive, keyed by the recording's content
+    so that re-processing it updates the existing entry. Failures are logged
+    rather than raised: archiving never fails the call itself.
+
+    Returns:
+        int: The call's ID, or None if archiving is off or failed
+    """
+    archive = archive if archive is not None else get_call_archive()
+    if archive is None:
+        return None
+    try:
+        audio_key = hash_audio_file(audio_file_path, "archive") if audio_file_path else None
+        filename = filename or (os.path.basename(audio_file_path) if audio_file_path else None)
+        return archive.add(result, filename=filename, audio_key=audio_key)
+    except Exception as e:
+        logger.warning("Could not archive call %s: %s", filename or audio_file_path, e)
+        return None
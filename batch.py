@@ -0,0 +1,225 @@
+"""
+Headless batch processing for directories of sales call recordings.
+
+Usage:
+    python batch.py recordings/ -o results.jsonl --workers 4
+    python batch.py --manifest calls.txt -o results.jsonl --processes
+
+Each finished call is appended to the output as one JSON line. Re-running
+with the same output file skips calls that already succeeded. With
+--processes, each worker gets an equal share of the provider rate limits.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from ratelimit import set_process_share
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger("batch")
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".ogg", ".webm")
+
+
+def discover_recordings(directory=None, manifest=None):
+    """
+    List the recordings to process.
+
+    Args:
+        directory (str, optional): Directory searched recursively for audio files
+        manifest (str, optional): Text file with one path per line, or JSONL
+            with a "path" key per line. Relative paths resolve against the
+            manifest's directory
+
+    Returns:
+        list: Absolute audio file paths, sorted and deduplicated
+    """
+    paths = []
+    if directory:
+        for root, _, files in os.walk(directory):
+            paths += [os.path.join(root, name) for name in files if name.lower().endswith(AUDIO_EXTENSIONS)]
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                path = json.loads(line)["path"] if line.startswith("{") else line
+                for match in glob.glob(os.path.join(base, path)) or [os.path.join(base, path)]:
+                    paths.append(match)
+    return sorted({os.path.abspath(path) for path in paths})
+
+
+def load_completed(output_path):
+    """Return the paths already processed successfully in an existing output file."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; the call will be retried
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["path"])
+    return completed
+
+
+def process_one(path):
+    """Process one recording and return its output record. Never raises."""
+    # Imported here so worker processes load the pipeline themselves
+    from pipeline import process_recording
+
+    started = time.perf_counter()
+    try:
+        record = {"path": path, "status": "ok", **process_recording(path)}
+    except Exception as e:
+        record = {
+            "path": path,
+            "status": "error",
+            "error": str(e),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+    record["finished_at"] = datetime.now(timezone.utc).isoformat()
+    return record
+
+
+def run_batch(paths, output_path, workers=4, use_processes=False):
+    """
+    Process recordings on a bounded pool, streaming results to output_path.
+
+    At most two calls per worker are queued at a time, so memory stays flat
+    for arbitrarily large batches. Worker processes split the provider rate
+    limits between them rather than each using the whole quota. If a worker
+    process dies, the calls it took down are recorded as failed (so a
+    resumed run retries them) and the rest continue on a fresh pool.
+
+    Returns:
+        dict: ok, failed, seconds and calls_per_minute
+    """
+    def new_pool():
+        if use_processes:
+            return ProcessPoolExecutor(max_workers=workers, initializer=set_process_share, initargs=(workers,))
+        return ThreadPoolExecutor(max_workers=workers)
+
+    ok = failed = 0
+    started = time.perf_counter()
+    pending = iter(paths)
+    # future -> (path, pool it was submitted to)
+    in_flight = {}
+    pool = new_pool()
+
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            def restart_pool():
+                nonlocal pool
+                logger.warning("Worker process crashed; starting a new pool")
+                pool.shutdown(wait=False)
+                pool = new_pool()
+
+            def submit_next():
+                path = next(pending, None)
+                if path is None:
+                    return
+                try:
+                    future = pool.submit(process_one, path)
+                except BrokenProcessPool:
+                    # The pool died before its own calls reported it
+                    restart_pool()
+                    future = pool.submit(process_one, path)
+                in_flight[future] = (path, pool)
+
+            for _ in range(workers * 2):
+                submit_next()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, future_pool = in_flight.pop(future)
+                    try:
+                        record = future.result()
+                    except BrokenProcessPool as e:
+                        # A worker died (out of memory, a crash in a native decoder) and took the
+                        # pool's other calls with it; they are recorded as failed so a rerun retries them
+                        record = {
+                            "path": path,
+                            "status": "error",
+                            "error": f"Worker process crashed: {e}",
+                            "seconds": 0.0,
+                            "finished_at": datetime.now(timezone.utc).isoformat(),
+                        }
+                        if future_pool is pool:
+                            restart_pool()
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    if record["status"] == "ok":
+                        ok += 1
+                    else:
+                        failed += 1
+                        logger.warning("Failed %s: %s", record["path"], record["error"])
+                    elapsed = time.perf_counter() - started
+                    logger.info(
+                        "[%d/%d] %s (%.1fs) - %.1f calls/min",
+                        ok + failed, len(paths), os.path.basename(record["path"]),
+                        record["seconds"], (ok + failed) * 60 / elapsed
+                    )
+                    submit_next()
+    finally:
+        pool.shutdown()
+
+    seconds = time.perf_counter() - started
+    return {
+        "ok": ok,
+        "failed": failed,
+        "seconds": round(seconds, 3),
+        "calls_per_minute": round((ok + failed) * 60 / seconds, 2) if seconds else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe and analyze a batch of sales call recordings.")
+    parser.add_argument("directory", nargs="?", help="Directory of recordings (searched recursively)")
+    parser.add_argument("--manifest", help="File listing recordings, one path per line or JSONL with a 'path' key")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL output file (default: results.jsonl)")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Concurrent calls (default: 4)")
+    parser.add_argument("--processes", action="store_true", help="Use a process pool instead of threads")
+    parser.add_argument("--no-resume", action="store_true", help="Reprocess calls already in the output file")
+    args = parser.parse_args(argv)
+
+    if not args.directory and not args.manifest:
+        parser.error("give a directory of recordings or --manifest")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    paths = discover_recordings(args.directory, args.manifest)
+    if not args.no_resume:
+        completed = load_completed(args.output)
+        skipped = [path for path in paths if path in completed]
+        paths = [path for path in paths if path not in completed]
+        if skipped:
+            logger.info("Skipping %d calls already in %s", len(skipped), args.output)
+    if not paths:
+        logger.info("Nothing to do")
+        return 0
+
+    logger.info("Processing %d calls with %d workers", len(paths), args.workers)
+    totals = run_batch(paths, args.output, workers=args.workers, use_processes=args.processes)
+    logger.info(
+        "Done: %d ok, %d failed in %.1fs (%.1f calls/min)",
+        totals["ok"], totals["failed"], totals["seconds"], totals["calls_per_minute"]
+    )
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
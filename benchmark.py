@@ -0,0 +1,268 @@
+"""
+Offline benchmark for the transcribe-and-analyze pipeline.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --concurrency 1 4 16 --calls 32 --latency-scale 0.2 -o benchmark.json
+    python benchmark.py --workloads long_transcript --latency chat=2.5
+
+Every external API (OpenAI, SerpAPI, Google Calendar) is replaced by the
+local fakes in fake_services.py, so runs are repeatable and cost nothing.
+The real pipeline code runs unchanged against them. For each workload and
+concurrency level the report shows throughput, p50/p99 latency per stage
+(from the tracing spans) and peak memory.
+
+Workloads:
+    recordings        process_recording() over samples/*.mp3
+    short_transcript  Agent analysis and tools on a short synthetic transcript
+    long_transcript   The same on a transcript long enough for map-reduce analysis
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from fake_services import DEFAULT_LATENCY, FakeServices
+
+logger = logging.getLogger("benchmark")
+
+WORKLOADS = ("recordings", "short_transcript", "long_transcript")
+
+SPEAKER_LINES = (
+    "Sales Rep: Our platform gives your team real-time dashboards across every region.",
+    "Client: How does the pricing compare with Acme Insights for a team of our size?",
+    "Sales Rep: We price per seat, and annual plans include onboarding and support.",
+    "Client: Security review is a blocker for us, do you have SOC 2 documentation?",
+    "Sales Rep: Yes, I can share the report and our data processing agreement.",
+    "Client: We would also need single sign-on and an audit log for compliance.",
+    "Sales Rep: Both are included in the enterprise tier, along with a dedicated manager.",
+    "Client: Let's plan a product demo next Tuesday at 2 PM with our IT lead.",
+)
+
+
+def synthetic_transcript(words, seed=0):
+    """Build a sales call transcript of roughly the given number of words."""
+    rng = random.Random(seed)
+    lines, count = [], 0
+    while count < words:
+        line = rng.choice(SPEAKER_LINES)
+        lines.append(line)
+        count += len(line.split())
+    return "\n".join(lines)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (pct in 0-100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, where the platform reports it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def configure_environment(services, work_dir, keep_rate_limits=False):
+    """
+    Point the pipeline at the fakes, keeping its files in work_dir. Must run
+    before the pipeline modules are imported, since some of them read their
+    settings at import time.
+    """
+    os.environ.update(services.environment(os.path.join(work_dir, "token.json")))
+    os.environ["CALL_ARCHIVE_PATH"] = os.path.join(work_dir, "calls.sqlite3")
+    os.environ["SIMILARITY_INDEX_DIR"] = os.path.join(work_dir, "similarity")
+    # Caches would turn every repeat call into a hit and hide the work being measured
+    os.environ["TRANSCRIPTION_CACHE"] = "0"
+    os.environ["SEARCH_CACHE"] = "0"
+    os.environ["TRANSCRIPTION_BACKEND"] = "openai"
+    os.environ["AGENT_MODE"] = "structured"
+    if not keep_rate_limits:
+        for provider in ("OPENAI", "SERPAPI"):
+            os.environ[f"{provider}_RATE_PER_SECOND"] = "1000"
+            os.environ[f"{provider}_BURST"] = "1000"
+            os.environ[f"{provider}_MAX_CONCURRENCY"] = "256"
+
+
+def build_workloads(names, samples, short_words, long_words):
+    """Return {name: [zero-argument job, ...]} for the selected workloads."""
+    from agent import get_sales_agent
+    from pipeline import process_recording
+
+    jobs = {}
+    if "recordings" in names:
+        if samples:
+            jobs["recordings"] = [lambda path=path: process_recording(path) for path in samples]
+        else:
+            logger.warning("No sample recordings found, skipping the recordings workload")
+    agent = get_sales_agent("structured")
+    if "short_transcript" in names:
+        short = synthetic_transcript(short_words)
+        jobs["short_transcript"] = [lambda: agent.process_transcription(short)]
+    if "long_transcript" in names:
+        long = synthetic_transcript(long_words)
+        jobs["long_transcript"] = [lambda: agent.process_transcription(long)]
+    return jobs
+
+
+def run_workload(name, jobs, calls, concurrency, trace_memory=True):
+    """
+    Run calls jobs (cycling through jobs) with the given concurrency.
+
+    Returns:
+        dict: workload, concurrency, calls, failed, seconds, calls_per_second,
+            peak_traced_mb and stages ({span name: {count, p50, p99}})
+    """
+    from tracing import add_span_listener, remove_span_listener
+
+    durations = defaultdict(list)
+    lock = threading.Lock()
+
+    def record(finished):
+        with lock:
+            durations[finished.name].append(finished.duration)
+
+    def run(index):
+        try:
+            jobs[index % len(jobs)]()
+            return True
+        except Exception as e:
+            logger.warning("%s call %d failed: %s", name, index, e)
+            return False
+
+    add_span_listener(record)
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(run, range(calls)))
+        seconds = time.perf_counter() - started
+        peak_traced = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        remove_span_listener(record)
+
+    return {
+        "workload": name,
+        "concurrency": concurrency,
+        "calls": calls,
+        "failed": results.count(False),
+        "seconds": round(seconds, 3),
+        "calls_per_second": round(calls / seconds, 3) if seconds > 0 else 0.0,
+        "peak_traced_mb": round(peak_traced / (1024 * 1024), 1) if peak_traced is not None else None,
+        "stages": {
+            stage: {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 4),
+                "p99": round(percentile(values, 99), 4),
+            }
+            for stage, values in sorted(durations.items())
+        },
+    }
+
+
+def format_report(runs):
+    lines = []
+    for run in runs:
+        memory = f"{run['peak_traced_mb']} MB traced peak" if run["peak_traced_mb"] is not None else "memory not traced"
+        lines.append(
+            f"\n{run['workload']} x{run['concurrency']}: {run['calls']} calls ({run['failed']} failed) "
+            f"in {run['seconds']:.2f}s, {run['calls_per_second']:.2f} calls/s, {memory}"
+        )
+        lines.append(f"  {'stage':<22}{'count':>7}{'p50 s':>10}{'p99 s':>10}")
+        for stage, stats in run["stages"].items():
+            lines.append(f"  {stage:<22}{stats['count']:>7}{stats['p50']:>10.3f}{stats['p99']:>10.3f}")
+    return "\n".join(lines)
+
+
+def parse_latency(values):
+    latency = {}
+    for value in values or []:
+        service, _, seconds = value.partition("=")
+        if service not in DEFAULT_LATENCY or not seconds:
+            raise argparse.ArgumentTypeError(
+                f"--latency expects SERVICE=SECONDS with SERVICE one of {', '.join(DEFAULT_LATENCY)}"
+            )
+        latency[service] = float(seconds)
+    return latency
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline offline against fake external services.")
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16],
+                        help="Concurrency levels to measure (default: 1 4 16)")
+    parser.add_argument("--calls", type=int, default=16, help="Calls per workload and concurrency level (default: 16)")
+    parser.add_argument("--samples", default=os.path.join("samples", "*.mp3"),
+                        help="Glob of recordings for the recordings workload (default: samples/*.mp3)")
+    parser.add_argument("--short-words", type=int, default=1500, help="Words in the short transcript (default: 1500)")
+    parser.add_argument("--long-words", type=int, default=30000, help="Words in the long transcript (default: 30000)")
+    parser.add_argument("--latency", nargs="+", metavar="SERVICE=SECONDS",
+                        help=f"Per-service fake latency; services: {', '.join(DEFAULT_LATENCY)}")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every fake latency (default: 1.0)")
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="Keep the configured provider rate limits instead of lifting them")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip memory tracing, which slows allocation-heavy code")
+    parser.add_argument("-o", "--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        latency = dict(DEFAULT_LATENCY, **parse_latency(args.latency))
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    latency = {service: seconds * args.latency_scale for service, seconds in latency.items()}
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    # Every span and HTTP request is also logged at INFO, which would drown out the report
+    for noisy in ("tracing", "httpx"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    with FakeServices(latency=latency) as services, tempfile.TemporaryDirectory() as tmp_dir:
+        configure_environment(services, tmp_dir, args.keep_rate_limits)
+        samples = sorted(glob.glob(args.samples))
+        workloads = build_workloads(args.workloads, samples, args.short_words, args.long_words)
+
+        # One untimed call per workload opens connections and loads lazy imports
+        for name, jobs in workloads.items():
+            run_workload(name, jobs, 1, 1, trace_memory=False)
+
+        runs = []
+        for name, jobs in workloads.items():
+            for concurrency in args.concurrency:
+                logger.info("Running %s with %d calls at concurrency %d", name, args.calls, concurrency)
+                runs.append(run_workload(name, jobs, args.calls, concurrency, trace_memory=not args.no_tracemalloc))
+
+    report = {
+        "latency": latency,
+        "runs": runs,
+        "peak_rss_mb": peak_rss_mb(),
+        "fake_requests": dict(services.requests),
+    }
+    print(format_report(runs))
+    print(f"\nPeak RSS: {report['peak_rss_mb']} MB; fake API requests: {report['fake_requests']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(run["failed"] for run in runs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_audio_file(audio_file_path, model, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Build a content-addressed cache key for an audio file.
+
+    The file is hashed in fixed-size chunks so large recordings are never
+    loaded into memory in one piece.
+
+    Args:
+        audio_file_path (str): Path to the audio file
+        model (str): Transcription model name, part of the key
+
+    Returns:
+        str: Hex SHA-256 digest of the model name and audio bytes
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8") + b"\0")
+    with open(audio_file_path, "rb") as audio_file:
+        for chunk in iter(lambda: audio_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Two-tier transcript cache: a small in-process LRU in front of an on-disk
+    store whose total size is bounded by least-recently-used eviction.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, memory_items=128):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self._memory = OrderedDict()
+        self._disk_index = OrderedDict()  # key -> size in bytes, oldest first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".txt")
+
+    def _load_disk_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".txt"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self._disk_bytes += size
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        while self.max_bytes is not None and self._disk_bytes > self.max_bytes and self._disk_index:
+            key, size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key):
+        """Return the cached transcript for key, or None on a miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return self._memory[key]
+            if self.cache_dir and key in self._disk_index:
+                path = self._path(key)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                except FileNotFoundError:
+                    self._disk_bytes -= self._disk_index.pop(key)
+                except OSError as e:
+                    logger.warning("Could not read cached transcript %s: %s", path, e)
+                else:
+                    # Touch the entry so eviction order survives restarts
+                    try:
+                        os.utime(path, None)
+                    except OSError:
+                        # Evicted by another process since we read it
+                        pass
+                    self._disk_index.move_to_end(key)
+                    self._remember(key, text)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return text
+            self.misses += 1
+            return None
+
+    def set(self, key, text):
+        """Store a transcript under key in both tiers. Disk errors are logged, not raised."""
+        with self._lock:
+            self._remember(key, text)
+            if not self.cache_dir:
+                return
+            data = text.encode("utf-8")
+            path = self._path(key)
+            # Unique across processes too, since batch workers share the directory
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=key + ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                # The transcript is still in memory; a disk failure must not fail the call
+                logger.warning("Could not write cached transcript %s: %s", path, e)
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+            self._disk_bytes -= self._disk_index.pop(key, 0)
+            self._disk_index[key] = len(data)
+            self._disk_bytes += len(data)
+            self._evict()
+
+    def clear(self):
+        """Drop every entry from both tiers and reset the counters."""
+        with self._lock:
+            for key in list(self._disk_index):
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._disk_index.clear()
+            self._disk_bytes = 0
+            self._memory.clear()
+            self.hits = self.misses = self.memory_hits = self.disk_hits = 0
+
+    def stats(self):
+        """Return hit/miss counters and current disk usage."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "disk_entries": len(self._disk_index),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+_transcription_cache = None
+_transcription_cache_lock = threading.Lock()
+
+
+def get_transcription_cache():
+    """
+    Return the process-wide transcription cache, configured from the environment.
+
+    TRANSCRIPTION_CACHE=0 disables caching; TRANSCRIPTION_CACHE_DIR and
+    TRANSCRIPTION_CACHE_MAX_MB control the on-disk tier.
+    """
+    global _transcription_cache
+    if os.getenv("TRANSCRIPTION_CACHE", "1") == "0":
+        return None
+    with _transcription_cache_lock:
+        if _transcription_cache is None:
+            _transcription_cache = TranscriptionCache(
+                cache_dir=os.getenv("TRANSCRIPTION_CACHE_DIR", os.path.join(".cache", "transcriptions")),
+                max_bytes=int(float(os.getenv("TRANSCRIPTION_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            )
+        return _transcription_cache
+
+
+QUERY_WORDS = re.compile(r"\w+")
+
+
+def normalize_query(query):
+    """
+    Normalize a search query into a cache key.
+
+    Casing, punctuation, repeated words and word order do not change what a
+    web search finds, so "Acme Corp pricing" and "pricing, acme corp" share a key.
+    """
+    return " ".join(sorted(set(QUERY_WORDS.findall(query.lower()))))
+
+
+class SearchCache:
+    """
+    TTL cache for web search results with normalized query keys, a bounded
+    in-process tier, an optional SQLite tier that survives restarts, and
+    single-flight deduplication of concurrent identical queries.
+    """
+
+    def __init__(self, db_path=None, ttl_seconds=86400, max_entries=5000, memory_items=512):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_items = memory_items
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future for a fetch in progress
+        self._lock = threading.Lock()
+        self._db = None
+        if self.db_path:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def _lookup(self, key, now):
+        """Return a fresh cached value for key or None. Caller holds the lock."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                return entry[1]
+            del self._memory[key]
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM search_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE search_cache SET last_used = ? WHERE key = ?", (now, key))
+                self._db.commit()
+                self._remember(key, row[1], row[0])
+                return row[0]
+        return None
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _store(self, key, value, now):
+        """Store value under key in both tiers. Caller holds the lock."""
+        expires_at = now + self.ttl_seconds
+        self._remember(key, expires_at, value)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            # Keep the table bounded: drop expired rows, then the least recently used
+            self._db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM search_cache WHERE key IN ("
+                "SELECT key FROM search_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def get_or_compute(self, query, compute):
+        """
+        Return the cached result for query, calling compute(query) on a miss.
+
+        Concurrent callers asking for the same normalized query wait for the
+        first caller's fetch instead of issuing their own. Exceptions raised by
+        compute are propagated to every waiter and nothing is cached.
+        """
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            value = self._lookup(key, now)
+            if value is not None:
+                self.hits += 1
+                return value
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute(query)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._store(key, value, time.time())
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        """Drop every entry from both tiers and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM search_cache")
+                self._db.commit()
+            self.hits = self.misses = self.coalesced = 0
+
+    def stats(self):
+        """Return hit, miss and coalesced-request counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """
+    Return the process-wide web search cache, configured from the environment.
+
+    SEARCH_CACHE=0 disables caching; SEARCH_CACHE_PATH, SEARCH_CACHE_TTL_SECONDS
+    and SEARCH_CACHE_MAX_ENTRIES control the persistent tier.
+    """
+    global _search_cache
+    if os.getenv("SEARCH_CACHE", "1") == "0":
+        return None
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache(
+                db_path=os.getenv("SEARCH_CACHE_PATH", os.path.join(".cache", "search.sqlite3")),
+                ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "86400")),
+                max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000")),
+            )
+        return _search_cache
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import threading
+import weakref
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Connection pool sizing shared by every OpenAI client in the process
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+
+CALENDAR_SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
+GOOGLE_TOKEN_FILE = os.getenv("GOOGLE_TOKEN_FILE", "token.json")
+# Overrides the Calendar API base URL, e.g. to point at the benchmark's fake server
+GOOGLE_CALENDAR_API_ENDPOINT = os.getenv("GOOGLE_CALENDAR_API_ENDPOINT")
+
+_lock = threading.Lock()
+_openai_client = None
+_async_openai_clients = weakref.WeakKeyDictionary()
+_chat_llm = None
+_calendar_credentials = None
+# Refreshing the token is a network round trip, so it does not hold _lock
+_calendar_lock = threading.Lock()
+_calendar_local = threading.local()
+_background_loop = None
+
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_SECONDS
+    )
+
+
+def get_openai_client():
+    """
+    Return the process-wide OpenAI client. It is thread-safe and keeps a pool
+    of keep-alive connections, so every caller should share it.
+    """
+    global _openai_client
+    with _lock:
+        if _openai_client is None:
+            from openai import DefaultHttpxClient, OpenAI
+            # Retries are scheduled by ratelimit.get_limiter("openai") instead
+            _openai_client = OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=DefaultHttpxClient(limits=_http_limits()),
+                max_retries=0
+            )
+        return _openai_client
+
+
+def get_async_openai_client():
+    """
+    Return the AsyncOpenAI client for the running event loop.
+
+    Async connections are bound to the loop that opened them, so one client is
+    kept per loop and dropped when the loop is garbage collected. Long-running
+    processes should run their coroutines with run_async() so they all share
+    one loop, and so one client and connection pool.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_openai_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=DefaultAsyncHttpxClient(limits=_http_limits()),
+                max_retries=0
+            )
+            _async_openai_clients[loop] = client
+        return client
+
+
+def get_background_loop():
+    """Return the process-wide event loop, started on a daemon thread on first use."""
+    global _background_loop
+    with _lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="async-clients", daemon=True).start()
+        return _background_loop
+
+
+def submit_async(coro):
+    """
+    Schedule a coroutine on the background loop.
+
+    Args:
+        coro: Coroutine to run
+
+    Returns:
+        concurrent.futures.Future: Resolves to the coroutine's result
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+
+
+def run_async(coro):
+    """
+    Run a coroutine on the background loop and wait for its result.
+
+    Unlike asyncio.run(), the loop outlives the call, so the AsyncOpenAI
+    client and its keep-alive connections are reused by the next one.
+    """
+    return submit_async(coro).result()
+
+
+def get_chat_llm():
+    """Return the shared LangChain chat model used by the ReAct agent."""
+    global _chat_llm
+    with _lock:
+        if _chat_llm is None:
+            from langchain_openai import ChatOpenAI
+            _chat_llm = ChatOpenAI(
+                model="gpt-4-turbo-preview",
+                temperature=0.7,
+                api_key=os.getenv("OPENAI_API_KEY")
+            )
+        return _chat_llm
+
+
+def get_calendar_credentials():
+    """
+    Return the Google credentials from token.json, loaded once per process and
+    refreshed (and written back) when the access token has expired.
+    """
+    global _calendar_credentials
+    with _calendar_lock:
+        if _calendar_credentials is None:
+            from google.oauth2.credentials import Credentials
+            _calendar_credentials = Credentials.from_authorized_user_file(GOOGLE_TOKEN_FILE, CALENDAR_SCOPES)
+        creds = _calendar_credentials
+        if not creds.valid and creds.expired and creds.refresh_token:
+            from google.auth.transport.requests import Request
+            creds.refresh(Request())
+            with open(GOOGLE_TOKEN_FILE, "w") as token:
+                token.write(creds.to_json())
+        return creds
+
+
+def get_calendar_service():
+    """
+    Return a Google Calendar service for the current thread.
+
+    The underlying httplib2 transport is not thread-safe, so each thread
+    builds its service once (from the bundled discovery document) and reuses it.
+    """
+    creds = get_calendar_credentials()
+    service = getattr(_calendar_local, "service", None)
+    if service is None or getattr(_calendar_local, "credentials", None) is not creds:
+        from googleapiclient.discovery import build
+        client_options = {"api_endpoint": GOOGLE_CALENDAR_API_ENDPOINT} if GOOGLE_CALENDAR_API_ENDPOINT else None
+        service = build("calendar", "v3", credentials=creds, static_discovery=True, cache_discovery=False,
+                        client_options=client_options)
+        _calendar_local.service = service
+        _calendar_local.credentials = creds
+    return service
+
+
+def reset_clients():
+    """Drop every cached client, e.g. after the API keys or token.json change."""
+    global _openai_client, _chat_llm, _calendar_credentials
+    with _lock:
+        _openai_client = None
+        _async_openai_clients.clear()
+        _chat_llm = None
+    with _calendar_lock:
+        _calendar_credentials = None
+    _calendar_local.__dict__.clear()
@@ -0,0 +1,350 @@
+"""
+Fast date and time extraction for scheduling.
+
+ISO 8601 timestamps and common spoken forms ("next Tuesday at 3pm",
+"tomorrow at 10:30", "July 2nd", "in two hours") are matched by a single
+precompiled pattern, so every candidate phrase in a transcript is found in
+one pass. Relative dates are resolved against a reference time, parsed
+phrases are memoized, and dateparser is only imported and consulted for
+text the patterns do not recognise.
+"""
+import functools
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Time of day used when a phrase names a date but no time ("next Friday")
+DEFAULT_TIME = time.fromisoformat(os.getenv("DEFAULT_MEETING_TIME", "09:00"))
+# Time of day for "tonight" without an explicit time
+EVENING_TIME = time(19, 0)
+
+CACHE_SIZE = 4096
+
+WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "tues": 1, "wednesday": 2, "thursday": 3, "thurs": 3,
+    "friday": 4, "saturday": 5, "sunday": 6,
+}
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "a couple of": 2, "a few": 3,
+}
+UNITS = {"minute": "minutes", "hour": "hours", "day": "days", "week": "weeks"}
+
+_WEEKDAY = r"monday|tuesday|tues|wednesday|thursday|thurs|friday|saturday|sunday"
+_MONTH = (r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?")
+_COUNT = r"\d+|a\s+couple\s+of|a\s+few|an?|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve"
+
+
+def _time_pattern(tag):
+    """Clock time ("3pm", "3:30 p.m.", "15:00", "noon"); group names carry tag so the pattern can repeat."""
+    return (
+        rf"(?:(?P<{tag}hour>1[0-2]|0?[1-9])(?::(?P<{tag}minute>[0-5]\d))?\s*(?P<{tag}meridiem>[ap])(?:\.m\.|m\b)"
+        rf"|(?P<{tag}hour24>[01]?\d|2[0-3]):(?P<{tag}minute24>[0-5]\d)\b"
+        rf"|(?P<{tag}named>noon|midday|midnight)\b)"
+    )
+
+
+def _loose_hour_pattern(tag):
+    """A bare hour after "at" ("at 3", "at 10 o'clock"); only accepted next to a date, see _clock."""
+    return rf"(?:at|around)\s+(?P<{tag}loose>1[0-2]|0?[1-9])(?:\s*o'?clock)?(?![\w:/]|\.\d)"
+
+
+_DATE = (
+    rf"(?:(?P<relative>today|tonight|tomorrow|(?:the\s+)?day\s+after\s+tomorrow)"
+    rf"|(?P<next_week>next\s+week)"
+    rf"|in\s+(?P<count>{_COUNT})\s+(?P<unit>minute|hour|day|week)s?"
+    rf"|(?:(?:{_WEEKDAY}),?\s+)?(?P<month>{_MONTH})\.?\s+(?:the\s+)?(?P<day>[12]\d|3[01]|0?[1-9])(?:st|nd|rd|th)?\b(?:,?\s+(?P<year>\d{{4}}))?"
+    rf"|(?:(?:{_WEEKDAY}),?\s+)?(?:the\s+)?(?P<day_first>[12]\d|3[01]|0?[1-9])(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month_after>{_MONTH})\b\.?(?:,?\s+(?P<year_after>\d{{4}}))?"
+    rf"|the\s+(?P<ordinal>[12]\d|3[01]|0?[1-9])(?:st|nd|rd|th)\b"
+    rf"|(?P<numeric_first>[12]\d|3[01]|0?[1-9])/(?P<numeric_second>[12]\d|3[01]|0?[1-9])(?:/(?P<numeric_year>\d{{4}}|\d{{2}}))?\b"
+    rf"|(?:(?P<qualifier>next|this|this\s+coming|coming)\s+)?(?P<weekday>{_WEEKDAY})\b)"
+)
+
+_ISO = r"(?P<iso>\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?)"
+
+# One alternation over every supported form, tried left to right at each position:
+# an ISO timestamp, a date with an optional time before or after it, or a lone time
+DATETIME_PATTERN = re.compile(
+    rf"\b(?:{_ISO}"
+    rf"|(?:(?:{_loose_hour_pattern('lead_')}|(?:at\s+)?{_time_pattern('lead_')})\s+(?:on\s+)?)?{_DATE}"
+    rf"(?:\s*,?\s*(?:{_loose_hour_pattern('')}|(?:at\s+|around\s+)?{_time_pattern('')}))?"
+    rf"|(?:at\s+|around\s+){_time_pattern('only_')}|{_time_pattern('bare_')})",
+    re.IGNORECASE
+)
+WHITESPACE = re.compile(r"\s+")
+
+# Words left over around a match that mean the text says more about the date than the match
+# captured ("the 3rd", a numeric date, "PST"), so dateparser is consulted too
+DATE_LIKE = re.compile(
+    rf"\b(?:jan(?:uary)?|feb(?:ruary)?|march|apr(?:il)?|june?|july?|aug(?:ust)?|sept?(?:ember)?|oct(?:ober)?"
+    rf"|nov(?:ember)?|dec(?:ember)?|{_WEEKDAY}|today|tonight|tomorrow|yesterday|noon|midday|midnight|o'?clock"
+    rf"|morning|afternoon|evening|weekend|week|month|year)\b"
+    # Numbers only count when shaped like a date or time, not "3 people" or "version 2.0"
+    r"|\b\d{1,2}(?:st|nd|rd|th)\b|\b\d{1,4}[/-]\d{1,2}\b|\b\d{1,2}(?::\d\d)?\s*[ap]\.?m\b|\b\d{1,2}:\d\d\b",
+    re.IGNORECASE
+)
+# A small bare number right next to the match may belong to it, e.g. the "3" in "3 Monday"
+NUMBER_BEFORE = re.compile(r"(?<![\d.,$])\b\d{1,2}[\s,]*$")
+NUMBER_AFTER = re.compile(r"[\s,]*\d{1,2}\b(?![.,]?\d|%)")
+TIMEZONE = re.compile(r"\b(?:UTC|GMT|Z|[ECMPA][SD]T|BST|CET|CEST|IST|JST|AEST|AEDT)\b")
+
+
+class DateMatch(NamedTuple):
+    """A date/time phrase found in text, with its position and resolved value."""
+    text: str
+    start: int
+    end: int
+    value: datetime
+
+
+class _Spec(NamedTuple):
+    """What a phrase says, independent of when it is said; resolved against a reference time."""
+    absolute: datetime = None
+    days: int = 0
+    weekday: int = None
+    strictly_after: bool = False
+    month: int = None
+    day: int = None
+    year: int = None
+    delta: timedelta = None
+    has_date: bool = False
+    clock: time = None
+
+
+def _clock(groups, tag):
+    """Return the time of day from the groups of _time_pattern(tag), or None."""
+    loose = groups.get(f"{tag}loose")
+    if loose:
+        # "at 3": 8 to 11 are mornings, 12 is noon and 1 to 7 are afternoons
+        hour = int(loose)
+        return time(hour if hour >= 8 else hour + 12, 0)
+    named = groups[f"{tag}named"]
+    if named:
+        return time(0, 0) if named.lower() == "midnight" else time(12, 0)
+    if groups[f"{tag}hour24"] is not None:
+        return time(int(groups[f"{tag}hour24"]), int(groups[f"{tag}minute24"]))
+    if groups[f"{tag}hour"] is None:
+        return None
+    hour = int(groups[f"{tag}hour"]) % 12
+    if groups[f"{tag}meridiem"].lower() == "p":
+        hour += 12
+    return time(hour, int(groups[f"{tag}minute"] or 0))
+
+
+def _spec(match):
+    """Translate a DATETIME_PATTERN match into a _Spec, or None if it is not a valid date."""
+    groups = match.groupdict()
+    if groups["iso"]:
+        try:
+            return _Spec(absolute=datetime.fromisoformat(groups["iso"]), has_date=len(groups["iso"]) == 10)
+        except ValueError:
+            # e.g. a 13th month; fall back to the date part alone
+            try:
+                return _Spec(absolute=datetime.fromisoformat(groups["iso"][:10]), has_date=True)
+            except ValueError:
+                return None
+    for tag in ("only_", "bare_"):
+        clock = _clock(groups, tag)
+        if clock is not None:
+            return _Spec(clock=clock)
+    clock = _clock(groups, "lead_") or _clock(groups, "")
+
+    relative = (groups["relative"] or "").lower()
+    if relative:
+        days = 0 if relative in ("today", "tonight") else 1 if relative == "tomorrow" else 2
+        if relative == "tonight" and clock is None:
+            clock = EVENING_TIME
+        return _Spec(days=days, has_date=True, clock=clock)
+    if groups["next_week"]:
+        # The Monday of next week
+        return _Spec(weekday=0, strictly_after=True, has_date=True, clock=clock)
+    if groups["count"]:
+        count = groups["count"].lower()
+        count = int(count) if count.isdigit() else NUMBERS[WHITESPACE.sub(" ", count)]
+        return _Spec(delta=timedelta(**{UNITS[groups["unit"].lower()]: count}), clock=clock)
+    month = groups["month"] or groups["month_after"]
+    if month:
+        year = groups["year"] or groups["year_after"]
+        return _Spec(
+            month=MONTHS[month[:3].lower()], day=int(groups["day"] or groups["day_first"]),
+            year=int(year) if year else None, has_date=True, clock=clock
+        )
+    if groups["ordinal"]:
+        return _Spec(day=int(groups["ordinal"]), has_date=True, clock=clock)
+    if groups["numeric_first"]:
+        first, second = int(groups["numeric_first"]), int(groups["numeric_second"])
+        year = groups["numeric_year"]
+        # "3/4" on its own is as likely a fraction as a date
+        if year is None and clock is None:
+            return None
+        # Month first, as dateparser reads it, unless the first number cannot be a month
+        month, day = (second, first) if first > 12 else (first, second)
+        if month > 12:
+            return None
+        year = int(year) + 2000 if year and len(year) == 2 else int(year) if year else None
+        return _Spec(month=month, day=day, year=year, has_date=True, clock=clock)
+    qualifier = WHITESPACE.sub(" ", (groups["qualifier"] or "").lower())
+    # "this Tuesday" can be today; "next Tuesday" and a bare "Tuesday" mean the coming one
+    return _Spec(
+        weekday=WEEKDAYS[groups["weekday"].lower()], strictly_after=qualifier not in ("this", "this coming"),
+        has_date=True, clock=clock
+    )
+
+
+def _resolve(spec, reference):
+    """Return the datetime spec refers to when said at reference, or None if it names an impossible date."""
+    if spec.absolute is not None:
+        if spec.has_date:
+            return datetime.combine(spec.absolute.date(), DEFAULT_TIME)
+        return spec.absolute
+    if spec.delta is not None:
+        value = reference + spec.delta
+        return datetime.combine(value.date(), spec.clock) if spec.clock else value
+    if not spec.has_date:
+        # A lone time means its next occurrence
+        value = datetime.combine(reference.date(), spec.clock)
+        return value if value >= reference else value + timedelta(days=1)
+
+    day = reference.date()
+    if spec.month is not None:
+        try:
+            day = date(spec.year or day.year, spec.month, spec.day)
+            if spec.year is None and day < reference.date():
+                day = date(day.year + 1, spec.month, spec.day)
+        except ValueError:
+            return None
+    elif spec.weekday is not None:
+        ahead = (spec.weekday - day.weekday()) % 7
+        if ahead == 0 and spec.strictly_after:
+            ahead = 7
+        day += timedelta(days=ahead)
+    elif spec.day is not None:
+        # "the 3rd": this month's, or next month's once it has passed
+        year, month = day.year, day.month
+        for _ in range(2):
+            try:
+                candidate = date(year, month, spec.day)
+            except ValueError:
+                candidate = None
+            if candidate is not None and candidate >= reference.date():
+                day = candidate
+                break
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        else:
+            return None
+    else:
+        day += timedelta(days=spec.days)
+    return datetime.combine(day, spec.clock or DEFAULT_TIME)
+
+
+def _reference(reference):
+    # Truncated to the minute so that memoized fallbacks are reused within a minute
+    return reference or datetime.now().replace(second=0, microsecond=0)
+
+
+def _normalize(text):
+    return WHITESPACE.sub(" ", text.strip())
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _first_spec(text):
+    """
+    Memoized spec of the first phrase in text that names a valid date (or
+    None), and whether it can be trusted: False when date-like words, a
+    date- or time-shaped number, or a number touching the match are left
+    outside it, e.g. "PST" after a timestamp.
+    """
+    for match in DATETIME_PATTERN.finditer(text):
+        spec = _spec(match)
+        if spec is not None:
+            before, after = text[:match.start()], text[match.end():]
+            rest = before + " " + after
+            unread = DATE_LIKE.search(rest) or TIMEZONE.search(rest) or NUMBER_BEFORE.search(before) or NUMBER_AFTER.match(after)
+            return spec, not unread
+    return None, False
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _dateparser_parse(text, reference):
+    """dateparser, imported on first use, for phrasings the patterns do not cover."""
+    import dateparser
+    return dateparser.parse(text, settings={"RELATIVE_BASE": reference, "PREFER_DATES_FROM": "future"})
+
+
+def extract_datetimes(text: str, reference: datetime = None) -> list:
+    """
+    Find every date/time phrase in text in a single scan.
+
+    Args:
+        text (str): Free text such as a transcript or summary
+        reference (datetime, optional): When the text was said; defaults to now
+
+    Returns:
+        list: DateMatch tuples in order of appearance
+    """
+    reference = _reference(reference)
+    found = []
+    for match in DATETIME_PATTERN.finditer(text):
+        spec = _spec(match)
+        value = _resolve(spec, reference) if spec is not None else None
+        if value is not None:
+            found.append(DateMatch(match.group(0), match.start(), match.end(), value))
+    return found
+
+
+def parse_datetime(text: str, reference: datetime = None, fallback: bool = True):
+    """
+    Parse a date/time from text: an ISO 8601 string, a spoken phrase such as
+    "next Tuesday at 3pm", or the first such phrase in a longer sentence.
+
+    The patterns' answer is used directly only when nothing date-like is
+    left outside the phrase they matched. Otherwise ("2026-10-20 14:00 PST",
+    a phrase the patterns only partly cover) dateparser reads the whole
+    text, and the patterns' answer is kept only if dateparser finds nothing.
+
+    Args:
+        text (str): Text to parse
+        reference (datetime, optional): Base for relative dates; defaults to now
+        fallback (bool): Consult dateparser; without it, uncertain matches
+            return None
+
+    Returns:
+        datetime or None: The parsed date and time
+    """
+    if not text or not text.strip():
+        return None
+    try:
+        # A date alone is booked at the default time, as "on 2025-06-26" is
+        return datetime.combine(date.fromisoformat(text.strip()), DEFAULT_TIME)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text.strip())
+    except ValueError:
+        pass
+    text = _normalize(text)
+    reference = _reference(reference)
+    spec, certain = _first_spec(text)
+    value = _resolve(spec, reference) if spec is not None else None
+    if value is not None and certain:
+        return value
+    if not fallback:
+        return None
+    return _dateparser_parse(text, reference) or value
+
+
+def clear_cache():
+    """Forget memoized parses, e.g. after changing DEFAULT_MEETING_TIME in tests."""
+    _first_spec.cache_clear()
+    _dateparser_parse.cache_clear()
@@ -0,0 +1,316 @@
+"""
+Local stand-ins for the external APIs the pipeline calls, for offline
+benchmarks and tests.
+
+One HTTP server answers every service:
+    POST /v1/audio/transcriptions              OpenAI Whisper
+    POST /v1/chat/completions                  OpenAI chat (JSON-schema analysis or plain text, optionally streamed)
+    POST /v1/embeddings                        OpenAI embeddings (hashed bag of words)
+    GET  /search                               SerpAPI
+    POST /calendar/v3/calendars/<id>/events    Google Calendar
+
+Each service sleeps for its configured latency before answering, so the
+pipeline's concurrency behaves as it would against the real APIs.
+"""
+import base64
+import json
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Seconds each fake waits before responding
+DEFAULT_LATENCY = {
+    "transcription": 1.0,
+    "chat": 1.5,
+    "embeddings": 0.2,
+    "search": 0.5,
+    "calendar": 0.3,
+}
+
+SAMPLE_TRANSCRIPT = (
+    "Sales Rep: Thanks for joining today. I wanted to walk you through our analytics platform. "
+    "Client: Sure. We are currently comparing you with Acme Insights and a couple of other vendors. "
+    "Sales Rep: Understood. Our main difference is real-time dashboards and per-seat pricing. "
+    "Client: Pricing is a concern for us, could you send a proposal for fifty seats? "
+    "Sales Rep: Absolutely, I will send the proposal by Friday. Should we book a product demo for your team? "
+    "Client: Yes, next Tuesday at 2 PM works for us. "
+    "Sales Rep: Great, I will send the invite and include the security documentation."
+)
+
+# Characters per streamed chat completion chunk, roughly one or two tokens
+STREAM_PIECE_CHARS = 6
+
+CALENDAR_EVENTS_PATH = re.compile(r"^/calendar/v3/calendars/[^/]+/events$")
+
+
+class FakeServices:
+    """
+    Fake OpenAI, SerpAPI and Google Calendar APIs on one local HTTP server.
+
+    Usage:
+        with FakeServices(latency={"chat": 0.2}) as services:
+            os.environ.update(services.environment("token.json"))
+            ...
+    """
+
+    def __init__(self, latency=None, jitter=0.1, host="127.0.0.1", port=0, transcript=None, stream_delay=0.01):
+        """
+        Args:
+            latency (dict, optional): Seconds per service, overriding DEFAULT_LATENCY
+            jitter (float): Each wait varies randomly by up to this fraction
+            host (str): Interface to listen on
+            port (int): Port to listen on; 0 picks a free one
+            transcript (str, optional): Text every transcription returns
+            stream_delay (float): Seconds between streamed chat completion chunks
+        """
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.jitter = jitter
+        self.transcript = transcript or SAMPLE_TRANSCRIPT
+        self.stream_delay = stream_delay
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _FakeHandler)
+        self._server.daemon_threads = True
+        self._server.services = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def environment(self, token_file):
+        """
+        Environment variables that point the pipeline at these fakes. Writes
+        a fake Google token to token_file, since the Calendar client loads one.
+        """
+        write_fake_token(token_file)
+        return {
+            "OPENAI_API_KEY": "sk-fake",
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "SERPAPI_API_KEY": "fake",
+            "SERPAPI_BACKEND": self.base_url,
+            "GOOGLE_CALENDAR_API_ENDPOINT": f"{self.base_url}/calendar/v3/",
+            "GOOGLE_TOKEN_FILE": token_file,
+        }
+
+    def wait(self, service):
+        with self._lock:
+            self.requests[service] += 1
+        delay = self.latency.get(service, 0) * (1 + random.uniform(-self.jitter, self.jitter))
+        if delay > 0:
+            time.sleep(delay)
+
+
+def write_fake_token(path):
+    """Write an authorized-user token that stays valid, so no refresh is attempted."""
+    with open(path, "w") as token:
+        json.dump({
+            "token": "fake-access-token",
+            "refresh_token": "fake-refresh-token",
+            "client_id": "fake-client-id",
+            "client_secret": "fake-client-secret",
+            "expiry": "2099-01-01T00:00:00Z",
+        }, token)
+
+
+def fake_analysis(transcription):
+    """A plausible structured analysis of any transcript, matching ANALYSIS_SCHEMA."""
+    words = transcription.split()
+    demo = (datetime.now() + timedelta(days=1)).replace(hour=14, minute=0, second=0, microsecond=0)
+    return {
+        "summary": " ".join(words[:40]) + ("..." if len(words) > 40 else ""),
+        "action_items": ["Send pricing proposal for fifty seats", "Share security documentation"],
+        "meetings": [{"title": "Product demo", "start_time": demo.isoformat(), "duration_minutes": 30}],
+        "search_queries": ["Acme Insights pricing"],
+    }
+
+
+def fake_embedding(text, dimensions=1536):
+    """
+    A deterministic embedding where texts sharing words score as similar:
+    each word adds a signed count in a bucket chosen by its hash.
+    """
+    vector = [0.0] * dimensions
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        digest = zlib.crc32(word.encode("utf-8"))
+        vector[digest % dimensions] += 1.0 if digest & 0x80000000 else -1.0
+    return vector
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def services(self):
+        return self.server.services
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/search":
+            self._send_json(404, {"error": "Not found"})
+            return
+        self.services.wait("search")
+        query = parse_qs(url.query).get("q", [""])[0]
+        self._send_json(200, {
+            "search_metadata": {"status": "Success"},
+            "organic_results": [
+                {"position": i, "title": f"{query} result {i}", "link": f"https://example.com/{i}"}
+                for i in range(1, 4)
+            ],
+        })
+
+    def do_POST(self):
+        body = self._read_body()
+        path = urlparse(self.path).path
+        if path == "/v1/audio/transcriptions":
+            self._transcription(body)
+        elif path == "/v1/chat/completions":
+            self._chat_completion(json.loads(body))
+        elif path == "/v1/embeddings":
+            self._embeddings(json.loads(body))
+        elif CALENDAR_EVENTS_PATH.match(path):
+            self.services.wait("calendar")
+            event = json.loads(body or b"{}")
+            event_id = event.get("id") or uuid.uuid4().hex
+            self._send_json(200, dict(event, id=event_id, status="confirmed",
+                                      htmlLink=f"https://calendar.google.com/calendar/event?eid={event_id}"))
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def _embeddings(self, request):
+        self.services.wait("embeddings")
+        inputs = request.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        dimensions = request.get("dimensions") or 1536
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_embedding(text, dimensions)
+            if request.get("encoding_format") == "base64":
+                # The OpenAI client asks for little-endian float32 bytes unless told otherwise
+                vector = base64.b64encode(struct.pack(f"<{dimensions}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = sum(len(text) for text in inputs) // 4
+        self._send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": request.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _transcription(self, body):
+        self.services.wait("transcription")
+        text = self.services.transcript
+        # Multipart form field written by the OpenAI client for verbose_json requests
+        if not re.search(rb'name="response_format"\r\n\r\nverbose_json', body):
+            self._send_json(200, {"text": text})
+            return
+        sentences = [s.strip() for s in re.split(r"(?<=[.?!])\s+", text) if s.strip()]
+        segments = [
+            {"id": i, "start": i * 5.0, "end": (i + 1) * 5.0, "text": " " + sentence}
+            for i, sentence in enumerate(sentences)
+        ]
+        self._send_json(200, {
+            "task": "transcribe",
+            "language": "english",
+            "duration": len(segments) * 5.0,
+            "text": text,
+            "segments": segments,
+        })
+
+    def _chat_completion(self, request):
+        self.services.wait("chat")
+        messages = request.get("messages", [])
+        user_content = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        if (request.get("response_format") or {}).get("type") == "json_schema":
+            content = json.dumps(fake_analysis(user_content))
+        else:
+            content = " ".join(user_content.split()[:60])
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        completion_tokens = len(content) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        completion = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-mini"),
+        }
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            self._stream_completion(completion, content, usage if include_usage else None)
+            return
+        self._send_json(200, dict(completion, object="chat.completion", usage=usage, choices=[{
+            "index": 0,
+            "message": {"role": "assistant", "content": content, "refusal": None},
+            "finish_reason": "stop",
+        }]))
+
+    def _stream_completion(self, completion, content, usage):
+        """Send content as server-sent chat.completion.chunk events, a few characters at a time."""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunk = dict(completion, object="chat.completion.chunk")
+        pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+        events = [dict(chunk, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])]
+        events += [dict(chunk, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}]) for piece in pieces]
+        events.append(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if usage:
+            events.append(dict(chunk, choices=[], usage=usage))
+        for event in events:
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if self.services.stream_delay:
+                time.sleep(self.services.stream_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
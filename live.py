@@ -0,0 +1,503 @@
+"""
+Live-call mode: transcribe audio while it is still being recorded.
+
+Audio arrives as 16-bit 16 kHz mono PCM from a source (a replayed
+recording, a file that is still being written, or a local WebSocket) and
+is kept in a rolling buffer. Every STEP seconds the last WINDOW seconds
+are transcribed; consecutive windows overlap so that words cut at a
+boundary are heard whole in the next one, and the repeated words are
+dropped when the windows are stitched together. A lightweight,
+pattern-based action item pass re-runs over the transcript every few
+seconds of audio, so the transcript stays a few seconds behind the call
+without an LLM round trip per update.
+
+Usage:
+    python live.py --replay samples/test_sales_call.mp3 --speed 4
+    python live.py --file call.pcm
+    python live.py --websocket 127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import logging
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dotenv import load_dotenv
+from dates import extract_datetimes
+from tracing import in_current_context, metrics, span
+from transcriber import get_transcription_backend
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH
+
+# Each window is WINDOW seconds long and starts STEP seconds after the previous
+# one, so consecutive windows share WINDOW - STEP seconds of audio
+WINDOW_SECONDS = float(os.getenv("LIVE_WINDOW_SECONDS", "8"))
+STEP_SECONDS = float(os.getenv("LIVE_STEP_SECONDS", "6"))
+# Seconds of audio between action item passes
+ACTION_ITEMS_SECONDS = float(os.getenv("LIVE_ACTION_ITEMS_SECONDS", "20"))
+BUFFER_SECONDS = float(os.getenv("LIVE_BUFFER_SECONDS", "60"))
+LIVE_MAX_WORKERS = int(os.getenv("LIVE_MAX_WORKERS", "2"))
+# Sources deliver audio in pieces of this length
+SOURCE_CHUNK_SECONDS = 0.25
+# Longest run of repeated words looked for where two windows meet
+MAX_OVERLAP_WORDS = 40
+
+WORD = re.compile(r"[\w']+")
+SENTENCE = re.compile(r"[^.!?]+[.!?]*")
+ACTION_CUE = re.compile(
+    r"\b(?:i'll|i will|we'll|we will|let's|let me|i can send|need to|needs to|follow[- ]?up|"
+    r"next steps?|action items?|schedule|set up|send over|send you|get back to you)\b",
+    re.IGNORECASE
+)
+
+
+def _seconds_to_bytes(seconds):
+    return int(round(seconds * SAMPLE_RATE)) * SAMPLE_WIDTH
+
+
+class RollingBuffer:
+    """
+    The most recent max_seconds of a PCM stream, addressed by time since the
+    stream started. Older audio is discarded as new audio arrives.
+    """
+
+    def __init__(self, max_seconds=BUFFER_SECONDS):
+        self.max_bytes = _seconds_to_bytes(max_seconds)
+        self._data = bytearray()
+        # Stream position of _data[0], in bytes
+        self.start = 0
+
+    @property
+    def seconds(self):
+        """Length of the whole stream so far, in seconds."""
+        return (self.start + len(self._data)) / BYTES_PER_SECOND
+
+    def append(self, pcm):
+        self._data += pcm
+        excess = len(self._data) - self.max_bytes
+        if excess > 0:
+            excess -= excess % SAMPLE_WIDTH
+            del self._data[:excess]
+            self.start += excess
+
+    def read(self, start_seconds, end_seconds):
+        """
+        Return the PCM between two stream times.
+
+        Raises:
+            ValueError: Part of the range has already left the buffer
+        """
+        start, end = _seconds_to_bytes(start_seconds), _seconds_to_bytes(end_seconds)
+        if start < self.start:
+            raise ValueError(f"Audio at {start_seconds:.1f}s has left the buffer")
+        return bytes(self._data[start - self.start:end - self.start])
+
+
+def _normalize(word):
+    return "".join(WORD.findall(word.lower()))
+
+
+def merge_overlap(previous, text, max_overlap=MAX_OVERLAP_WORDS, min_match=2):
+    """
+    Stitch a new window's text onto the transcript: the longest run of words
+    that ends the transcript and also starts the new text is kept once.
+    Either side may have one extra word where the window boundary cut
+    through it; a cut word at the end of the transcript is replaced by the
+    new window's version, which heard it whole.
+
+    Args:
+        previous (list): Transcript words so far
+        text (str): Text of the next window
+        max_overlap (int): Longest run of repeated words to look for
+        min_match (int): Shortest run accepted as an overlap
+
+    Returns:
+        tuple: (number of words to remove from the end of the transcript,
+            list of words to append)
+    """
+    words = text.split()
+    if not previous:
+        return 0, words
+    tail = [_normalize(word) for word in previous[-(max_overlap + 1):]]
+    head = [_normalize(word) for word in words[:max_overlap + 1]]
+    for length in range(min(len(tail), len(head)), min_match - 1, -1):
+        for cut_tail in (0, 1):
+            end = len(tail) - cut_tail
+            if end < length:
+                continue
+            for cut_head in (0, 1):
+                if tail[end - length:end] == head[cut_head:cut_head + length]:
+                    return cut_tail, words[cut_head + length:]
+    return 0, words
+
+
+def extract_action_items(text, reference=None):
+    """
+    Cheap action item pass for live updates: sentences that commit to doing
+    something ("I'll send...", "let's schedule...") and the meetings they
+    mention. The full LLM analysis runs once the call has ended.
+
+    Args:
+        text (str): Transcript so far
+        reference (datetime, optional): When the call started, for relative dates
+
+    Returns:
+        dict: action_items (list of sentences) and meetings (list of dicts
+            with title and an ISO 8601 start_time)
+    """
+    action_items, meetings, seen = [], [], set()
+    for sentence in SENTENCE.findall(text):
+        sentence = sentence.strip()
+        key = sentence.lower()
+        if not sentence or key in seen or not ACTION_CUE.search(sentence):
+            continue
+        seen.add(key)
+        action_items.append(sentence)
+        for mention in extract_datetimes(sentence, reference):
+            meetings.append({"title": sentence, "start_time": mention.value.isoformat()})
+    return {"action_items": action_items, "meetings": meetings}
+
+
+class LiveTranscriber:
+    """
+    Incrementally transcribes a PCM stream in overlapping windows.
+
+    Feed audio as it arrives with feed() and call finish() when the stream
+    ends, or pass a whole source to run(). Windows are transcribed on a
+    small thread pool (or the given executor) and stitched in order;
+    on_update(section, value) is called with "transcript" (the full text so
+    far) after each window and with "action_items" (see
+    extract_action_items) after each pass. Lag is measured with clock,
+    time.monotonic by default.
+    """
+
+    def __init__(self, backend=None, window_seconds=None, step_seconds=None, action_items_seconds=None,
+                 max_workers=None, on_update=None, reference=None, clock=None, executor=None):
+        self.backend = backend or get_transcription_backend()
+        self.window_seconds = window_seconds or WINDOW_SECONDS
+        self.step_seconds = min(step_seconds or STEP_SECONDS, self.window_seconds)
+        self.action_items_seconds = action_items_seconds or ACTION_ITEMS_SECONDS
+        self.max_workers = max_workers or LIVE_MAX_WORKERS
+        self.on_update = on_update
+        self.reference = reference or datetime.now()
+        self.clock = clock or time.monotonic
+        self.buffer = RollingBuffer(max(BUFFER_SECONDS, 2 * self.window_seconds))
+        self.words = []
+        self.action_items = {"action_items": [], "meetings": []}
+        self.lags = []
+        self._next_start = 0.0
+        self._covered_until = 0.0
+        self._extracted_at = 0.0
+        # (window_end, time its last sample arrived, future), in window order
+        self._pending = deque()
+        self._owns_pool = executor is None
+        self._pool = executor or ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="live")
+
+    @property
+    def transcript(self):
+        return " ".join(self.words)
+
+    def feed(self, pcm):
+        """Add audio to the buffer and start transcribing every window it completes."""
+        self.buffer.append(pcm)
+        arrived = self.clock()
+        while self._next_start + self.window_seconds <= self.buffer.seconds:
+            self._submit(self._next_start, self._next_start + self.window_seconds, arrived)
+            self._next_start += self.step_seconds
+        # Falling this far behind means transcription is slower than real time; wait rather than queue without bound
+        self._drain(block=len(self._pending) > 4 * self.max_workers)
+
+    def finish(self):
+        """
+        Transcribe the audio after the last full window and wait for every
+        window to be stitched in.
+
+        Returns:
+            dict: transcription, action_items, meetings and lag (see lag_stats)
+        """
+        try:
+            if self.buffer.seconds > self._covered_until:
+                self._submit(self._next_start, self.buffer.seconds, self.clock())
+            self._drain(block=True)
+            self._extract_action_items()
+        finally:
+            if self._owns_pool:
+                self._pool.shutdown(wait=False)
+        return {"transcription": self.transcript, **self.action_items, "lag": self.lag_stats()}
+
+    def run(self, source):
+        """Feed every chunk from source, then finish(). Returns finish()'s result."""
+        with span("live", window_seconds=self.window_seconds, step_seconds=self.step_seconds) as s:
+            for pcm in source:
+                self.feed(pcm)
+            result = self.finish()
+            s.set(audio_seconds=self.buffer.seconds, windows=len(self.lags))
+            return result
+
+    def lag_stats(self):
+        """How far behind the audio each window's text arrived: windows, mean and max seconds."""
+        if not self.lags:
+            return {"windows": 0, "mean": 0.0, "max": 0.0}
+        return {"windows": len(self.lags), "mean": sum(self.lags) / len(self.lags), "max": max(self.lags)}
+
+    def _submit(self, start, end, arrived):
+        from pydub import AudioSegment
+        segment = AudioSegment(data=self.buffer.read(start, end), sample_width=SAMPLE_WIDTH,
+                               frame_rate=SAMPLE_RATE, channels=1)
+        future = self._pool.submit(in_current_context(self._transcribe_window), start, segment)
+        self._pending.append((end, arrived, future))
+        self._covered_until = end
+
+    def _transcribe_window(self, start, segment):
+        with span("live.window", offset=start, seconds=len(segment) / 1000.0):
+            return self.backend.transcribe_segments([(start, segment)], max_workers=1)[0]
+
+    def _drain(self, block=False):
+        """Stitch finished windows into the transcript, in window order."""
+        while self._pending and (block or self._pending[0][2].done()):
+            end, arrived, future = self._pending.popleft()
+            try:
+                text, _ = future.result()
+            except Exception as e:
+                logger.warning("Live window ending at %.1fs failed: %s", end, e)
+                continue
+            replaced, new_words = merge_overlap(self.words, text)
+            if replaced:
+                del self.words[-replaced:]
+            self.words.extend(new_words)
+            lag = self.clock() - arrived
+            self.lags.append(lag)
+            metrics.observe("live_lag_seconds", lag, "Delay between audio arriving and its transcript")
+            if self.on_update:
+                self.on_update("transcript", self.transcript)
+            if end - self._extracted_at >= self.action_items_seconds:
+                self._extracted_at = end
+                self._extract_action_items()
+
+    def _extract_action_items(self):
+        self.action_items = extract_action_items(self.transcript, self.reference)
+        if self.on_update:
+            self.on_update("action_items", self.action_items)
+
+
+def replay_source(audio_file_path, speed=1.0, chunk_seconds=SOURCE_CHUNK_SECONDS, clock=time.monotonic,
+                  sleep=time.sleep):
+    """
+    Play a recording back as a live PCM stream.
+
+    Args:
+        audio_file_path (str): Any file pydub can decode, e.g. samples/*.mp3
+        speed (float): Playback rate; 1 is real time, 0 delivers all audio at once
+        chunk_seconds (float): Length of each piece yielded
+        clock, sleep: Time source and sleep function, replaceable in tests
+
+    Yields:
+        bytes: 16-bit 16 kHz mono PCM, each piece at the moment its last
+            sample would have been spoken
+    """
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(audio_file_path)
+    pcm = audio.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(SAMPLE_WIDTH).raw_data
+    step = _seconds_to_bytes(chunk_seconds)
+    started = clock()
+    for offset in range(0, len(pcm), step):
+        chunk = pcm[offset:offset + step]
+        if speed:
+            delay = started + (offset + len(chunk)) / BYTES_PER_SECOND / speed - clock()
+            if delay > 0:
+                sleep(delay)
+        yield chunk
+
+
+def _wav_data_offset(f):
+    """
+    Byte offset of the samples in a WAV file, found by walking its RIFF
+    chunks (fmt, LIST, fact, ...) to the data chunk; 0 for raw PCM, or None
+    while the header has not been completely written yet.
+    """
+    f.seek(0)
+    header = f.read(12)
+    if len(header) < 4:
+        return None
+    if header[:4] != b"RIFF":
+        return 0
+    if len(header) < 12:
+        return None
+    if header[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+    position = 12
+    while True:
+        f.seek(position)
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"data":
+            return position + 8
+        # Chunks are padded to an even length
+        position += 8 + size + (size & 1)
+
+
+def file_source(path, poll_seconds=0.1, idle_timeout=5.0, chunk_seconds=SOURCE_CHUNK_SECONDS):
+    """
+    Follow a file that another process is still writing, e.g.
+    ffmpeg -f pulse -i default -ac 1 -ar 16000 -f s16le call.pcm
+
+    Args:
+        path (str): Raw 16-bit 16 kHz mono PCM, or a WAV file in that format
+        poll_seconds (float): How often to check for new audio
+        idle_timeout (float): Stop once the file has not grown for this long
+
+    Yields:
+        bytes: PCM as it is appended
+    """
+    deadline = time.monotonic() + idle_timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise FileNotFoundError(path)
+        time.sleep(poll_seconds)
+    chunk_bytes = _seconds_to_bytes(chunk_seconds)
+    with open(path, "rb") as f:
+        offset = _wav_data_offset(f)
+        while offset is None:
+            if time.monotonic() > deadline:
+                raise ValueError(f"{path} has no audio data")
+            time.sleep(poll_seconds)
+            offset = _wav_data_offset(f)
+        f.seek(offset)
+        pending = b""
+        idle_since = time.monotonic()
+        while True:
+            data = f.read(chunk_bytes)
+            if data:
+                idle_since = time.monotonic()
+                data = pending + data
+                # Hold back half a sample until the rest of it is written
+                cut = len(data) - len(data) % SAMPLE_WIDTH
+                pending = data[cut:]
+                if cut:
+                    yield data[:cut]
+            elif time.monotonic() - idle_since > idle_timeout:
+                return
+            else:
+                time.sleep(poll_seconds)
+
+
+def websocket_source(host="127.0.0.1", port=8765, ready=None):
+    """
+    Accept one WebSocket client and yield the binary messages it sends as a
+    PCM stream (16-bit 16 kHz mono); the stream ends when it disconnects.
+    Requires the websockets package.
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port to listen on
+        ready (threading.Event, optional): Set once the server is listening
+
+    Yields:
+        bytes: PCM as it is received
+    """
+    import websockets
+
+    chunks = queue.Queue()
+
+    async def handler(connection):
+        try:
+            async for message in connection:
+                if isinstance(message, bytes):
+                    chunks.put(message)
+        finally:
+            done.set()
+
+    async def serve():
+        nonlocal done
+        done = asyncio.Event()
+        async with websockets.serve(handler, host, port, max_size=None):
+            if ready is not None:
+                ready.set()
+            await done.wait()
+
+    def run():
+        try:
+            asyncio.run(serve())
+        except Exception as e:
+            chunks.put(e)
+        chunks.put(None)
+
+    done = None
+    threading.Thread(target=run, name="live-websocket", daemon=True).start()
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            return
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield chunk
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe a call while it is happening.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--replay", metavar="AUDIO", help="Replay a recording, e.g. samples/test_sales_call.mp3")
+    source.add_argument("--file", metavar="PCM", help="Follow a growing raw PCM or WAV file")
+    source.add_argument("--websocket", metavar="HOST:PORT", help="Receive PCM from one WebSocket client")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed; 0 replays as fast as possible")
+    parser.add_argument("--window", type=float, default=WINDOW_SECONDS, help="Window length in seconds")
+    parser.add_argument("--step", type=float, default=STEP_SECONDS, help="Seconds between window starts")
+    parser.add_argument("--action-items-every", type=float, default=ACTION_ITEMS_SECONDS,
+                        help="Seconds of audio between action item passes")
+    parser.add_argument("--analyze", action="store_true", help="Run the full agent analysis when the call ends")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        stream = replay_source(args.replay, speed=args.speed)
+    elif args.file:
+        stream = file_source(args.file)
+    else:
+        host, _, port = args.websocket.rpartition(":")
+        stream = websocket_source(host or "127.0.0.1", int(port))
+
+    printed = 0
+    # Each pass lists every action item so far; only the new ones are printed
+    printed_items = set()
+
+    def on_update(section, value):
+        nonlocal printed
+        if section == "transcript":
+            # A word cut at a window boundary may be replaced, so only print what is past the old end
+            print(value[min(printed, len(value)):].strip(), flush=True)
+            printed = len(value)
+        else:
+            for item in value["action_items"]:
+                if item not in printed_items:
+                    printed_items.add(item)
+                    print(f"  [action] {item}", flush=True)
+
+    live = LiveTranscriber(window_seconds=args.window, step_seconds=args.step,
+                           action_items_seconds=args.action_items_every, on_update=on_update)
+    result = live.run(stream)
+    print(f"\n{live.buffer.seconds:.1f}s of audio in {result['lag']['windows']} windows; "
+          f"lag {result['lag']['mean']:.2f}s mean, {result['lag']['max']:.2f}s max")
+    if args.analyze and result["transcription"]:
+        from agent import get_sales_agent
+        analysis = get_sales_agent().process_transcription(result["transcription"])
+        print(f"\nSummary: {analysis['summary']}")
+        for item in analysis["action_items"]:
+            print(f"- {item}")
+
+
+if __name__ == "__main__":
+    main()
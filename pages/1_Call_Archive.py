@@ -0,0 +1,73 @@
+import time
+from datetime import datetime
+import streamlit as st
+from dotenv import load_dotenv
+from archive import get_call_archive
+from similarity import similar_calls
+
+# Load environment variables
+load_dotenv()
+
+st.set_page_config(
+    page_title="Call Archive",
+    page_icon="🔎",
+    layout="centered"
+)
+
+PAGE_SIZE = 20
+
+
+def render_call(call):
+    """Render one archived call as an expandable entry."""
+    created = datetime.fromtimestamp(call["created_at"]).strftime("%Y-%m-%d %H:%M")
+    with st.expander(f"{call['filename'] or 'Call'} · {created}"):
+        if call.get("snippet"):
+            st.markdown(f"…{call['snippet']}…")
+        if call["summary"]:
+            st.markdown("**Executive Summary**")
+            st.write(call["summary"])
+        if call["action_items"]:
+            st.markdown("**Action Items**")
+            st.markdown("\n".join(f"- {item}" for item in call["action_items"]))
+        if call["calendar"]:
+            st.markdown("**Calendar**")
+            st.write(call["calendar"])
+        if call["web_search"]:
+            st.markdown("**Web Search**")
+            st.write(call["web_search"])
+        if st.checkbox("Find similar calls", key=f"similar_{call['id']}"):
+            similar = similar_calls(call["id"], archive=archive)
+            for other in similar:
+                st.markdown(f"- **{other['filename'] or 'Call'}** ({other['score']:.0%} similar): {other['summary']}")
+            if not similar:
+                st.caption("This call is not in the similarity index yet.")
+        if st.checkbox("Show transcript", key=f"transcript_{call['id']}"):
+            st.text_area("Transcript", archive.get(call["id"])["transcription"], height=200,
+                         key=f"transcript_text_{call['id']}")
+
+
+st.title("🔎 Call Archive")
+
+archive = get_call_archive()
+if archive is None:
+    st.info("The call archive is turned off (CALL_ARCHIVE=0).")
+    st.stop()
+
+query = st.text_input("Search transcripts, summaries, action items and results",
+                      placeholder="e.g. Acme Corp pricing")
+page = st.number_input("Page", min_value=1, value=1, step=1)
+offset = (page - 1) * PAGE_SIZE
+
+started = time.perf_counter()
+calls = archive.search(query, limit=PAGE_SIZE, offset=offset) if query.strip() else archive.recent(PAGE_SIZE, offset)
+elapsed_ms = (time.perf_counter() - started) * 1000
+
+if query.strip():
+    st.caption(f"{len(calls)} matching calls on this page, out of {archive.count()} archived ({elapsed_ms:.1f} ms)")
+else:
+    st.caption(f"Most recent of {archive.count()} archived calls")
+
+if not calls:
+    st.info("No calls found." if query.strip() else "Processed calls will appear here.")
+for call in calls:
+    render_call(call)
@@ -0,0 +1,92 @@
+import glob
+import streamlit as st
+from dotenv import load_dotenv
+from agent import get_sales_agent
+from archive import archive_call
+from live import ACTION_ITEMS_SECONDS, LiveTranscriber, file_source, replay_source, websocket_source
+from similarity import index_call_in_background
+
+# Load environment variables
+load_dotenv()
+
+st.set_page_config(
+    page_title="Live Call",
+    page_icon="🔴",
+    layout="centered"
+)
+
+
+def render_action_items(items):
+    """Render the live action item pass."""
+    if items["action_items"]:
+        st.markdown("**Action Items so far**")
+        st.markdown("\n".join(f"- {item}" for item in items["action_items"]))
+    for meeting in items["meetings"]:
+        st.caption(f"📅 {meeting['start_time'].replace('T', ' ')[:16]}: {meeting['title']}")
+
+
+st.title("🔴 Live Call")
+st.caption("Transcribes the call while it is happening, a few seconds behind the audio. "
+           f"Action items are refreshed every {ACTION_ITEMS_SECONDS:.0f} seconds of audio.")
+
+source_name = st.radio("Audio source", ["Replay a sample", "Growing file", "WebSocket"], horizontal=True)
+if source_name == "Replay a sample":
+    samples = sorted(glob.glob("samples/*.mp3"))
+    sample = st.selectbox("Recording", samples)
+    speed = st.slider("Replay speed", min_value=1.0, max_value=10.0, value=1.0, step=0.5)
+elif source_name == "Growing file":
+    pcm_path = st.text_input("Raw 16 kHz mono PCM or WAV file", placeholder="call.pcm")
+else:
+    address = st.text_input("Listen on", value="127.0.0.1:8765")
+
+if st.button("Start", type="primary"):
+    if source_name == "Replay a sample":
+        source = replay_source(sample, speed=speed)
+    elif source_name == "Growing file":
+        source = file_source(pcm_path)
+    else:
+        host, _, port = address.rpartition(":")
+        source = websocket_source(host or "127.0.0.1", int(port))
+        st.info(f"Waiting for audio on ws://{address}")
+
+    transcript_box = st.empty()
+    action_items_box = st.empty()
+    lag_box = st.empty()
+
+    def on_update(section, value):
+        if section == "transcript":
+            transcript_box.text_area("Transcript", value, height=250)
+            if transcriber.lags:
+                lag_box.caption(f"{transcriber.buffer.seconds:.0f}s of audio · {transcriber.lags[-1]:.1f}s behind")
+        else:
+            with action_items_box.container():
+                render_action_items(value)
+
+    transcriber = LiveTranscriber(on_update=on_update)
+    try:
+        with st.spinner("Listening..."):
+            st.session_state.live_result = transcriber.run(source)
+            st.session_state.live_filename = sample if source_name == "Replay a sample" else None
+    except Exception as e:
+        st.error(f"Live transcription stopped: {e}")
+
+result = st.session_state.get("live_result")
+if result:
+    lag = result["lag"]
+    st.success(f"Call ended. Transcript arrived {lag['mean']:.1f}s behind the audio on average ({lag['max']:.1f}s at most).")
+    if st.button("Analyze call"):
+        with st.spinner("Analyzing call content..."):
+            analysis = get_sales_agent().process_transcription(result["transcription"])
+            analysis["transcription"] = result["transcription"]
+            call_id = archive_call(analysis, filename=st.session_state.get("live_filename"))
+            index_call_in_background(call_id, analysis)
+        st.markdown("**Executive Summary**")
+        st.write(analysis.get("summary", ""))
+        st.markdown("**Action Items**")
+        st.markdown("\n".join(f"- {item}" for item in analysis.get("action_items", [])))
+        if analysis.get("calendar"):
+            st.markdown("**Calendar**")
+            st.write(analysis["calendar"])
+        if analysis.get("web_search"):
+            st.markdown("**Web Search**")
+            st.write(analysis["web_search"])
@@ -0,0 +1,47 @@
+import time
+from transcriber import transcribe_audio
+from agent import get_sales_agent
+from archive import archive_call
+from similarity import index_call_in_background
+from tracing import span
+
+
+def process_recording(audio_file_path, agent=None, on_progress=None, archive=None, filename=None):
+    """
+    Run the full pipeline on one recording: transcribe it, then analyze the
+    transcript and run the calendar and web search tools.
+
+    Args:
+        audio_file_path (str): Path to the audio file
+        agent (SalesCallAgent, optional): Agent to use; defaults to the shared one
+        on_progress (callable, optional): Called with the stage name
+            ("transcribing", "analyzing") as each stage starts
+        archive (CallArchive, optional): Archive to store the result in;
+            defaults to the process-wide one (off with CALL_ARCHIVE=0). Archived
+            calls are also added to the similarity index, on a background thread
+        filename (str, optional): Name to archive the call under; defaults
+            to the file's name
+
+    Returns:
+        dict: transcription, summary, action_items, calendar, web_search and
+            seconds (wall-clock time for the whole pipeline)
+    """
+    started = time.perf_counter()
+    with span("pipeline", path=audio_file_path):
+        if on_progress:
+            on_progress("transcribing")
+        transcription = transcribe_audio(audio_file_path)
+        if on_progress:
+            on_progress("analyzing")
+        agent_output = (agent or get_sales_agent()).process_transcription(transcription)
+    result = {
+        "transcription": transcription,
+        "summary": agent_output.get("summary", ""),
+        "action_items": agent_output.get("action_items", []),
+        "calendar": agent_output.get("calendar", ""),
+        "web_search": agent_output.get("web_search", ""),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    call_id = archive_call(result, audio_file_path, filename=filename, archive=archive)
+    index_call_in_background(call_id, result)
+    return result
@@ -0,0 +1,174 @@
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Whisper works at 16 kHz mono internally, so anything above that is wasted upload
+TARGET_SAMPLE_RATE = 16000
+TARGET_BITRATE = os.getenv("PREPROCESS_BITRATE", "24k")
+SILENCE_THRESHOLD = "-50dB"
+
+# Used to estimate how much upload time the smaller payload saves
+UPLOAD_BANDWIDTH_MBPS = float(os.getenv("UPLOAD_BANDWIDTH_MBPS", "10"))
+
+# Only silence at the very start and end is trimmed, so pauses inside the call
+# keep their length and segment times map back to the original recording.
+# The bounds come from a decode-only silencedetect pass, which streams the
+# audio rather than holding the whole decoded call in memory.
+MIN_TRIM_SECONDS = 0.5
+# Silence kept on either side of the speech
+TRIM_PADDING_SECONDS = 0.2
+
+_SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end: (-?[\d.]+)")
+_DURATION = re.compile(r"Duration: (\d+):(\d\d):(\d\d(?:\.\d+)?)")
+
+
+def ffmpeg_available():
+    """Return True if the ffmpeg binary is on PATH."""
+    return shutil.which("ffmpeg") is not None
+
+
+def speech_bounds(silencedetect_log):
+    """
+    Find where speech starts and ends from ffmpeg's silencedetect output.
+
+    Args:
+        silencedetect_log (str): ffmpeg stderr from a silencedetect pass
+
+    Returns:
+        tuple: (start_seconds, end_seconds) to keep, padded by
+            TRIM_PADDING_SECONDS; end_seconds is None to keep the tail
+    """
+    starts = [float(value) for value in _SILENCE_START.findall(silencedetect_log)]
+    ends = [float(value) for value in _SILENCE_END.findall(silencedetect_log)]
+    duration = _DURATION.search(silencedetect_log)
+    duration = int(duration[1]) * 3600 + int(duration[2]) * 60 + float(duration[3]) if duration else None
+
+    start, end = 0.0, None
+    if starts and starts[0] <= 0.05 and ends:
+        start = max(0.0, ends[0] - TRIM_PADDING_SECONDS)
+    if starts and starts[-1] > start:
+        # Silence running to the end of the file has no silence_end, or one at the very end
+        open_ended = len(ends) < len(starts) or (duration is not None and ends[-1] >= duration - 0.05)
+        if open_ended:
+            end = starts[-1] + TRIM_PADDING_SECONDS
+    return start, end
+
+
+def _probe_speech_bounds(audio_file_path):
+    """Run silencedetect over the file; on failure nothing is trimmed."""
+    try:
+        result = subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-nostats",
+                "-i", audio_file_path,
+                "-af", f"silencedetect=noise={SILENCE_THRESHOLD}:d={MIN_TRIM_SECONDS}",
+                "-f", "null", "-",
+            ],
+            check=True,
+            capture_output=True,
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.warning("Silence detection failed for %s: %s", audio_file_path, e)
+        return 0.0, None
+    return speech_bounds(result.stderr.decode(errors="replace"))
+
+
+def preprocess_audio(audio_file_path, output_dir=None):
+    """
+    Shrink an audio file before upload: downmix to mono, resample to 16 kHz,
+    trim leading and trailing silence and re-encode as low-bitrate Opus.
+
+    The original file is returned unchanged if ffmpeg is missing, encoding
+    fails, or the result is not smaller.
+
+    Args:
+        audio_file_path (str): Path to the audio file
+        output_dir (str, optional): Directory for the encoded file
+
+    Returns:
+        dict: path, original_bytes, encoded_bytes, bytes_saved,
+            encode_seconds, upload_seconds_saved, time_saved,
+            trim_start_seconds (add it to times in the encoded file to get
+            times in the original) and is_temporary (True when path is a new
+            file the caller must delete)
+    """
+    original_bytes = os.path.getsize(audio_file_path)
+    report = {
+        "path": audio_file_path,
+        "original_bytes": original_bytes,
+        "encoded_bytes": original_bytes,
+        "bytes_saved": 0,
+        "encode_seconds": 0.0,
+        "upload_seconds_saved": 0.0,
+        "time_saved": 0.0,
+        "trim_start_seconds": 0.0,
+        "is_temporary": False,
+    }
+    if not ffmpeg_available():
+        logger.warning("ffmpeg not found; uploading %s without preprocessing", audio_file_path)
+        return report
+
+    fd, output_path = tempfile.mkstemp(suffix=".ogg", dir=output_dir)
+    os.close(fd)
+    started = time.perf_counter()
+    trim_start, trim_end = _probe_speech_bounds(audio_file_path)
+    trim = ["-ss", f"{trim_start:.3f}"]
+    if trim_end is not None:
+        trim += ["-to", f"{trim_end:.3f}"]
+    try:
+        subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                "-i", audio_file_path,
+                *trim,
+                "-ac", "1",
+                "-ar", str(TARGET_SAMPLE_RATE),
+                "-c:a", "libopus", "-b:a", TARGET_BITRATE, "-application", "voip",
+                output_path,
+            ],
+            check=True,
+            capture_output=True,
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        os.unlink(output_path)
+        stderr = getattr(e, "stderr", b"") or b""
+        logger.warning("Audio preprocessing failed for %s: %s", audio_file_path, stderr.decode(errors="replace") or e)
+        return report
+    encode_seconds = time.perf_counter() - started
+
+    encoded_bytes = os.path.getsize(output_path)
+    if encoded_bytes == 0 or encoded_bytes >= original_bytes:
+        os.unlink(output_path)
+        report["encode_seconds"] = encode_seconds
+        report["time_saved"] = -encode_seconds
+        return report
+
+    bytes_saved = original_bytes - encoded_bytes
+    upload_seconds_saved = bytes_saved * 8 / (UPLOAD_BANDWIDTH_MBPS * 1_000_000)
+    report.update({
+        "path": output_path,
+        "encoded_bytes": encoded_bytes,
+        "bytes_saved": bytes_saved,
+        "encode_seconds": encode_seconds,
+        "upload_seconds_saved": upload_seconds_saved,
+        "time_saved": upload_seconds_saved - encode_seconds,
+        "trim_start_seconds": trim_start,
+        "is_temporary": True,
+    })
+    logger.info(
+        "Preprocessed %s: %d -> %d bytes (%.0f%% smaller), encode %.2fs, est. upload time saved %.2fs",
+        audio_file_path, original_bytes, encoded_bytes,
+        100.0 * bytes_saved / original_bytes, encode_seconds, upload_seconds_saved,
+    )
+    return report
@@ -0,0 +1,325 @@
+import asyncio
+import collections
+import contextlib
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Per-provider defaults; each can be overridden with <PROVIDER>_RATE_PER_SECOND,
+# <PROVIDER>_BURST, <PROVIDER>_MAX_CONCURRENCY and <PROVIDER>_MAX_RETRIES
+PROVIDER_DEFAULTS = {
+    "openai": {"rate_per_second": 8.0, "burst": 16, "max_concurrency": 16, "max_retries": 6},
+    "serpapi": {"rate_per_second": 2.0, "burst": 5, "max_concurrency": 4, "max_retries": 4},
+}
+
+# Number of processes sharing each provider quota; every limiter gets 1/N of it.
+# batch.py --processes sets this in its workers.
+RATE_LIMIT_PROCESSES = int(os.getenv("RATE_LIMIT_PROCESSES", "1"))
+
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+
+
+class RateLimitedError(Exception):
+    """Raised by a provider call that was rejected with HTTP 429."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket refilled at rate_per_second up to burst tokens."""
+
+    def __init__(self, rate_per_second, burst):
+        self.rate = rate_per_second
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take one token, going into debt if none are left.
+
+        Returns:
+            float: Seconds the caller must wait before using its token
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit tuned by additive-increase / multiplicative-decrease:
+    halved on every rate-limit response, raised by one after a run of
+    successes as long as the limit itself.
+    """
+
+    def __init__(self, max_limit, min_limit=1, initial=None):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = initial or max(min_limit, max_limit // 2)
+        self.in_flight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+        # (loop, future) pairs of coroutines waiting in aacquire, oldest first
+        self._async_waiters = collections.deque()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit or self._async_waiters:
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        """Async version of acquire. Waiting coroutines are woken by release in arrival order."""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self.in_flight < self.limit and not self._async_waiters:
+                self.in_flight += 1
+                return
+            waiter = loop.create_future()
+            self._async_waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._cond:
+                if (loop, waiter) in self._async_waiters:
+                    self._async_waiters.remove((loop, waiter))
+                    return_slot = False
+                else:
+                    # The slot was already handed over; a cancelled future gives it back in _grant
+                    return_slot = not waiter.cancelled()
+            if return_slot:
+                self.release()
+            raise
+
+    def _grant(self, waiter):
+        if waiter.cancelled():
+            self.release()
+        else:
+            waiter.set_result(None)
+
+    def _wake(self):
+        # Called with _cond held: hand free slots to queued coroutines first, then to threads
+        while self.in_flight < self.limit and self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            self.in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._grant, waiter)
+            except RuntimeError:
+                # The waiter's event loop is closed
+                self.in_flight -= 1
+        self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._wake()
+
+    def on_success(self):
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._wake()
+
+    def on_rate_limited(self):
+        with self._cond:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._successes = 0
+
+
+def _status_code(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None and getattr(exc, "response", None) is not None:
+        status = getattr(exc.response, "status_code", None)
+    return status
+
+
+def is_rate_limited(exc):
+    return isinstance(exc, RateLimitedError) or _status_code(exc) == 429
+
+
+def _connection_error_types():
+    """Connection and timeout errors of the HTTP clients in use. Only loaded modules are checked, to keep imports lazy."""
+    types = [ConnectionError, TimeoutError]
+    requests = sys.modules.get("requests")
+    if requests is not None:
+        types += [requests.exceptions.ConnectionError, requests.exceptions.Timeout]
+    httpx = sys.modules.get("httpx")
+    if httpx is not None:
+        types.append(httpx.TransportError)
+    openai = sys.modules.get("openai")
+    if openai is not None:
+        # Also covers APITimeoutError
+        types.append(openai.APIConnectionError)
+    return tuple(types)
+
+
+def is_transient(exc):
+    """True for failures worth retrying: rate limits, 5xx responses and connection errors."""
+    if is_rate_limited(exc):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status >= 500
+    return isinstance(exc, _connection_error_types())
+
+
+def _retry_after(exc):
+    retry_after = getattr(exc, "retry_after", None)
+    response = getattr(exc, "response", None)
+    if retry_after is None and response is not None:
+        retry_after = getattr(response, "headers", {}).get("retry-after")
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderLimiter:
+    """
+    Shared rate limiter and retry scheduler for one external provider.
+
+    Every call takes a token from the provider's bucket and a slot from its
+    adaptive concurrency limit. Transient failures are retried with jittered
+    exponential backoff; rate-limit responses also halve the concurrency limit.
+    """
+
+    def __init__(self, name, rate_per_second, burst, max_concurrency, max_retries):
+        self.name = name
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.rate_limited = 0
+        self.retries = 0
+
+    def _backoff(self, attempt, exc):
+        delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _on_failure(self, attempt, exc):
+        """Record a failed attempt. Returns the backoff delay, or raises if it should not be retried."""
+        if is_rate_limited(exc):
+            self.rate_limited += 1
+            self.concurrency.on_rate_limited()
+        if attempt >= self.max_retries or not is_transient(exc):
+            raise exc
+        self.retries += 1
+        delay = self._backoff(attempt, exc)
+        logger.info("%s call failed (%s); retry %d in %.2fs", self.name, exc, attempt + 1, delay)
+        return delay
+
+    def call(self, func, *args, **kwargs):
+        """Call func(*args, **kwargs) under the limiter, retrying transient failures."""
+        attempt = 0
+        while True:
+            time.sleep(self.bucket.reserve())
+            self.concurrency.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self.concurrency.release()
+                time.sleep(self._on_failure(attempt, e))
+                attempt += 1
+                continue
+            self.concurrency.release()
+            self.concurrency.on_success()
+            return result
+
+    async def acall(self, func, *args, **kwargs):
+        """Async version of call for coroutine functions."""
+        async with self.ahold(func, *args, **kwargs) as result:
+            return result
+
+    @contextlib.asynccontextmanager
+    async def ahold(self, func, *args, **kwargs):
+        """
+        Like acall, but keep the concurrency slot until the with block exits.
+
+        Use this for results that are consumed after func returns, such as
+        streamed completions, so the slot covers the whole response.
+        """
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.bucket.reserve())
+            await self.concurrency.aacquire()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                self.concurrency.release()
+                await asyncio.sleep(self._on_failure(attempt, e))
+                attempt += 1
+                continue
+            break
+        try:
+            yield result
+        finally:
+            self.concurrency.release()
+        self.concurrency.on_success()
+
+    def stats(self):
+        return {
+            "concurrency_limit": self.concurrency.limit,
+            "in_flight": self.concurrency.in_flight,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+        }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider):
+    """
+    Return the process-wide limiter for provider ("openai" or "serpapi").
+
+    The configured rate, burst and concurrency are the provider's whole quota;
+    with RATE_LIMIT_PROCESSES=N each process takes 1/N of it.
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            defaults = PROVIDER_DEFAULTS[provider]
+            prefix = provider.upper()
+            share = max(1, RATE_LIMIT_PROCESSES)
+            _limiters[provider] = ProviderLimiter(
+                provider,
+                rate_per_second=float(os.getenv(f"{prefix}_RATE_PER_SECOND", defaults["rate_per_second"])) / share,
+                burst=max(1, int(os.getenv(f"{prefix}_BURST", defaults["burst"])) // share),
+                max_concurrency=max(1, int(os.getenv(f"{prefix}_MAX_CONCURRENCY", defaults["max_concurrency"])) // share),
+                max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", defaults["max_retries"])),
+            )
+        return _limiters[provider]
+
+
+def set_process_share(processes):
+    """
+    Split every provider quota between processes worker processes.
+
+    Called in each worker of a process pool; limiters inherited from the
+    parent are dropped so they are rebuilt with the smaller share.
+    """
+    global RATE_LIMIT_PROCESSES
+    with _limiters_lock:
+        RATE_LIMIT_PROCESSES = processes
+        _limiters.clear()
@@ -0,0 +1,303 @@
+"""
+Headless HTTP job service in front of the transcribe-and-analyze pipeline.
+
+Usage:
+    python service.py --port 8000 --workers 2 --queue-size 16
+
+Endpoints:
+    POST /jobs                 Body is the raw audio file. Returns 202 with a job ID,
+                               or 429 when the queue is full.
+    GET  /jobs/<id>            Job status and, once done, the result.
+    GET  /jobs/<id>/events     Server-sent events stream of status changes.
+    GET  /healthz              Queue depth and worker count.
+    GET  /metrics              Prometheus metrics (stage latencies, LLM tokens and cost, tool calls).
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+from tracing import metrics, render_metrics
+from uploads import MAX_UPLOAD_BYTES, remove_file, save_upload
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger("service")
+
+# Finished jobs kept for polling before the oldest are forgotten
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "1000"))
+EVENTS_KEEPALIVE_SECONDS = 15
+
+TERMINAL_STATUSES = ("done", "error")
+JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})(/events)?$")
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    def __init__(self, audio_file_path, filename):
+        self.id = uuid.uuid4().hex
+        self.audio_file_path = audio_file_path
+        self.filename = filename
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        # Bumped on every change so event streams can wait for the next one
+        self.version = 0
+        self.changed = threading.Condition()
+
+    def update(self, status, result=None, error=None):
+        with self.changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            if status in TERMINAL_STATUSES:
+                self.finished_at = time.time()
+            self.version += 1
+            self.changed.notify_all()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Bounded job queue drained by a fixed pool of worker threads. Submissions
+    beyond max_queued waiting jobs are rejected rather than buffered.
+    """
+
+    def __init__(self, process, workers=2, max_queued=16):
+        self.process = process
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def is_full(self):
+        return self._queue.full()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, audio_file_path, filename):
+        """Queue a job for audio_file_path. Raises QueueFull at capacity."""
+        job = Job(audio_file_path, filename)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                metrics.inc("jobs_rejected_total", 1, "Job submissions rejected because the queue was full")
+                raise QueueFull()
+            self._jobs[job.id] = job
+            self._forget_old_jobs()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in TERMINAL_STATUSES]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                result = self.process(job.audio_file_path, on_progress=job.update, filename=job.filename)
+                job.update("done", result=result)
+            except Exception as e:
+                logger.warning("Job %s failed: %s", job.id, e)
+                job.update("error", error=str(e))
+            finally:
+                remove_file(job.audio_file_path)
+                self._queue.task_done()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def jobs(self):
+        return self.server.jobs
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reject(self, status, message, headers=None):
+        # The request body may be unread, so the connection cannot be reused
+        self.close_connection = True
+        self._send_json(status, {"error": message}, dict(headers or {}, Connection="close"))
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"queued": self.jobs.depth(), "workers": self.jobs.workers})
+            return
+        if self.path == "/metrics":
+            body = (render_metrics()
+                    + "# HELP job_queue_depth Jobs waiting for a worker\n# TYPE job_queue_depth gauge\n"
+                    + f"job_queue_depth {self.jobs.depth()}\n").encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        match = JOB_PATH.match(self.path)
+        job = self.jobs.get(match.group(1)) if match else None
+        if job is None:
+            self._send_json(404, {"error": "Job not found"})
+        elif match.group(2):
+            self._stream_events(job)
+        else:
+            self._send_json(200, job.to_dict())
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0] != "/jobs":
+            self._reject(404, "Not found")
+            return
+        # Check capacity before accepting the upload so a saturated service stays cheap
+        if self.jobs.is_full():
+            metrics.inc("jobs_rejected_total", 1, "Job submissions rejected because the queue was full")
+            self._reject(429, "Job queue is full, retry later", {"Retry-After": "30"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._reject(411, "Content-Length required")
+            return
+        if length <= 0:
+            self._reject(400, "Request body must be the audio file")
+            return
+        if length > MAX_UPLOAD_BYTES:
+            self._reject(413, f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+            return
+
+        filename = self.headers.get("X-Filename", "upload.mp3")
+        suffix = os.path.splitext(filename)[1] or ".mp3"
+        try:
+            audio_file_path = save_upload(self.rfile, suffix, length=length)
+        except ConnectionError:
+            self.close_connection = True
+            return
+        try:
+            job = self.jobs.submit(audio_file_path, filename)
+        except QueueFull:
+            remove_file(audio_file_path)
+            self._reject(429, "Job queue is full, retry later", {"Retry-After": "30"})
+            return
+
+        self._send_json(202, {
+            "id": job.id,
+            "status": job.status,
+            "status_url": f"/jobs/{job.id}",
+            "events_url": f"/jobs/{job.id}/events",
+        }, {"Location": f"/jobs/{job.id}"})
+
+    def _stream_events(self, job):
+        """Send a server-sent event for each status change until the job finishes."""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        seen = -1
+        try:
+            while True:
+                with job.changed:
+                    if job.version == seen:
+                        job.changed.wait(EVENTS_KEEPALIVE_SECONDS)
+                    version, payload = job.version, job.to_dict()
+                if version == seen:
+                    self.wfile.write(b": keep-alive\n\n")
+                else:
+                    seen = version
+                    self.wfile.write(f"event: {payload['status']}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if payload["status"] in TERMINAL_STATUSES:
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+
+def create_server(host="127.0.0.1", port=8000, workers=2, max_queued=16, process=None):
+    """
+    Build the HTTP server and its job queue.
+
+    Args:
+        process (callable, optional): Pipeline function called as
+            process(audio_file_path, on_progress=..., filename=...); defaults
+            to pipeline.process_recording
+    """
+    if process is None:
+        from pipeline import process_recording as process
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.jobs = JobQueue(process, workers=workers, max_queued=max_queued)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP job service for sales call processing.")
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVICE_WORKERS", "2")))
+    parser.add_argument("--queue-size", type=int, default=int(os.getenv("SERVICE_QUEUE_SIZE", "16")))
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", default=os.getenv("WARMUP", "1") != "0",
+                        help="Skip loading the agent's dependencies and clients at startup")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.warmup:
+        from agent import warmup
+        warmup(background=True)
+    server = create_server(args.host, args.port, args.workers, args.queue_size)
+    logger.info("Listening on http://%s:%d with %d workers", args.host, args.port, args.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+Semantic similarity index over past calls.
+
+Each processed call's summary and transcript are embedded with the OpenAI
+embeddings API. The unit-normalized vectors are stored as rows of a
+float32 .npy matrix that is memory-mapped rather than loaded, with the
+archive call IDs in an append-only int64 sidecar file. New calls are
+appended in place (the matrix grows by doubling). Top-k cosine queries
+scan the matrix in fixed-size blocks, so memory use stays flat as the
+corpus grows.
+
+Usage:
+    python similarity.py --backfill           # index archived calls not indexed yet
+    python similarity.py --query "Acme Corp pricing objection"
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dotenv import load_dotenv
+from clients import get_openai_client
+from ratelimit import get_limiter
+from tracing import record_llm_call, span
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (Windows): writers are only serialized within one process
+    fcntl = None
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+# text-embedding-3 models can return shortened vectors; 512 keeps most of the quality at a third of the size
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "512"))
+EMBED_BATCH_SIZE = 64
+# Roughly 6000 tokens, inside the embedding models' 8191 token input limit
+EMBED_MAX_CHARS = 24000
+
+INITIAL_CAPACITY = 1024
+# Rows scored per step of a query; bounds query memory to about 8192 * dims * 4 bytes
+QUERY_BLOCK_ROWS = 8192
+
+
+def call_text(result):
+    """The text embedded for a call: its summary and action items, then as much transcript as fits."""
+    parts = [
+        result.get("summary") or "",
+        "\n".join(result.get("action_items") or []),
+        result.get("transcription") or "",
+    ]
+    return "\n\n".join(part for part in parts if part)[:EMBED_MAX_CHARS]
+
+
+def embed_texts(texts, client=None, model=None, dimensions=None):
+    """
+    Embed texts in batches through the shared OpenAI rate limiter.
+
+    Args:
+        texts (list): Strings to embed
+        client (OpenAI, optional): Client to use
+        model (str, optional): Embedding model; defaults to EMBEDDING_MODEL
+        dimensions (int, optional): Vector size; defaults to EMBEDDING_DIMENSIONS
+
+    Returns:
+        numpy.ndarray: float32 matrix with one row per text
+    """
+    client = client or get_openai_client()
+    model = model or EMBEDDING_MODEL
+    dimensions = dimensions or EMBEDDING_DIMENSIONS
+    vectors = np.empty((len(texts), dimensions), dtype=np.float32)
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batch = [text or " " for text in texts[start:start + EMBED_BATCH_SIZE]]
+        with span("llm.embedding", model=model, inputs=len(batch)):
+            response = get_limiter("openai").call(
+                client.embeddings.create, model=model, input=batch, dimensions=dimensions
+            )
+            record_llm_call(response.model or model, response.usage.prompt_tokens, 0, stage="embedding")
+        for item in response.data:
+            vectors[start + item.index] = item.embedding
+    return vectors
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class SimilarityIndex:
+    """
+    Append-only matrix of unit-normalized call embeddings on disk.
+
+    embeddings.npy holds the vectors (with spare capacity at the end) and
+    ids.bin the archive call ID of each written row; a row only counts once
+    its ID is in ids.bin, so an interrupted append leaves the index
+    consistent. Several processes can share a directory: each write holds an
+    exclusive lock on index.lock and first picks up the rows the others
+    appended, so batch workers, the service and the app can all index calls.
+    """
+
+    def __init__(self, directory, dimensions=None):
+        self.directory = directory
+        self.dimensions = dimensions or EMBEDDING_DIMENSIONS
+        self.matrix_path = os.path.join(directory, "embeddings.npy")
+        self.ids_path = os.path.join(directory, "ids.bin")
+        self.lock_path = os.path.join(directory, "index.lock")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._matrix = None
+        self._matrix_inode = None
+        self._ids = np.empty(0, dtype="<i8")
+        self._positions = {}
+        with self._locked(exclusive=True):
+            # Drop a partly written ID and any IDs past the end of the matrix, so later appends line up
+            self._refresh(repair=True)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, call_id):
+        return int(call_id) in self._positions
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        """Hold the in-process lock and a shared or exclusive lock on index.lock."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self, repair=False):
+        """
+        Catch up with rows other processes wrote since we last looked. Caller holds the lock.
+
+        Args:
+            repair (bool): Truncate IDs that have no committed row; needs the exclusive lock
+        """
+        if os.path.exists(self.matrix_path):
+            inode = os.stat(self.matrix_path).st_ino
+            if inode != self._matrix_inode:
+                # Another process grew the matrix and swapped in a new file
+                self._matrix = np.lib.format.open_memmap(self.matrix_path, mode="r+")
+                self._matrix_inode = inode
+                if self._matrix.shape[1] != self.dimensions:
+                    raise ValueError(
+                        f"Index at {self.directory} has {self._matrix.shape[1]} dimensions, expected {self.dimensions}"
+                    )
+        size = os.path.getsize(self.ids_path) if os.path.exists(self.ids_path) else 0
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        rows = min(size // 8, capacity)
+        if rows < len(self._ids):
+            # The file was trimmed under us; start over
+            self._ids = np.empty(0, dtype="<i8")
+            self._positions = {}
+        if rows > len(self._ids):
+            with open(self.ids_path, "rb") as ids_file:
+                ids_file.seek(len(self._ids) * 8)
+                appended = np.frombuffer(ids_file.read((rows - len(self._ids)) * 8), dtype="<i8")
+            self._positions.update({int(call_id): len(self._ids) + i for i, call_id in enumerate(appended)})
+            self._ids = np.concatenate([self._ids, appended])
+        if repair and size != rows * 8:
+            with open(self.ids_path, "r+b" if size else "wb") as ids_file:
+                ids_file.truncate(rows * 8)
+
+    def _reserve(self, rows):
+        """Make room for at least rows rows, doubling the matrix file when full. Caller holds the exclusive lock."""
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, INITIAL_CAPACITY)
+        tmp_path = self.matrix_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(new_capacity, self.dimensions))
+        for start in range(0, len(self._ids), QUERY_BLOCK_ROWS):
+            end = min(start + QUERY_BLOCK_ROWS, len(self._ids))
+            grown[start:end] = self._matrix[start:end]
+        grown.flush()
+        del grown
+        self._matrix = None
+        os.replace(tmp_path, self.matrix_path)
+        self._matrix = np.lib.format.open_memmap(self.matrix_path, mode="r+")
+        self._matrix_inode = os.stat(self.matrix_path).st_ino
+
+    def add(self, call_ids, vectors):
+        """
+        Add or replace the embeddings of calls.
+
+        Args:
+            call_ids (list): Archive call IDs
+            vectors (array-like): One embedding per ID
+        """
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(call_ids), self.dimensions))
+        with self._locked(exclusive=True):
+            self._refresh(repair=True)
+            new_ids, new_rows = [], []
+            for call_id, vector in zip(call_ids, vectors):
+                row = self._positions.get(int(call_id))
+                if row is not None:
+                    self._matrix[row] = vector
+                else:
+                    new_ids.append(int(call_id))
+                    new_rows.append(vector)
+            if new_ids:
+                start = len(self._ids)
+                self._reserve(start + len(new_ids))
+                self._matrix[start:start + len(new_ids)] = np.stack(new_rows)
+            if self._matrix is not None:
+                self._matrix.flush()
+            if new_ids:
+                # Appending the IDs is what commits the new rows
+                appended = np.asarray(new_ids, dtype="<i8")
+                with open(self.ids_path, "ab") as ids_file:
+                    ids_file.write(appended.tobytes())
+                self._positions.update({call_id: start + i for i, call_id in enumerate(new_ids)})
+                self._ids = np.concatenate([self._ids, appended])
+
+    def vector(self, call_id):
+        """Return the stored (normalized) embedding of a call, or None."""
+        with self._locked(exclusive=False):
+            self._refresh()
+            row = self._positions.get(int(call_id))
+            return None if row is None else np.array(self._matrix[row])
+
+    def search(self, queries, k=5, exclude_ids=None):
+        """
+        Find the k most similar calls for each query vector.
+
+        Args:
+            queries (array-like): One query vector, or a matrix of them
+            k (int): Results per query
+            exclude_ids (iterable, optional): Call IDs never to return
+
+        Returns:
+            list: For each query, [(call_id, cosine_similarity), ...] best first
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        with self._locked(exclusive=False):
+            self._refresh()
+            matrix, ids = self._matrix, self._ids
+            excluded = np.array(
+                sorted(self._positions[int(i)] for i in (exclude_ids or ()) if int(i) in self._positions),
+                dtype=np.int64
+            )
+        count = len(ids)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, count, QUERY_BLOCK_ROWS):
+            end = min(start + QUERY_BLOCK_ROWS, count)
+            scores = queries @ matrix[start:end].T
+            in_block = excluded[(excluded >= start) & (excluded < end)]
+            scores[:, in_block - start] = -np.inf
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [
+            [(int(ids[row]), float(score)) for row, score in zip(rows, scores) if np.isfinite(score)]
+            for rows, scores in zip(best_rows, best_scores)
+        ]
+
+    def similar_to(self, call_id, k=5):
+        """Return the k calls most similar to an indexed call, excluding itself."""
+        vector = self.vector(call_id)
+        if vector is None:
+            return []
+        return self.search(vector, k, exclude_ids=[call_id])[0]
+
+
+_similarity_index = None
+_similarity_index_lock = threading.Lock()
+
+
+def get_similarity_index():
+    """
+    Return the process-wide similarity index, configured from the environment.
+
+    SIMILARITY_INDEX=0 disables it; SIMILARITY_INDEX_DIR sets where it is
+    stored (default data/similarity).
+    """
+    global _similarity_index
+    if os.getenv("SIMILARITY_INDEX", "1") == "0":
+        return None
+    with _similarity_index_lock:
+        if _similarity_index is None:
+            _similarity_index = SimilarityIndex(os.getenv("SIMILARITY_INDEX_DIR", os.path.join("data", "similarity")))
+        return _similarity_index
+
+
+def index_call(call_id, result, index=None):
+    """
+    Embed a processed call and add it to the index. Failures are logged
+    rather than raised: indexing never fails the call itself.
+
+    Returns:
+        bool: Whether the call was indexed
+    """
+    index = index if index is not None else get_similarity_index()
+    if index is None or call_id is None:
+        return False
+    try:
+        index.add([call_id], embed_texts([call_text(result)], dimensions=index.dimensions))
+        return True
+    except Exception as e:
+        logger.warning("Could not index call %s: %s", call_id, e)
+        return False
+
+
+_index_executor = None
+
+
+def index_call_in_background(call_id, result, index=None):
+    """
+    Queue index_call on a background thread, so the paid embeddings request
+    does not hold up the caller. Calls are indexed one at a time, in order.
+
+    Returns:
+        concurrent.futures.Future: Resolves to index_call's result
+    """
+    global _index_executor
+    with _similarity_index_lock:
+        if _index_executor is None:
+            _index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similarity-index")
+    return _index_executor.submit(index_call, call_id, result, index)
+
+
+def similar_calls(call_id, k=5, archive=None, index=None):
+    """
+    Return the archived calls most similar to an indexed call.
+
+    Returns:
+        list: Archive call dicts, best match first, each with a "score"
+            (cosine similarity)
+    """
+    if archive is None:
+        from archive import get_call_archive
+        archive = get_call_archive()
+    index = index if index is not None else get_similarity_index()
+    if archive is None or index is None or call_id is None:
+        return []
+    calls = []
+    for similar_id, score in index.similar_to(call_id, k):
+        call = archive.get(similar_id)
+        if call is not None:
+            calls.append(dict(call, score=score))
+    return calls
+
+
+def backfill(archive, index, batch_size=EMBED_BATCH_SIZE):
+    """
+    Embed every archived call that is not in the index yet.
+
+    Returns:
+        int: Number of calls indexed
+    """
+    indexed = 0
+    offset = 0
+    while True:
+        calls = archive.recent(limit=batch_size, offset=offset)
+        if not calls:
+            return indexed
+        offset += len(calls)
+        missing = [call for call in calls if call["id"] not in index]
+        if missing:
+            index.add(
+                [call["id"] for call in missing],
+                embed_texts([call_text(call) for call in missing], dimensions=index.dimensions)
+            )
+            indexed += len(missing)
+            logger.info("Indexed %d calls", indexed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the similar-call index.")
+    parser.add_argument("--backfill", action="store_true", help="Index archived calls that are not indexed yet")
+    parser.add_argument("--query", help="Print the archived calls most similar to this text")
+    parser.add_argument("-k", type=int, default=5, help="Number of results (default: 5)")
+    args = parser.parse_args(argv)
+    if not args.backfill and not args.query:
+        parser.error("give --backfill and/or --query")
+
+    from archive import get_call_archive
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    archive, index = get_call_archive(), get_similarity_index()
+    if archive is None or index is None:
+        parser.error("the call archive and similarity index must both be enabled")
+    if args.backfill:
+        logger.info("Indexed %d new calls; %d in total", backfill(archive, index), len(index))
+    if args.query:
+        for call_id, score in index.search(embed_texts([args.query], dimensions=index.dimensions), k=args.k)[0]:
+            call = archive.get(call_id) or {}
+            print(f"{score:.3f}  #{call_id}  {call.get('filename', '')}  {call.get('summary', '')[:120]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import time
+import unittest
+from unittest import mock
+
+import agent
+from agent import SalesCallAgent
+import analysis
+from analysis import aanalyze_transcript, analyze_transcript, chunk_transcript, count_tokens, merge_partial_analyses, partial_summary
+from fake_services import FakeServices
+
+ANALYSIS = {
+    "summary": "Sarah from TechSolutions pitched the new cloud platform.",
+    "action_items": ["Send pricing comparison", "Prepare demo environment"],
+    "meetings": [{"title": "Platform demo", "start_time": "2025-07-02T15:00:00", "duration_minutes": 45}],
+    "search_queries": ["Acme Corp cloud platform reviews"]
+}
+
+
+def completion(content):
+    """Build a chat completion response like the OpenAI SDK returns"""
+    return mock.Mock(
+        model="gpt-4o-mini-2024-07-18",
+        usage=mock.Mock(prompt_tokens=1200, completion_tokens=300),
+        choices=[mock.Mock(message=mock.Mock(content=content, refusal=None))]
+    )
+
+
+class TestStructuredAnalysis(unittest.TestCase):
+    def test_single_completion_is_parsed_exactly(self):
+        """Test the schema-constrained completion is decoded as JSON"""
+        client = mock.Mock()
+        client.chat.completions.create.return_value = completion(json.dumps(ANALYSIS))
+        self.assertEqual(analyze_transcript("transcript", client=client), ANALYSIS)
+        self.assertEqual(client.chat.completions.create.call_count, 1)
+        kwargs = client.chat.completions.create.call_args.kwargs
+        self.assertEqual(kwargs["response_format"]["type"], "json_schema")
+
+    def test_tools_run_from_structured_result(self):
+        """Test meetings and search queries are dispatched to the tools"""
+        with mock.patch.object(agent, "schedule_event", return_value="Event created: https://calendar/x") as schedule, \
+                mock.patch.object(agent, "serpapi_search", return_value="Acme: https://acme.example") as search:
+            output = SalesCallAgent(mode="structured").run_tools(ANALYSIS)
+
+        schedule.assert_called_once_with("Platform demo", "2025-07-02T15:00:00", 45)
+        search.assert_called_once_with("Acme Corp cloud platform reviews")
+        self.assertEqual(output["summary"], ANALYSIS["summary"])
+        self.assertEqual(output["action_items"], ANALYSIS["action_items"])
+        self.assertIn("https://calendar/x", output["calendar"])
+        self.assertIn("https://acme.example", output["web_search"])
+
+    def test_async_tools_run_concurrently_with_timeouts(self):
+        """Test tools fan out concurrently and a slow tool yields a partial result"""
+        analysis = dict(ANALYSIS, search_queries=["fast query", "slow query"])
+
+        def search(query):
+            time.sleep(2 if query == "slow query" else 0.2)
+            return f"{query}: https://example.com"
+
+        def schedule(summary, start_time, duration_minutes):
+            time.sleep(0.2)
+            return "Event created: https://calendar/x"
+
+        with mock.patch.object(agent, "schedule_event", side_effect=schedule), \
+                mock.patch.object(agent, "serpapi_search", side_effect=search):
+            started = time.perf_counter()
+            output = asyncio.run(SalesCallAgent(mode="structured").arun_tools(analysis, tool_timeout=0.5))
+            elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(output["timed_out"], ["web_search: slow query"])
+        self.assertIn("https://calendar/x", output["calendar"])
+        self.assertIn("fast query: https://example.com", output["web_search"])
+        self.assertIn("timed out", output["web_search"])
+
+    def test_slow_calendar_call_is_reported_as_pending(self):
+        """Test a calendar call past its deadline is reported as possibly still happening, not as a failure"""
+        def schedule(summary, start_time, duration_minutes):
+            time.sleep(1)
+            return "Event created: https://calendar/x"
+
+        with mock.patch.object(agent, "schedule_event", side_effect=schedule), \
+                mock.patch.object(agent, "serpapi_search", return_value="result"):
+            output = asyncio.run(SalesCallAgent(mode="structured").arun_tools(ANALYSIS, tool_timeout=0.2))
+
+        self.assertEqual(len(output["timed_out"]), 1)
+        self.assertTrue(output["timed_out"][0].startswith("calendar: "))
+        self.assertIn("Event creation pending", output["calendar"])
+        self.assertNotIn("Failed", output["calendar"])
+
+    def test_async_tools_report_sections_as_they_finish(self):
+        """Test each tool's section is streamed as soon as that tool returns"""
+        updates = []
+
+        def search(query):
+            time.sleep(0.3)
+            return f"{query}: https://example.com"
+
+        with mock.patch.object(agent, "schedule_event", return_value="Event created: https://calendar/x"), \
+                mock.patch.object(agent, "serpapi_search", side_effect=search):
+            asyncio.run(SalesCallAgent(mode="structured").arun_tools(
+                ANALYSIS, on_update=lambda section, value: updates.append((section, value))
+            ))
+
+        self.assertEqual([section for section, _ in updates], ["calendar", "web_search"])
+        self.assertIn("https://calendar/x", updates[0][1])
+
+
+class TestReactMode(unittest.TestCase):
+    def test_react_agent_is_built_on_first_run(self):
+        """Test react mode builds its LangChain agent on the first run only, and traces each run"""
+        fake_agent = mock.Mock()
+        fake_agent.run.return_value = "Executive Summary: Demo went well\nAction Items:\n- Send pricing\nCalendar: \nWeb Search: "
+        with mock.patch("langchain.agents.initialize_agent", return_value=fake_agent) as initialize_agent, \
+                mock.patch("langchain.memory.ConversationBufferMemory") as memory, \
+                mock.patch.object(agent, "get_chat_llm") as get_chat_llm:
+            sales_agent = SalesCallAgent(mode="react")
+            initialize_agent.assert_not_called()
+
+            result = sales_agent.process_transcription("We should follow up next week.")
+            sales_agent.process_transcription("We should follow up next week.")
+
+        initialize_agent.assert_called_once()
+        kwargs = initialize_agent.call_args.kwargs
+        self.assertIs(kwargs["llm"], get_chat_llm.return_value)
+        self.assertIs(kwargs["memory"], memory.return_value)
+        self.assertEqual([tool.name for tool in kwargs["tools"]], ["Web Search", "Calendar"])
+        self.assertEqual(memory.return_value.clear.call_count, 2)
+        self.assertEqual(result["action_items"], ["Send pricing"])
+        (handler,) = fake_agent.run.call_args.kwargs["callbacks"]
+        self.assertIsInstance(handler, agent.TracingCallbackHandler)
+
+    def test_react_calendar_fallback_parses_spoken_dates(self):
+        """Test a calendar section the agent did not act on is scheduled from its first date phrase"""
+        sales_agent = SalesCallAgent(mode="react")
+        sales_agent.memory = mock.Mock()
+        sales_agent._agent = mock.Mock()
+        sales_agent._agent.run.return_value = "Calendar: Platform demo next Tuesday at 3pm\nWeb Search: "
+        with mock.patch.object(agent, "schedule_event", return_value="Event created: link") as schedule:
+            result = sales_agent.process_transcription("Let's do the demo next Tuesday at 3pm.")
+        self.assertEqual(result["calendar"], "Event created: link")
+        summary, start_time = schedule.call_args.args
+        self.assertEqual(summary, "Platform demo")
+        self.assertEqual(start_time[11:16], "15:00")
+
+
+class TestStreaming(unittest.TestCase):
+    def test_partial_summary_from_incomplete_json(self):
+        """Test the summary is decoded from a JSON prefix, even mid-escape"""
+        self.assertEqual(partial_summary('{"summary": "Sarah pitched the \\"new'), 'Sarah pitched the "new')
+        self.assertEqual(partial_summary('{"summary": "caf\\u00e9 ok", "action_items": ['), "caf\u00e9 ok")
+        self.assertEqual(partial_summary('{"summary": "caf\\u00'), "caf")
+        self.assertEqual(partial_summary('{"summ'), "")
+
+    def test_summary_streams_before_analysis_completes(self):
+        """Test summary text arrives incrementally and the full analysis still parses"""
+        from openai import AsyncOpenAI
+        summaries = []
+        with FakeServices(latency={"chat": 0}, stream_delay=0) as services:
+            async def run():
+                client = AsyncOpenAI(api_key="sk-fake", base_url=f"{services.base_url}/v1", max_retries=0)
+                return await aanalyze_transcript("Sales Rep: hello there " * 30, client=client, on_summary=summaries.append)
+            result = asyncio.run(run())
+
+        self.assertGreater(len(summaries), 3)
+        self.assertTrue(all(summary.startswith("Sales") for summary in summaries))
+        self.assertEqual(summaries[-1], result["summary"])
+        self.assertEqual(result["meetings"][0]["title"], "Product demo")
+
+
+class TestMapReduce(unittest.TestCase):
+    def test_chunks_respect_token_budget(self):
+        """Test long transcripts are split into bounded windows without losing text"""
+        transcription = " ".join(f"Sentence number {i} about the Acme Corp pilot." for i in range(500))
+        chunks = chunk_transcript(transcription, max_tokens=200)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(count_tokens(chunk) <= 200 for chunk in chunks))
+        self.assertEqual(" ".join(chunks), transcription)
+
+    def test_merge_deduplicates_across_windows(self):
+        """Test action items, meetings and queries repeated across windows are merged"""
+        partials = [
+            {"summary": "a", "action_items": ["Send the pricing deck."], "search_queries": ["Acme Corp pricing"],
+             "meetings": [{"title": "Product demo", "start_time": "2025-07-02T15:00:00", "duration_minutes": 30},
+                          {"title": "Kickoff", "start_time": "", "duration_minutes": 30}]},
+            {"summary": "b", "action_items": ["send the pricing deck", "Book a security review"],
+             "search_queries": ["pricing acme corp"],
+             "meetings": [{"title": "product demo.", "start_time": "2025-07-02T15:00:00", "duration_minutes": 30},
+                          {"title": "Legal review", "start_time": "2025-07-02T15:00:00", "duration_minutes": 30},
+                          {"title": "kickoff", "start_time": "", "duration_minutes": 30}]},
+        ]
+        merged = merge_partial_analyses(partials, "whole call")
+        self.assertEqual(merged["summary"], "whole call")
+        self.assertEqual(merged["action_items"], ["Send the pricing deck.", "Book a security review"])
+        self.assertEqual(merged["search_queries"], ["Acme Corp pricing"])
+        # The same meeting is kept once, but a different meeting in the same slot is not dropped
+        self.assertEqual([meeting["title"] for meeting in merged["meetings"]], ["Product demo", "Kickoff", "Legal review"])
+
+    def test_long_transcript_is_mapped_then_reduced(self):
+        """Test each window gets its own completion followed by one reduce completion"""
+        client = mock.Mock()
+        client.chat.completions.create.return_value = completion(json.dumps(ANALYSIS))
+        transcription = " ".join(f"Sentence number {i} about the Acme Corp pilot." for i in range(500))
+        with mock.patch.object(analysis, "MAP_REDUCE_THRESHOLD_TOKENS", 1000), \
+                mock.patch.object(analysis, "MAP_CHUNK_TOKENS", 1000):
+            result = analyze_transcript(transcription, client=client)
+        windows = len(chunk_transcript(transcription, max_tokens=1000))
+        self.assertGreater(windows, 1)
+        self.assertEqual(client.chat.completions.create.call_count, windows + 1)
+        self.assertEqual(result["action_items"], ANALYSIS["action_items"])
+
+
+if __name__ == '__main__':
+    unittest.main()
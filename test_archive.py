@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from archive import CallArchive, archive_call, fts_query
+
+CALL = {
+    "transcription": "Sales Rep: We beat Acme Corp on price. Client: Send the security whitepaper.",
+    "summary": "Client is comparing us with Acme Corp and needs security documentation.",
+    "action_items": ["Send security whitepaper", "Book pricing review"],
+    "calendar": "Event created: https://calendar.google.com/event?eid=1",
+    "web_search": "Acme Corp pricing:\nAcme plans: https://acme.example/pricing",
+}
+
+
+class TestCallArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.archive = CallArchive(os.path.join(self.tmp_dir.name, "calls.sqlite3"))
+
+    def tearDown(self):
+        self.archive.close()
+        self.tmp_dir.cleanup()
+
+    def test_inserted_calls_are_searchable(self):
+        """Test a call is found by keyword right after insert, with a highlighted snippet"""
+        call_id = self.archive.add(CALL, filename="acme.mp3")
+        self.archive.add(dict(CALL, transcription="Nothing relevant", summary="Renewal chat",
+                              web_search="", action_items=[]), filename="other.mp3")
+
+        results = self.archive.search("acme corp")
+        self.assertEqual([r["id"] for r in results], [call_id])
+        self.assertIn("**", results[0]["snippet"])
+        self.assertEqual(results[0]["action_items"], CALL["action_items"])
+        # Porter stemming and prefix matching on the last word
+        self.assertEqual(len(self.archive.search("whitepapers")), 1)
+        self.assertEqual(len(self.archive.search("secur")), 1)
+
+    def test_reprocessed_recording_replaces_its_entry(self):
+        """Test calls with the same audio key are updated in place and reindexed"""
+        first = self.archive.add(CALL, audio_key="abc")
+        second = self.archive.add(dict(CALL, summary="Updated summary about Globex"), audio_key="abc")
+        self.assertEqual(first, second)
+        self.assertEqual(self.archive.count(), 1)
+        self.assertEqual(len(self.archive.search("globex")), 1)
+
+    def test_delete_removes_from_index(self):
+        """Test deleted calls no longer match"""
+        call_id = self.archive.add(CALL)
+        self.archive.delete(call_id)
+        self.assertEqual(self.archive.search("acme"), [])
+        self.assertIsNone(self.archive.get(call_id))
+
+    def test_query_syntax_is_escaped(self):
+        """Test punctuation and FTS operators in user input cannot break the query"""
+        self.archive.add(CALL)
+        self.assertEqual(fts_query('acme "OR" NOT-corp*'), '"acme" "OR" "NOT" "corp"*')
+        self.assertEqual(len(self.archive.search('Acme-Corp (pricing)')), 1)
+        self.assertEqual(self.archive.search("  ...  "), [])
+
+    def test_archive_call_keys_on_audio_content(self):
+        """Test archiving the same recording twice keeps one entry"""
+        audio_path = os.path.join(self.tmp_dir.name, "call.mp3")
+        with open(audio_path, "wb") as f:
+            f.write(b"audio bytes")
+        archive_call(CALL, audio_path, archive=self.archive)
+        archive_call(CALL, audio_path, filename="renamed.mp3", archive=self.archive)
+        self.assertEqual(self.archive.count(), 1)
+        self.assertEqual(self.archive.recent()[0]["filename"], "renamed.mp3")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import batch
+import pipeline
+
+
+def fake_process_recording(path):
+    if "broken" in path:
+        raise Exception("Transcription failed: bad audio")
+    return {"transcription": "hello", "summary": "s", "action_items": [], "calendar": "", "web_search": "", "seconds": 0.01}
+
+
+def crashing_process_one(path):
+    """Kill the worker process outright on a broken file, as a native decoder crash would"""
+    if "broken" in path:
+        os._exit(1)
+    return {"path": path, "status": "ok", "seconds": 0.01}
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.calls_dir = os.path.join(self.tmp_dir.name, "calls")
+        os.makedirs(os.path.join(self.calls_dir, "monday"))
+        for name in ["a.mp3", "b.mp3", "monday/c.mp3", "monday/broken.mp3", "notes.txt"]:
+            with open(os.path.join(self.calls_dir, name), "wb") as f:
+                f.write(b"\x00")
+        self.output = os.path.join(self.tmp_dir.name, "results.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_output(self):
+        with open(self.output, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_discovers_directory_and_manifest(self):
+        """Test recordings are found recursively and via a manifest"""
+        self.assertEqual(len(batch.discover_recordings(self.calls_dir)), 4)
+        manifest = os.path.join(self.tmp_dir.name, "manifest.txt")
+        with open(manifest, "w", encoding="utf-8") as f:
+            f.write("calls/a.mp3\n# comment\n{\"path\": \"calls/monday/c.mp3\"}\n")
+        self.assertEqual(
+            [os.path.basename(path) for path in batch.discover_recordings(manifest=manifest)],
+            ["a.mp3", "c.mp3"]
+        )
+
+    def test_streams_results_and_resumes(self):
+        """Test results are written as JSONL and a rerun only retries failures"""
+        with mock.patch.object(pipeline, "process_recording", side_effect=fake_process_recording) as process:
+            self.assertEqual(batch.main([self.calls_dir, "-o", self.output, "-w", "2"]), 1)
+            records = self.read_output()
+            self.assertEqual(len(records), 4)
+            self.assertEqual(sum(record["status"] == "ok" for record in records), 3)
+
+            process.reset_mock()
+            batch.main([self.calls_dir, "-o", self.output])
+            self.assertEqual(process.call_count, 1)
+            self.assertIn("broken.mp3", process.call_args.args[0])
+
+    def test_crashed_worker_process_does_not_abort_the_run(self):
+        """Test a worker crash records the calls it took down as failed and the batch carries on"""
+        paths = sorted(batch.discover_recordings(self.calls_dir)) * 2
+        with mock.patch.object(batch, "process_one", crashing_process_one):
+            totals = batch.run_batch(paths, self.output, workers=2, use_processes=True)
+
+        records = self.read_output()
+        self.assertEqual(sorted(record["path"] for record in records), sorted(paths))
+        self.assertEqual(totals["ok"] + totals["failed"], len(paths))
+        broken = [record for record in records if "broken" in record["path"]]
+        self.assertTrue(all("crashed" in record["error"] for record in broken))
+        # Calls queued after the crash ran on a fresh pool
+        self.assertGreater(totals["ok"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
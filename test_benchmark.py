@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import clients
+from analysis import analyze_transcript
+from benchmark import percentile, synthetic_transcript
+from fake_services import FakeServices
+
+
+class TestBenchmark(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.services = FakeServices(latency={service: 0 for service in ("transcription", "chat", "search", "calendar")})
+        cls.services.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.services.stop()
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3.0], 99), 3.0)
+        self.assertIsNone(percentile([], 50))
+
+    def test_fake_openai_serves_transcription_and_analysis(self):
+        """Test the real OpenAI client works against the fake endpoints"""
+        from openai import OpenAI
+        client = OpenAI(api_key="sk-fake", base_url=f"{self.services.base_url}/v1", max_retries=0)
+        transcript = client.audio.transcriptions.create(model="whisper-1", file=("call.mp3", b"fake audio"))
+        self.assertIn("Sales Rep:", transcript.text)
+
+        result = analyze_transcript(synthetic_transcript(200), client=client)
+        self.assertEqual(result["meetings"][0]["title"], "Product demo")
+        self.assertTrue(result["search_queries"])
+
+    def test_fake_calendar_accepts_events(self):
+        """Test the Calendar client can be pointed at the fake server"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = self.services.environment(os.path.join(tmp_dir, "token.json"))
+            with mock.patch.object(clients, "GOOGLE_TOKEN_FILE", env["GOOGLE_TOKEN_FILE"]), \
+                    mock.patch.object(clients, "GOOGLE_CALENDAR_API_ENDPOINT", env["GOOGLE_CALENDAR_API_ENDPOINT"]):
+                clients.reset_clients()
+                try:
+                    event = clients.get_calendar_service().events().insert(
+                        calendarId="primary", body={"summary": "Demo"}
+                    ).execute()
+                finally:
+                    clients.reset_clients()
+        self.assertEqual(event["summary"], "Demo")
+        self.assertIn("htmlLink", event)
+
+
+if __name__ == '__main__':
+    unittest.main()
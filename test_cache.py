@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from cache import SearchCache, TranscriptionCache, hash_audio_file, normalize_query
+import cache
+import transcriber
+
+
+def write_entries(cache_dir, count):
+    """Write the same keys as every other writer process"""
+    shared = TranscriptionCache(cache_dir=cache_dir, memory_items=0)
+    for i in range(count):
+        shared.set(f"key{i % 3}", f"transcript {i}")
+
+
+class TestTranscriptionCache(unittest.TestCase):
+    def setUp(self):
+        """Set up a scratch cache directory and audio file"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        self.audio_path = os.path.join(self.tmp_dir.name, "call.mp3")
+        with open(self.audio_path, "wb") as f:
+            f.write(b"\x00fake mp3 bytes" * 100)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_model(self):
+        """Test the cache key covers both the audio bytes and the model"""
+        self.assertEqual(hash_audio_file(self.audio_path, "whisper-1"), hash_audio_file(self.audio_path, "whisper-1"))
+        self.assertNotEqual(hash_audio_file(self.audio_path, "whisper-1"), hash_audio_file(self.audio_path, "large-v3"))
+
+    def test_hit_and_miss_counts(self):
+        """Test hits are served from memory, then from disk after a restart"""
+        cache = TranscriptionCache(cache_dir=self.cache_dir)
+        self.assertIsNone(cache.get("abc"))
+        cache.set("abc", "hello world")
+        self.assertEqual(cache.get("abc"), "hello world")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+        restarted = TranscriptionCache(cache_dir=self.cache_dir)
+        self.assertEqual(restarted.get("abc"), "hello world")
+        self.assertEqual(restarted.stats()["disk_hits"], 1)
+
+    def test_disk_eviction_is_lru(self):
+        """Test the disk tier stays under its size bound, evicting the oldest entry"""
+        cache = TranscriptionCache(cache_dir=self.cache_dir, max_bytes=25, memory_items=0)
+        cache.set("a", "x" * 10)
+        cache.set("b", "y" * 10)
+        cache.get("a")
+        cache.set("c", "z" * 10)
+        self.assertEqual(cache.get("a"), "x" * 10)
+        self.assertIsNone(cache.get("b"))
+        self.assertLessEqual(cache.stats()["disk_bytes"], 25)
+
+    def test_writer_processes_share_the_directory(self):
+        """Test processes writing the same keys at once never trip over each other's temp files"""
+        context = multiprocessing.get_context("fork")
+        writers = [context.Process(target=write_entries, args=(self.cache_dir, 200)) for _ in range(4)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join(30)
+            self.assertEqual(writer.exitcode, 0)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["key0.txt", "key1.txt", "key2.txt"])
+
+    def test_disk_errors_do_not_fail_the_call(self):
+        """Test a failed disk write is logged and the transcript is still served from memory"""
+        transcripts = TranscriptionCache(cache_dir=self.cache_dir)
+        with mock.patch.object(cache.os, "replace", side_effect=OSError("disk full")), \
+                self.assertLogs("cache", level="WARNING"):
+            transcripts.set("abc", "hello world")
+        self.assertEqual(transcripts.get("abc"), "hello world")
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        self.assertEqual(transcripts.stats()["disk_entries"], 0)
+
+    def test_transcribe_audio_uses_cache(self):
+        """Test a repeat transcription does not call the API again"""
+        cache = TranscriptionCache(cache_dir=self.cache_dir)
+        with mock.patch.object(transcriber, "get_openai_client") as get_client:
+            get_client.return_value.audio.transcriptions.create.return_value.text = "cached text"
+            self.assertEqual(transcriber.transcribe_audio(self.audio_path, cache=cache), "cached text")
+            self.assertEqual(transcriber.transcribe_audio(self.audio_path, cache=cache), "cached text")
+            self.assertEqual(get_client.return_value.audio.transcriptions.create.call_count, 1)
+
+
+class TestSearchCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "search.sqlite3")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_queries_are_normalized(self):
+        """Test casing, punctuation and word order share one cache entry"""
+        self.assertEqual(normalize_query("Acme Corp pricing"), normalize_query("pricing, ACME corp"))
+        cache = SearchCache()
+        calls = []
+        compute = lambda query: calls.append(query) or "results"
+        cache.get_or_compute("Acme Corp pricing", compute)
+        cache.get_or_compute("pricing acme  CORP?", compute)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_ttl_expiry_and_persistence(self):
+        """Test entries survive a restart but not their TTL"""
+        cache = SearchCache(db_path=self.db_path, ttl_seconds=0.2)
+        cache.get_or_compute("acme", lambda query: "first")
+        self.assertEqual(SearchCache(db_path=self.db_path).get_or_compute("acme", lambda query: "second"), "first")
+        time.sleep(0.3)
+        self.assertEqual(cache.get_or_compute("acme", lambda query: "third"), "third")
+
+    def test_persistent_tier_is_bounded(self):
+        """Test the SQLite tier keeps only the most recently used entries"""
+        cache = SearchCache(db_path=self.db_path, max_entries=2, memory_items=0)
+        for query in ["a", "b", "c"]:
+            cache.get_or_compute(query, lambda q: q.upper())
+        self.assertEqual(cache.get_or_compute("a", lambda q: "refetched"), "refetched")
+        self.assertEqual(cache.get_or_compute("c", lambda q: "refetched"), "C")
+
+    def test_concurrent_identical_queries_are_coalesced(self):
+        """Test concurrent identical queries issue a single fetch"""
+        cache = SearchCache()
+        calls = []
+
+        def compute(query):
+            calls.append(query)
+            time.sleep(0.2)
+            return "results"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_compute("Acme Corp", compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["results"] * 5)
+        self.assertEqual(cache.stats()["coalesced"], 4)
+
+    def test_errors_are_not_cached(self):
+        """Test a failed fetch is retried on the next call"""
+        cache = SearchCache()
+
+        def fail(query):
+            raise RuntimeError("rate limited")
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_compute("acme", fail)
+        self.assertEqual(cache.get_or_compute("acme", lambda query: "ok"), "ok")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import threading
+import unittest
+from unittest import mock
+
+import clients
+
+
+class TestClientRegistry(unittest.TestCase):
+    def setUp(self):
+        clients.reset_clients()
+        self.env = mock.patch.dict(os.environ, {"OPENAI_API_KEY": "sk-test"})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        clients.reset_clients()
+
+    def test_openai_client_is_shared_across_threads(self):
+        """Test every thread gets the same pooled client"""
+        seen = []
+        threads = [threading.Thread(target=lambda: seen.append(clients.get_openai_client())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(client) for client in seen}), 1)
+
+    def test_async_client_is_per_event_loop(self):
+        """Test async clients are reused within a loop but not across loops"""
+        async def get_twice():
+            return clients.get_async_openai_client(), clients.get_async_openai_client()
+
+        first, second = asyncio.run(get_twice())
+        self.assertIs(first, second)
+        third, _ = asyncio.run(get_twice())
+        self.assertIsNot(first, third)
+
+    def test_run_async_reuses_one_loop_and_client(self):
+        """Test coroutines run with run_async share the background loop's client across calls"""
+        async def get_client():
+            return asyncio.get_running_loop(), clients.get_async_openai_client()
+
+        first_loop, first_client = clients.run_async(get_client())
+        second_loop, second_client = clients.run_async(get_client())
+        self.assertIs(first_loop, second_loop)
+        self.assertIs(first_client, second_client)
+        self.assertEqual(clients.submit_async(get_client()).result(5), (first_loop, first_client))
+
+    def test_calendar_refresh_does_not_block_other_clients(self):
+        """Test refreshing the calendar token leaves the OpenAI client available to other threads"""
+        refreshing, release = threading.Event(), threading.Event()
+        creds = mock.Mock(valid=False, expired=True, refresh_token="refresh")
+        creds.to_json.return_value = "{}"
+        creds.refresh.side_effect = lambda request: (refreshing.set(), release.wait(5))
+        with mock.patch("google.oauth2.credentials.Credentials.from_authorized_user_file", return_value=creds), \
+                mock.patch.object(clients, "GOOGLE_TOKEN_FILE", os.devnull):
+            thread = threading.Thread(target=clients.get_calendar_credentials)
+            thread.start()
+            self.assertTrue(refreshing.wait(5))
+            try:
+                got_client = threading.Thread(target=clients.get_openai_client)
+                got_client.start()
+                got_client.join(2)
+                self.assertFalse(got_client.is_alive())
+            finally:
+                release.set()
+                thread.join(5)
+
+
+if __name__ == '__main__':
+    unittest.main()
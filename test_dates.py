@@ -0,0 +1,175 @@
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import dates
+import tools
+from dates import extract_datetimes, parse_datetime
+
+# A Tuesday morning
+REFERENCE = datetime(2025, 6, 24, 10, 0)
+
+
+class TestParseDatetime(unittest.TestCase):
+    def setUp(self):
+        dates.clear_cache()
+
+    def test_iso_8601(self):
+        """Test ISO 8601 timestamps are parsed exactly"""
+        self.assertEqual(parse_datetime("2025-07-02T15:00:00", REFERENCE), datetime(2025, 7, 2, 15, 0))
+        self.assertEqual(parse_datetime("2025-07-02T15:00:00Z", REFERENCE).utcoffset().total_seconds(), 0)
+        self.assertEqual(parse_datetime("Demo on 2025-07-02T15:00", REFERENCE), datetime(2025, 7, 2, 15, 0))
+
+    def test_spoken_forms_resolve_against_reference(self):
+        """Test common spoken phrases resolve relative to the reference time"""
+        cases = {
+            "next Tuesday at 3pm": datetime(2025, 7, 1, 15, 0),
+            "this Tuesday at 3pm": datetime(2025, 6, 24, 15, 0),
+            "Friday": datetime(2025, 6, 27, 9, 0),
+            "3pm on Friday": datetime(2025, 6, 27, 15, 0),
+            "tomorrow at 10:30am": datetime(2025, 6, 25, 10, 30),
+            "at 3 p.m. tomorrow": datetime(2025, 6, 25, 15, 0),
+            "day after tomorrow at noon": datetime(2025, 6, 26, 12, 0),
+            "at 9am": datetime(2025, 6, 25, 9, 0),
+            "July 2nd at 3 pm": datetime(2025, 7, 2, 15, 0),
+            "the 4th of July, 2026 at 14:00": datetime(2026, 7, 4, 14, 0),
+            "June 1": datetime(2026, 6, 1, 9, 0),
+            "in two hours": datetime(2025, 6, 24, 12, 0),
+            "in a couple of days": datetime(2025, 6, 26, 10, 0),
+            "next week": datetime(2025, 6, 30, 9, 0),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_datetime(text, REFERENCE, fallback=False), expected)
+
+    def test_numeric_and_ordinal_dates(self):
+        """Test numeric dates, ordinal days and a bare hour next to a date are read whole"""
+        reference = datetime(2026, 10, 17, 12, 0)
+        cases = {
+            "10/20 at 2pm": datetime(2026, 10, 20, 14, 0),
+            "20/10/2026 2pm": datetime(2026, 10, 20, 14, 0),
+            "the 3rd at 2pm": datetime(2026, 11, 3, 14, 0),
+            "let us meet at 3 on Monday": datetime(2026, 10, 19, 15, 0),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_datetime(text, reference, fallback=False), expected)
+        self.assertIsNone(parse_datetime("3/4 of the team", reference, fallback=False))
+
+    def test_date_only_iso_uses_default_time(self):
+        """Test an ISO date gets the default meeting time whether or not other words surround it"""
+        self.assertEqual(parse_datetime("2025-06-26", REFERENCE), datetime(2025, 6, 26, 9, 0))
+        self.assertEqual(parse_datetime("on 2025-06-26", REFERENCE), datetime(2025, 6, 26, 9, 0))
+
+    def test_unmatched_date_words_defer_to_dateparser(self):
+        """Test a timezone or other date words outside the match send the text to dateparser"""
+        reference = datetime(2026, 10, 17, 12, 0)
+        self.assertIsNone(parse_datetime("2026-10-20 14:00 PST", reference, fallback=False))
+        parsed = parse_datetime("2026-10-20 14:00 PST", reference)
+        self.assertEqual((parsed.replace(tzinfo=None), parsed.utcoffset()), (datetime(2026, 10, 20, 14, 0), timedelta(hours=-8)))
+
+        fake_dateparser = mock.Mock()
+        fake_dateparser.parse.return_value = None
+        with mock.patch.dict(sys.modules, {"dateparser": fake_dateparser}):
+            # dateparser finds nothing in a sentence, so the pattern's answer is kept
+            self.assertEqual(parse_datetime("Review on Friday, then 10/22 too", reference), datetime(2026, 10, 23, 9, 0))
+            self.assertEqual(parse_datetime("Demo Monday 3", reference), datetime(2026, 10, 19, 9, 0))
+        self.assertEqual(fake_dateparser.parse.call_count, 2)
+
+    def test_unrelated_numbers_stay_on_the_fast_path(self):
+        """Test counts, versions and prices elsewhere in a sentence do not send it to dateparser"""
+        reference = datetime(2026, 10, 17, 12, 0)
+        fake_dateparser = mock.Mock()
+        cases = {
+            "Demo for 3 people tomorrow at 11am": datetime(2026, 10, 18, 11, 0),
+            "Ship version 2.0 next Tuesday at 3pm": datetime(2026, 10, 20, 15, 0),
+            "Renewal at $1,500 on Friday": datetime(2026, 10, 23, 9, 0),
+            "Friday, 25% off": datetime(2026, 10, 23, 9, 0),
+        }
+        with mock.patch.dict(sys.modules, {"dateparser": fake_dateparser}):
+            for text, expected in cases.items():
+                with self.subTest(text=text):
+                    self.assertEqual(parse_datetime(text, reference), expected)
+        fake_dateparser.parse.assert_not_called()
+
+    def test_invalid_dates_are_rejected(self):
+        """Test impossible dates and text without dates parse to None"""
+        self.assertIsNone(parse_datetime("February 30th", REFERENCE, fallback=False))
+        self.assertIsNone(parse_datetime("Send the pricing sheet", REFERENCE, fallback=False))
+
+    def test_results_are_memoized_and_dateparser_is_a_fallback(self):
+        """Test repeated phrases hit the cache and dateparser only sees text the patterns miss"""
+        fake_dateparser = mock.Mock()
+        fake_dateparser.parse.return_value = datetime(2025, 8, 1, 9, 0)
+        with mock.patch.dict(sys.modules, {"dateparser": fake_dateparser}):
+            for _ in range(3):
+                parse_datetime("next Tuesday at 3pm", REFERENCE)
+            self.assertEqual(dates._first_spec.cache_info().hits, 2)
+            fake_dateparser.parse.assert_not_called()
+
+            self.assertEqual(parse_datetime("first of August", REFERENCE), datetime(2025, 8, 1, 9, 0))
+            parse_datetime("first of August", REFERENCE)
+            fake_dateparser.parse.assert_called_once()
+
+
+class TestExtractDatetimes(unittest.TestCase):
+    def test_every_phrase_is_found_in_one_pass(self):
+        """Test all date phrases in a transcript are found in order, without false positives"""
+        transcript = (
+            "I sat in the sun with 3 people, and we may ship version 2.0 soon. "
+            "Let's do the demo next Tuesday at 3pm, then a review on July 8th. "
+            "Call me tomorrow around 10:30 or at 4 pm."
+        )
+        found = extract_datetimes(transcript, REFERENCE)
+        self.assertEqual([match.text for match in found],
+                         ["next Tuesday at 3pm", "July 8th", "tomorrow around 10:30", "at 4 pm"])
+        self.assertEqual([match.value for match in found], [
+            datetime(2025, 7, 1, 15, 0), datetime(2025, 7, 8, 9, 0),
+            datetime(2025, 6, 25, 10, 30), datetime(2025, 6, 24, 16, 0),
+        ])
+        self.assertEqual(transcript[found[0].start:found[0].end], "next Tuesday at 3pm")
+
+
+class TestScheduleEvent(unittest.TestCase):
+    def test_spoken_start_time_is_scheduled(self):
+        """Test schedule_event accepts spoken times and falls back to the summary"""
+        with mock.patch.object(tools, "get_calendar_service") as get_service:
+            insert = get_service.return_value.events.return_value.insert
+            insert.return_value.execute.return_value = {"htmlLink": "https://calendar/event"}
+            self.assertEqual(tools.schedule_event("Demo", "next Tuesday at 3pm", 45), "Event created: https://calendar/event")
+            self.assertIn("Event created", tools.schedule_event("Pricing review tomorrow at 11am"))
+
+        first, second = (call.kwargs["body"] for call in insert.call_args_list)
+        start = datetime.fromisoformat(first["start"]["dateTime"])
+        self.assertEqual((start.weekday(), start.hour, start.minute), (1, 15, 0))
+        self.assertEqual(datetime.fromisoformat(first["end"]["dateTime"]) - start, timedelta(minutes=45))
+        self.assertEqual(datetime.fromisoformat(second["start"]["dateTime"]).hour, 11)
+
+    def test_retried_event_is_not_duplicated(self):
+        """Test a meeting gets the same event ID each time, and a 409 on retry returns the existing event"""
+        conflict = Exception("duplicate")
+        conflict.resp = mock.Mock(status=409)
+        with mock.patch.object(tools, "get_calendar_service") as get_service:
+            events = get_service.return_value.events.return_value
+            events.insert.return_value.execute.side_effect = [{"htmlLink": "https://calendar/first"}, conflict]
+            events.get.return_value.execute.return_value = {"htmlLink": "https://calendar/first"}
+            self.assertEqual(tools.schedule_event("Demo", "2025-07-01T15:00:00"), "Event created: https://calendar/first")
+            self.assertEqual(tools.schedule_event("demo ", "2025-07-01T15:00:00"), "Event created: https://calendar/first")
+
+        first, second = (call.kwargs["body"]["id"] for call in events.insert.call_args_list)
+        self.assertEqual(first, second)
+        self.assertEqual(events.get.call_args.kwargs["eventId"], first)
+        self.assertRegex(first, r"^[0-9a-v]{5,1024}$")
+        self.assertNotEqual(first, tools.calendar_event_id("Demo", datetime(2025, 7, 1, 16, 0), 30))
+
+    def test_unparseable_time_is_reported(self):
+        """Test a summary without a date asks for one instead of scheduling"""
+        with mock.patch.object(tools, "parse_datetime", return_value=None), \
+                mock.patch.object(tools, "get_calendar_service") as get_service:
+            self.assertIn("Could not determine event time", tools.schedule_event("Send pricing"))
+        get_service.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
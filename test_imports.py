@@ -0,0 +1,76 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+import agent
+import tools
+
+HEAVY_MODULES = ["langchain", "langchain_core", "serpapi", "googleapiclient", "dateparser"]
+
+# Importing the pipeline took over a second when LangChain was loaded eagerly
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "0.6"))
+
+COLD_START = """
+import json, sys, time
+started = time.perf_counter()
+import tools, agent, pipeline
+elapsed = time.perf_counter() - started
+agent.SalesCallAgent(mode="react")
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % HEAVY_MODULES
+
+
+def cold_start():
+    """Import the pipeline in a fresh interpreter and report what it cost"""
+    output = subprocess.run(
+        [sys.executable, "-c", COLD_START], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_heavy_dependencies_are_not_imported(self):
+        """Test importing the pipeline and constructing an agent loads none of the heavy dependencies"""
+        self.assertEqual(cold_start()["loaded"], [])
+
+    def test_import_time_budget(self):
+        """Test the pipeline imports within the budget, taking the best of three runs"""
+        best = min(cold_start()["seconds"] for _ in range(3))
+        self.assertLess(best, IMPORT_BUDGET_SECONDS)
+
+    def test_langchain_tools_are_built_on_access(self):
+        """Test the LangChain tool wrappers are built once, on first access"""
+        self.assertIs(tools.calendar_tool, tools.tools[1])
+        self.assertIs(tools.tools, tools.tools)
+        self.assertEqual([tool.name for tool in tools.tools], ["Web Search", "Calendar"])
+        with self.assertRaises(AttributeError):
+            tools.missing_tool
+
+
+class TestWarmup(unittest.TestCase):
+    def test_warmup_tolerates_missing_calendar_token(self):
+        """Test warming up succeeds without token.json and can be repeated"""
+        sales_agent = agent.SalesCallAgent(mode="structured")
+        with mock.patch.object(agent, "get_openai_client") as get_client, \
+                mock.patch.object(agent, "get_calendar_service", side_effect=FileNotFoundError("token.json")):
+            sales_agent.warmup()
+            sales_agent.warmup()
+        self.assertEqual(get_client.call_count, 2)
+        self.assertIn("serpapi", sys.modules)
+
+    def test_background_warmup(self):
+        """Test warmup(background=True) runs on a thread and logs failures instead of raising"""
+        with mock.patch.object(agent, "get_sales_agent") as get_sales_agent:
+            get_sales_agent.return_value.warmup.side_effect = RuntimeError("offline")
+            with self.assertLogs("agent", level="WARNING"):
+                thread = agent.warmup(background=True)
+                thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
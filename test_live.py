@@ -0,0 +1,248 @@
+import contextlib
+import io
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+import unittest
+import wave
+from concurrent.futures import Future
+from unittest import mock
+from datetime import datetime
+
+import live
+from live import LiveTranscriber, RollingBuffer, extract_action_items, file_source, merge_overlap, replay_source
+
+SCRIPT = (
+    "Thanks for joining today. Our team reviewed the proposal and the numbers look solid. "
+    "I'll send the pricing sheet tomorrow at 10am. Acme Corp quoted a lower price last quarter, "
+    "so we need to compare support terms carefully. Let's schedule a demo next Tuesday at 3pm "
+    "with your engineering lead. Sounds great, talk soon."
+).split()
+# One word every 0.4 seconds of audio
+WORD_SECONDS = 0.4
+
+
+class ScriptedBackend:
+    """Transcribes a window as the script words that start inside it"""
+
+    def __init__(self, delay=0.0, sleep=time.sleep):
+        self.delay = delay
+        self.sleep = sleep
+        self.windows = []
+
+    def transcribe_segments(self, chunks, max_workers=None, on_chunk=None):
+        results = []
+        for offset, segment in chunks:
+            end = offset + len(segment) / 1000.0
+            self.windows.append((offset, end))
+            self.sleep(self.delay)
+            words = [word for i, word in enumerate(SCRIPT) if offset <= i * WORD_SECONDS < end]
+            results.append((" ".join(words), []))
+        return results
+
+
+class FakeClock:
+    """Monotonic clock that only moves when something sleeps on it"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class InlineExecutor:
+    """Runs each window as it is submitted, so the test does not depend on thread scheduling"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def write_wav(path, seconds):
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(live.SAMPLE_WIDTH)
+        wav.setframerate(live.SAMPLE_RATE)
+        wav.writeframes(b"\0" * live._seconds_to_bytes(seconds))
+
+
+class TestOverlap(unittest.TestCase):
+    def test_repeated_words_are_dropped(self):
+        """Test the words two windows share are kept once, ignoring case and punctuation"""
+        self.assertEqual(merge_overlap("we should talk about Pricing.".split(), "About pricing, next week please"),
+                         (0, ["next", "week", "please"]))
+
+    def test_words_cut_at_the_boundary(self):
+        """Test a garbled word at either edge of the overlap does not break the match"""
+        previous = "send the pricing sheet tomor".split()
+        self.assertEqual(merge_overlap(previous, "the pricing sheet tomorrow at ten"), (1, ["tomorrow", "at", "ten"]))
+        self.assertEqual(merge_overlap("send the pricing".split(), "icing the pricing sheet"), (0, ["sheet"]))
+
+    def test_no_overlap(self):
+        """Test unrelated text is appended whole"""
+        self.assertEqual(merge_overlap("hello there".split(), "general kenobi"), (0, ["general", "kenobi"]))
+
+
+class TestRollingBuffer(unittest.TestCase):
+    def test_old_audio_is_discarded(self):
+        """Test the buffer keeps only the latest audio but addresses it by stream time"""
+        buffer = RollingBuffer(max_seconds=2)
+        for second in range(5):
+            buffer.append(bytes([second]) * live.BYTES_PER_SECOND)
+        self.assertEqual(buffer.seconds, 5)
+        self.assertEqual(buffer.read(3.5, 4.5), bytes([3]) * (live.BYTES_PER_SECOND // 2) + bytes([4]) * (live.BYTES_PER_SECOND // 2))
+        with self.assertRaises(ValueError):
+            buffer.read(2.5, 3.5)
+
+
+class TestLiveTranscriber(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.audio_path = os.path.join(self.dir, "call.wav")
+        write_wav(self.audio_path, len(SCRIPT) * WORD_SECONDS + 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_replay_is_transcribed_without_duplicates(self):
+        """Test overlapping windows stitch back into the original words, with periodic action items"""
+        backend = ScriptedBackend()
+        updates = []
+        transcriber = LiveTranscriber(backend=backend, window_seconds=8, step_seconds=6, action_items_seconds=10,
+                                      on_update=lambda section, value: updates.append((section, value)),
+                                      reference=datetime(2025, 6, 24, 9, 0))
+        result = transcriber.run(replay_source(self.audio_path, speed=0))
+
+        self.assertEqual(result["transcription"], " ".join(SCRIPT))
+        self.assertEqual(sorted(start for start, _ in backend.windows)[:3], [0, 6, 12])
+        self.assertEqual(result["action_items"], [
+            "I'll send the pricing sheet tomorrow at 10am.",
+            "Acme Corp quoted a lower price last quarter, so we need to compare support terms carefully.",
+            "Let's schedule a demo next Tuesday at 3pm with your engineering lead.",
+        ])
+        self.assertEqual([meeting["start_time"] for meeting in result["meetings"]],
+                         ["2025-06-25T10:00:00", "2025-07-01T15:00:00"])
+        # Action items were refreshed during the call, not only at the end
+        sections = [section for section, _ in updates]
+        self.assertGreater(sections.count("action_items"), 1)
+        self.assertLess(sections.index("action_items"), len(sections) - 2)
+
+    def test_lag_stays_behind_real_time_at_speed(self):
+        """Test replaying faster than real time keeps each window's lag near its transcription time"""
+        clock = FakeClock()
+        transcriber = LiveTranscriber(backend=ScriptedBackend(delay=0.05, sleep=clock.sleep), window_seconds=8,
+                                      step_seconds=6, clock=clock, executor=InlineExecutor())
+        result = transcriber.run(replay_source(self.audio_path, speed=20, clock=clock, sleep=clock.sleep))
+        audio_seconds = transcriber.buffer.seconds
+
+        self.assertEqual(result["transcription"], " ".join(SCRIPT))
+        # Playback took 1/20 of the audio's length, plus the time spent transcribing
+        self.assertAlmostEqual(clock.now, audio_seconds / 20 + 0.05, delta=0.01)
+        self.assertEqual(result["lag"]["windows"], len(transcriber.lags))
+        for lag in transcriber.lags:
+            self.assertAlmostEqual(lag, 0.05)
+
+
+class TestSources(unittest.TestCase):
+    def test_growing_file_is_followed(self):
+        """Test file_source yields audio as it is appended and stops once the file is idle"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "call.pcm")
+
+            def record():
+                with open(path, "wb") as f:
+                    for _ in range(4):
+                        # Odd-sized writes split samples across reads
+                        f.write(b"\1" * 8001)
+                        f.flush()
+                        time.sleep(0.05)
+                    f.write(b"\1" * 4)
+
+            writer = threading.Thread(target=record)
+            writer.start()
+            chunks = list(file_source(path, poll_seconds=0.01, idle_timeout=0.3))
+            writer.join()
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 4 * 8001 + 4)
+        self.assertTrue(all(len(chunk) % live.SAMPLE_WIDTH == 0 for chunk in chunks))
+
+    def test_wav_header_chunks_are_skipped(self):
+        """Test a WAV file's LIST (odd-sized, so padded) and fact chunks are skipped rather than read as audio"""
+        samples = b"\1\2" * 4000
+        fmt = struct.pack("<HHIIHH", 1, 1, live.SAMPLE_RATE, live.BYTES_PER_SECOND, live.SAMPLE_WIDTH, 16)
+        chunks = [(b"fmt ", fmt), (b"LIST", b"INFOISFT\5\0\0\0Lavf\0"), (b"fact", b"\0" * 4), (b"data", samples)]
+        body = b"WAVE" + b"".join(name + struct.pack("<I", len(data)) + data + b"\0" * (len(data) & 1) for name, data in chunks)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "call.wav")
+            with open(path, "wb") as f:
+                f.write(b"RIFF" + struct.pack("<I", len(body)) + body)
+            received = b"".join(file_source(path, poll_seconds=0.01, idle_timeout=0.05))
+        self.assertEqual(received, samples)
+
+    def test_websocket_stream(self):
+        """Test binary WebSocket messages are yielded until the client disconnects"""
+        from websockets.sync.client import connect
+
+        port = free_port()
+        ready = threading.Event()
+        received = []
+        consumer = threading.Thread(target=lambda: received.extend(live.websocket_source("127.0.0.1", port, ready=ready)))
+        consumer.start()
+        self.assertTrue(ready.wait(5))
+        with connect(f"ws://127.0.0.1:{port}") as client:
+            client.send(b"\0\1" * 100)
+            client.send("ignored text frame")
+            client.send(b"\2\3" * 100)
+        consumer.join(5)
+        self.assertEqual(received, [b"\0\1" * 100, b"\2\3" * 100])
+
+
+class TestActionItems(unittest.TestCase):
+    def test_commitments_and_meetings(self):
+        """Test sentences that commit to an action are listed once, with any meeting they mention"""
+        text = "The weather is nice. I'll send over the contract. I'll send over the contract. Let's schedule a call Friday at 2pm."
+        items = extract_action_items(text, datetime(2025, 6, 24, 9, 0))
+        self.assertEqual(items["action_items"], ["I'll send over the contract.", "Let's schedule a call Friday at 2pm."])
+        self.assertEqual(items["meetings"], [{"title": "Let's schedule a call Friday at 2pm.", "start_time": "2025-06-27T14:00:00"}])
+
+
+class TestCommandLine(unittest.TestCase):
+    def test_action_items_are_printed_once(self):
+        """Test each periodic action item pass prints only the items not printed before"""
+        class FakeTranscriber:
+            def __init__(self, on_update, **kwargs):
+                self.on_update = on_update
+                self.buffer = RollingBuffer()
+
+            def run(self, source):
+                self.on_update("action_items", {"action_items": ["Send pricing."], "meetings": []})
+                self.on_update("action_items", {"action_items": ["Send pricing.", "Book a demo."], "meetings": []})
+                return {"transcription": "", "lag": {"windows": 0, "mean": 0.0, "max": 0.0}}
+
+        output = io.StringIO()
+        with mock.patch.object(live, "LiveTranscriber", FakeTranscriber), \
+                mock.patch.object(live, "replay_source"), contextlib.redirect_stdout(output):
+            live.main(["--replay", "call.mp3"])
+        self.assertEqual([line for line in output.getvalue().splitlines() if "[action]" in line],
+                         ["  [action] Send pricing.", "  [action] Book a demo."])
+
+
+if __name__ == "__main__":
+    unittest.main()
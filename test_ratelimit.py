@@ -0,0 +1,151 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+import ratelimit
+import tools
+from ratelimit import AdaptiveConcurrency, ProviderLimiter, RateLimitedError, TokenBucket, is_transient
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.backoff = mock.patch.object(ratelimit, "BACKOFF_BASE_SECONDS", 0.001)
+        self.backoff.start()
+
+    def tearDown(self):
+        self.backoff.stop()
+
+    def test_token_bucket_paces_after_burst(self):
+        """Test calls beyond the burst wait for the refill rate"""
+        bucket = TokenBucket(rate_per_second=10, burst=2)
+        waits = [bucket.reserve() for _ in range(4)]
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 0.1, places=2)
+        self.assertAlmostEqual(waits[3], 0.2, places=2)
+
+    def test_adaptive_concurrency_backs_off_and_ramps_up(self):
+        """Test the limit halves on a rate limit and climbs back on success"""
+        concurrency = AdaptiveConcurrency(max_limit=8, initial=8)
+        concurrency.on_rate_limited()
+        self.assertEqual(concurrency.limit, 4)
+        for _ in range(4):
+            concurrency.on_success()
+        self.assertEqual(concurrency.limit, 5)
+
+    def test_retries_rate_limited_calls(self):
+        """Test 429s are retried and shrink the concurrency limit"""
+        limiter = ProviderLimiter("test", rate_per_second=1000, burst=10, max_concurrency=8, max_retries=5)
+        outcomes = [RateLimitedError("slow down"), RateLimitedError("slow down"), "ok"]
+
+        def call():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        self.assertEqual(limiter.call(call), "ok")
+        self.assertEqual(limiter.stats()["rate_limited"], 2)
+        # Starts at 4, halved twice to 1, then one success ramps it to 2
+        self.assertEqual(limiter.stats()["concurrency_limit"], 2)
+
+    def test_does_not_retry_permanent_errors(self):
+        """Test non-transient errors surface immediately"""
+        limiter = ProviderLimiter("test", rate_per_second=1000, burst=10, max_concurrency=8, max_retries=5)
+        func = mock.Mock(side_effect=ValueError("bad request"))
+        with self.assertRaises(ValueError):
+            limiter.call(func)
+        self.assertEqual(func.call_count, 1)
+
+    def test_async_call_retries(self):
+        """Test the async path retries and respects the limiter"""
+        limiter = ProviderLimiter("test", rate_per_second=1000, burst=10, max_concurrency=2, max_retries=3)
+        attempts = []
+
+        async def call():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise RateLimitedError("slow down")
+            return "ok"
+
+        self.assertEqual(asyncio.run(limiter.acall(call)), "ok")
+        self.assertEqual(len(attempts), 2)
+
+    def test_stream_holds_its_slot_until_consumed(self):
+        """Test ahold keeps the concurrency slot while the caller reads the result"""
+        limiter = ProviderLimiter("test", rate_per_second=1000, burst=10, max_concurrency=2, max_retries=3)
+
+        async def open_stream():
+            return iter(["a", "b"])
+
+        async def consume():
+            async with limiter.ahold(open_stream) as stream:
+                seen = [(chunk, limiter.concurrency.in_flight) for chunk in stream]
+            return seen, limiter.concurrency.in_flight
+
+        self.assertEqual(asyncio.run(consume()), ([("a", 1), ("b", 1)], 0))
+
+    def test_async_waiters_are_served_in_order(self):
+        """Test coroutines waiting for a slot are woken by release, oldest first, and cancelled waiters don't leak slots"""
+        concurrency = AdaptiveConcurrency(max_limit=1, initial=1)
+        order = []
+
+        async def worker(name):
+            await concurrency.aacquire()
+            order.append(name)
+            await asyncio.sleep(0)
+            concurrency.release()
+
+        async def run():
+            await concurrency.aacquire()
+            tasks = [asyncio.create_task(worker(name)) for name in "abc"]
+            cancelled = asyncio.create_task(worker("x"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            # Released from another thread, the way the sync path does
+            await asyncio.to_thread(concurrency.release)
+            await asyncio.wait_for(asyncio.gather(*tasks), timeout=1)
+            return concurrency.in_flight
+
+        with mock.patch.object(ratelimit.asyncio, "sleep", wraps=asyncio.sleep) as sleep:
+            self.assertEqual(asyncio.run(run()), 0)
+        self.assertEqual(order, ["a", "b", "c"])
+        # Waiting doesn't poll: only the workers' own yields sleep
+        self.assertEqual(sleep.call_count, 4)
+
+    def test_connection_errors_are_transient(self):
+        """Test connection failures from requests (which SerpAPI uses) and builtins are retried, others are not"""
+        self.assertTrue(is_transient(requests.exceptions.ConnectionError("reset")))
+        self.assertTrue(is_transient(requests.exceptions.ReadTimeout("slow")))
+        self.assertTrue(is_transient(ConnectionResetError()))
+        self.assertFalse(is_transient(requests.exceptions.InvalidURL("bad")))
+        self.assertFalse(is_transient(tools.SearchError("Invalid API key.")))
+
+    def test_serpapi_server_errors_are_retried(self):
+        """Test a SerpAPI 5xx response is retried instead of parsed as results"""
+        limiter = ProviderLimiter("test", rate_per_second=1000, burst=10, max_concurrency=2, max_retries=3)
+        search = mock.Mock()
+        search.get_response.side_effect = [mock.Mock(status_code=503), mock.Mock(status_code=200)]
+        self.assertEqual(limiter.call(tools._serpapi_request, search).status_code, 200)
+        self.assertEqual(limiter.stats()["retries"], 1)
+
+    def test_quota_is_split_between_processes(self):
+        """Test set_process_share rebuilds the limiters with 1/N of the quota"""
+        quota = {"OPENAI_RATE_PER_SECOND": "8", "OPENAI_BURST": "16", "OPENAI_MAX_CONCURRENCY": "2"}
+        try:
+            with mock.patch.dict(os.environ, quota):
+                ratelimit.set_process_share(4)
+                limiter = ratelimit.get_limiter("openai")
+            self.assertEqual(limiter.bucket.rate, 2.0)
+            self.assertEqual(limiter.bucket.capacity, 4)
+            # Every process keeps at least one slot
+            self.assertEqual(limiter.concurrency.max_limit, 1)
+        finally:
+            ratelimit.set_process_share(1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import http.client
+import json
+import threading
+import time
+import unittest
+
+from service import create_server
+
+
+class TestService(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+
+        def process(audio_file_path, on_progress=None, filename=None):
+            on_progress("transcribing")
+            self.release.wait(5)
+            with open(audio_file_path, "rb") as f:
+                return {"summary": f"{len(f.read())} bytes"}
+
+        self.server = create_server(port=0, workers=1, max_queued=1, process=process)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, method, path, body=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=10)
+        conn.request(method, path, body=body)
+        response = conn.getresponse()
+        data = response.read()
+        conn.close()
+        return response.status, data
+
+    def test_job_lifecycle_and_backpressure(self):
+        """Test jobs are queued, rejected with 429 at capacity, and pollable to completion"""
+        status, body = self.request("POST", "/jobs", b"\x00" * 2048)
+        self.assertEqual(status, 202)
+        first = json.loads(body)["id"]
+        while json.loads(self.request("GET", f"/jobs/{first}")[1])["status"] == "queued":
+            time.sleep(0.01)
+
+        # One job is running and one waits in the queue; the next is rejected
+        statuses = [self.request("POST", "/jobs", b"\x00")[0] for _ in range(3)]
+        self.assertEqual(statuses.count(202), 1)
+        self.assertEqual(statuses[-1], 429)
+
+        self.release.set()
+        status, body = self.request("GET", f"/jobs/{first}/events")
+        self.assertEqual(status, 200)
+        self.assertIn(b"event: done", body)
+
+        status, body = self.request("GET", f"/jobs/{first}")
+        job = json.loads(body)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["result"], {"summary": "2048 bytes"})
+
+    def test_unknown_job(self):
+        """Test polling an unknown job returns 404"""
+        self.assertEqual(self.request("GET", "/jobs/" + "0" * 32)[0], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import similarity
+from fake_services import FakeServices
+from similarity import SimilarityIndex, embed_texts
+
+
+def add_calls(directory, call_ids):
+    """Index each call as a vector that encodes its ID, a few calls at a time"""
+    index = SimilarityIndex(directory, dimensions=2)
+    for start in range(0, len(call_ids), 3):
+        batch = call_ids[start:start + 3]
+        index.add(batch, [[1, call_id] for call_id in batch])
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp_dir.name, "similarity")
+        # Tiny blocks and capacity so queries span several blocks and the matrix grows
+        self.patches = [
+            mock.patch.object(similarity, "INITIAL_CAPACITY", 4),
+            mock.patch.object(similarity, "QUERY_BLOCK_ROWS", 3),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_blocked_top_k_matches_brute_force(self):
+        """Test incremental appends and blocked batched queries agree with a full scan"""
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(25, 8)).astype(np.float32)
+        index = SimilarityIndex(self.directory, dimensions=8)
+        for start in range(0, 25, 7):
+            index.add(list(range(100 + start, 100 + min(start + 7, 25))), vectors[start:start + 7])
+        self.assertEqual(len(index), 25)
+
+        queries = rng.normal(size=(3, 8)).astype(np.float32)
+        results = index.search(queries, k=4)
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normalized.T
+        for result, expected in zip(results, scores):
+            self.assertEqual([call_id for call_id, _ in result], [100 + i for i in np.argsort(-expected)[:4]])
+            self.assertAlmostEqual(result[0][1], float(np.max(expected)), places=5)
+
+    def test_persists_and_replaces_in_place(self):
+        """Test the index reopens from disk and re-adding a call overwrites its row"""
+        index = SimilarityIndex(self.directory, dimensions=2)
+        index.add([1, 2, 3], [[1, 0], [0, 1], [1, 1]])
+        index.add([2], [[1, 0.1]])
+
+        reopened = SimilarityIndex(self.directory, dimensions=2)
+        self.assertEqual(len(reopened), 3)
+        self.assertEqual([call_id for call_id, _ in reopened.similar_to(1, k=2)], [2, 3])
+        self.assertEqual(reopened.search([[0, 1]], k=5, exclude_ids=[3])[0][0][0], 2)
+
+    def test_recovers_from_interrupted_append(self):
+        """Test a partly written ID file is trimmed so later appends stay aligned"""
+        index = SimilarityIndex(self.directory, dimensions=2)
+        index.add([1, 2], [[1, 0], [0, 1]])
+        with open(index.ids_path, "ab") as ids_file:
+            ids_file.write(b"\x07\x00\x00")
+
+        reopened = SimilarityIndex(self.directory, dimensions=2)
+        reopened.add([3], [[1, 1]])
+        self.assertEqual(len(SimilarityIndex(self.directory, dimensions=2)), 3)
+        self.assertEqual(reopened.similar_to(1, k=1)[0][0], 3)
+
+    @unittest.skipIf(similarity.fcntl is None, "needs fcntl file locks")
+    def test_concurrent_writer_processes(self):
+        """Test writers in several processes keep every row paired with its own ID while the matrix grows"""
+        SimilarityIndex(self.directory, dimensions=2).add([0], [[1, 0]])
+        # Forked workers inherit the tiny capacity, so the matrix is regrown under the other writers
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=add_calls, args=(self.directory, list(range(1 + 20 * w, 21 + 20 * w))))
+                   for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+
+        index = SimilarityIndex(self.directory, dimensions=2)
+        self.assertEqual(sorted(index._ids), list(range(81)))
+        for call_id in range(81):
+            vector = index.vector(call_id)
+            self.assertAlmostEqual(vector[1] / vector[0], call_id, places=3)
+
+    def test_index_sees_rows_other_writers_added(self):
+        """Test an open index picks up calls another process appended, even after the matrix was regrown"""
+        reader = SimilarityIndex(self.directory, dimensions=2)
+        reader.add([1], [[1, 0]])
+        SimilarityIndex(self.directory, dimensions=2).add(list(range(2, 12)), [[0, 1]] * 10)
+        self.assertEqual(reader.search([[0, 1]], k=1)[0][0][1], 1.0)
+        self.assertIn(11, reader)
+        reader.add([12], [[1, 1]])
+        self.assertEqual(len(SimilarityIndex(self.directory, dimensions=2)), 12)
+
+    def test_embeddings_from_fake_api(self):
+        """Test texts are embedded through the OpenAI client and similar calls rank first"""
+        from openai import OpenAI
+        with FakeServices(latency={"embeddings": 0}) as services:
+            client = OpenAI(api_key="sk-fake", base_url=f"{services.base_url}/v1", max_retries=0)
+            vectors = embed_texts([
+                "Acme Corp pricing objection and security review",
+                "Renewal call about onboarding and training",
+                "Security review and pricing objection from Acme Corp",
+            ], client=client, dimensions=64)
+
+        self.assertEqual(vectors.shape, (3, 64))
+        index = SimilarityIndex(self.directory, dimensions=64)
+        index.add([1, 2, 3], vectors)
+        self.assertEqual(index.similar_to(1, k=1)[0][0], 3)
+
+    def test_indexing_runs_in_the_background(self):
+        """Test index_call_in_background returns before the embedding request finishes"""
+        release = threading.Event()
+
+        def slow_embed(texts, dimensions=None):
+            release.wait(5)
+            return np.ones((len(texts), dimensions), dtype=np.float32)
+
+        index = SimilarityIndex(self.directory, dimensions=2)
+        with mock.patch.object(similarity, "embed_texts", side_effect=slow_embed):
+            future = similarity.index_call_in_background(7, {"summary": "Pricing call"}, index=index)
+            self.assertFalse(future.done())
+            release.set()
+            self.assertTrue(future.result(5))
+        self.assertIn(7, index)
+
+
+if __name__ == '__main__':
+    unittest.main()
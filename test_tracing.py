@@ -0,0 +1,55 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from tracing import add_span_listener, in_current_context, record_llm_call, remove_span_listener, span
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        tracing.metrics.reset()
+        self.spans = []
+        add_span_listener(self.spans.append)
+
+    def tearDown(self):
+        remove_span_listener(self.spans.append)
+
+    def test_spans_nest_across_thread_pools(self):
+        """Test child spans share the trace and point at their parent, even from worker threads"""
+        def child(i):
+            with span("child", index=i):
+                pass
+
+        with span("parent") as parent:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(in_current_context(child), range(3)))
+
+        children = [s for s in self.spans if s.name == "child"]
+        self.assertEqual(len(children), 3)
+        self.assertTrue(all(s.parent_id == parent.span_id for s in children))
+        self.assertTrue(all(s.trace_id == parent.trace_id for s in children))
+        self.assertIsNotNone(parent.duration)
+
+    def test_errors_are_recorded(self):
+        """Test a failing span is marked as an error and re-raises"""
+        with self.assertRaises(ValueError):
+            with span("boom"):
+                raise ValueError("bad")
+        self.assertEqual(self.spans[-1].status, "error")
+
+    def test_llm_usage_and_prometheus_export(self):
+        """Test token counts and cost land on the span and in the metrics export"""
+        with span("llm.analysis") as s:
+            record_llm_call("gpt-4o-mini-2024-07-18", prompt_tokens=1000, completion_tokens=500)
+        self.assertEqual(s.attributes["prompt_tokens"], 1000)
+        self.assertEqual(s.attributes["llm_calls"], 1)
+        self.assertAlmostEqual(s.attributes["cost_usd"], 0.00045)
+
+        exported = tracing.render_metrics()
+        self.assertIn('llm_prompt_tokens_total{model="gpt-4o-mini-2024-07-18",stage="analysis"} 1000', exported)
+        self.assertIn("# TYPE span_duration_seconds histogram", exported)
+        self.assertIn('span_duration_seconds_count{span="llm.analysis",status="ok"} 1', exported)
+
+
+if __name__ == '__main__':
+    unittest.main()
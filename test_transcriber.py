@@ -0,0 +1,253 @@
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import wave
+from unittest import mock
+
+import numpy as np
+
+import preprocess
+import transcriber
+
+from transcriber import LocalWhisperBackend, OpenAIWhisperBackend, get_transcription_backend, plan_chunks
+
+
+def write_tone_wav(path, pattern, rate=16000, channels=1):
+    """Write a WAV of alternating silence and 440 Hz tone, given as [(seconds, is_tone), ...]"""
+    parts = [
+        0.5 * np.sin(2 * np.pi * 440 * np.arange(int(seconds * rate)) / rate) if is_tone else np.zeros(int(seconds * rate))
+        for seconds, is_tone in pattern
+    ]
+    samples = (np.concatenate(parts) * 32767).astype("<i2")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(samples, channels).tobytes())
+    return len(samples)
+
+
+class SpeechBackend:
+    """Fake API backend that reports each stretch of tone in a chunk as a segment"""
+
+    name = "fake"
+    model_id = "fake-whisper"
+    wants_preprocessing = True
+    max_chunk_seconds = 30
+
+    def transcribe_segments(self, chunks, max_workers=None, on_chunk=None):
+        from pydub.silence import detect_nonsilent
+
+        results = []
+        for offset, segment in chunks:
+            segments = [{"start": offset + start / 1000.0, "end": offset + end / 1000.0, "text": "tone"}
+                        for start, end in detect_nonsilent(segment, min_silence_len=100, silence_thresh=-50)]
+            results.append((" ".join(item["text"] for item in segments), segments))
+            if on_chunk:
+                on_chunk(*results[-1])
+        return results
+
+
+class TestChunkPlanning(unittest.TestCase):
+    def test_cuts_at_silence(self):
+        """Test chunks end at the midpoint of the last silence in each window"""
+        silences = [[9000, 11000], [25000, 27000], [38000, 40000]]
+        chunks = plan_chunks(50000, silences, max_chunk_ms=30000)
+        self.assertEqual(chunks, [(0, 26000), (26000, 50000)])
+
+    def test_hard_cut_without_silence(self):
+        """Test audio with no silence is cut at the chunk bound"""
+        chunks = plan_chunks(65000, [], max_chunk_ms=30000)
+        self.assertEqual(chunks, [(0, 30000), (30000, 60000), (60000, 65000)])
+
+    def test_chunks_are_bounded_and_contiguous(self):
+        """Test every chunk respects the bound and chunks tile the audio"""
+        silences = [[i, i + 800] for i in range(5000, 600000, 17000)]
+        chunks = plan_chunks(600000, silences, max_chunk_ms=60000)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], 600000)
+        for (_, end), (start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, start)
+        self.assertTrue(all(end - start <= 60000 for start, end in chunks))
+
+
+class TestBackendSelection(unittest.TestCase):
+    def test_backends_are_shared(self):
+        """Test each backend is built once per process, without loading a model"""
+        local = get_transcription_backend("local")
+        self.assertIsInstance(local, LocalWhisperBackend)
+        self.assertIs(local, get_transcription_backend("local"))
+        self.assertIsInstance(get_transcription_backend("openai"), OpenAIWhisperBackend)
+
+    def test_backends_have_distinct_cache_keys(self):
+        """Test local and hosted transcripts never share cache entries"""
+        self.assertNotEqual(OpenAIWhisperBackend().model_id, LocalWhisperBackend("base").model_id)
+
+    def test_unknown_backend(self):
+        """Test an unknown backend name is rejected"""
+        with self.assertRaises(ValueError):
+            get_transcription_backend("nope")
+
+
+class TestLocalWhisper(unittest.TestCase):
+    def setUp(self):
+        # Stand-ins for whisper and torch: each window's "mel" is its index, and decoding echoes it back
+        windows = iter(range(100))
+        self.whisper = mock.MagicMock()
+        self.whisper.audio.SAMPLE_RATE = 16000
+        self.whisper.log_mel_spectrogram.side_effect = lambda audio, n_mels: next(windows)
+        self.whisper.decode.side_effect = lambda model, mels, options: [mock.Mock(text=f" window {mel} ") for mel in mels]
+        self.torch = mock.MagicMock()
+        self.torch.stack.side_effect = lambda mels: mock.Mock(to=lambda device: list(mels))
+        self.patches = [
+            mock.patch.dict(sys.modules, {"whisper": self.whisper, "torch": self.torch}),
+            mock.patch.dict(transcriber._local_models, clear=True),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_model_is_loaded_once_and_segments_are_batched(self):
+        """Test the model is loaded on first use and reused, and windows are decoded batch_size at a time"""
+        from pydub import AudioSegment
+
+        backend = LocalWhisperBackend("tiny", batch_size=2)
+        chunks = [(30 * i, AudioSegment.silent(duration=1000)) for i in range(5)]
+        first = backend.transcribe_segments(chunks)
+        second = LocalWhisperBackend("tiny", batch_size=2).transcribe_segments(chunks[:1])
+
+        self.whisper.load_model.assert_called_once_with("tiny", device="cpu")
+        self.assertEqual([len(call.args[1]) for call in self.whisper.decode.call_args_list], [2, 2, 1, 1])
+        self.assertEqual([text for text, _ in first], [f"window {i}" for i in range(5)])
+        self.assertEqual(first[4][1], [{"start": 120, "end": 121.0, "text": "window 4"}])
+        self.assertEqual(second[0][0], "window 5")
+
+    def test_language_is_detected_unless_configured(self):
+        """Test Whisper auto-detects the language by default and LOCAL_WHISPER_LANGUAGE pins it"""
+        with mock.patch.dict(os.environ):
+            os.environ.pop("LOCAL_WHISPER_LANGUAGE", None)
+            LocalWhisperBackend("tiny").transcribe_segments([(0, mock.MagicMock())])
+            self.assertIsNone(self.whisper.DecodingOptions.call_args.kwargs["language"])
+            os.environ["LOCAL_WHISPER_LANGUAGE"] = "de"
+            self.assertEqual(LocalWhisperBackend("tiny").language, "de")
+
+
+class TestStreamingTranscription(unittest.TestCase):
+    def test_chunks_are_streamed_in_order(self):
+        """Test chunk text is delivered in order even when later chunks finish first"""
+        backend = OpenAIWhisperBackend(max_workers=3)
+        streamed = []
+
+        def transcribe(client, offset, segment):
+            time.sleep(0.2 if offset == 0 else 0.01)
+            return f"chunk {offset}", []
+
+        with mock.patch.object(backend, "_client"), \
+                mock.patch.object(backend, "_transcribe_segment", side_effect=transcribe):
+            results = backend.transcribe_segments(
+                [(0, None), (30, None), (60, None)],
+                on_chunk=lambda text, segments: streamed.append(text)
+            )
+
+        self.assertEqual(streamed, ["chunk 0", "chunk 30", "chunk 60"])
+        self.assertEqual([text for text, _ in results], streamed)
+
+
+class TestPreprocess(unittest.TestCase):
+    def test_passthrough_without_ffmpeg(self):
+        """Test the original file is used untouched when ffmpeg is unavailable"""
+        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp_file:
+            tmp_file.write(b"\x00" * 1024)
+        try:
+            with mock.patch.object(preprocess.shutil, "which", return_value=None):
+                report = preprocess.preprocess_audio(tmp_file.name)
+            self.assertEqual(report["path"], tmp_file.name)
+            self.assertEqual(report["bytes_saved"], 0)
+            self.assertFalse(report["is_temporary"])
+        finally:
+            os.unlink(tmp_file.name)
+
+    def test_only_leading_and_trailing_silence_is_trimmed(self):
+        """Test the silencedetect bounds ignore pauses inside the call"""
+        log = (
+            "  Duration: 00:00:10.00, start: 0.000000, bitrate: 1411 kb/s\n"
+            "[silencedetect @ 0x1] silence_start: 0\n"
+            "[silencedetect @ 0x1] silence_end: 2.003 | silence_duration: 2.003\n"
+            "[silencedetect @ 0x1] silence_start: 4.001\n"
+            "[silencedetect @ 0x1] silence_end: 7.002 | silence_duration: 3.001\n"
+            "[silencedetect @ 0x1] silence_start: 8.004\n"
+        )
+        start, end = preprocess.speech_bounds(log)
+        self.assertAlmostEqual(start, 1.803)
+        self.assertAlmostEqual(end, 8.204)
+        # Newer ffmpeg also closes the final silence at the end of the file
+        self.assertAlmostEqual(preprocess.speech_bounds(log + "silence_end: 10 | silence_duration: 1.996\n")[1], 8.204)
+        # Speech right up to the end keeps the tail
+        self.assertEqual(preprocess.speech_bounds(log.rsplit("[", 1)[0]), (start, None))
+        self.assertEqual(preprocess.speech_bounds(""), (0.0, None))
+
+    def test_segment_times_match_the_original_recording(self):
+        """Test segments after a mid-call pause keep their original times once the lead-in is trimmed"""
+        with tempfile.TemporaryDirectory() as directory:
+            original, trimmed = os.path.join(directory, "call.wav"), os.path.join(directory, "trimmed.wav")
+            write_tone_wav(original, [(2, False), (2, True), (3, False), (1, True), (2, False)])
+            # What preprocessing keeps of it: 0.2s of padding either side of the speech
+            write_tone_wav(trimmed, [(0.2, False), (2, True), (3, False), (1, True), (0.2, False)])
+            report = {"path": trimmed, "bytes_saved": 0, "upload_seconds_saved": 0.0,
+                      "trim_start_seconds": 1.8, "is_temporary": False}
+            segments = []
+            with mock.patch.object(transcriber, "preprocess_audio", return_value=report), \
+                    mock.patch.dict(os.environ, {"TRANSCRIPTION_CACHE": "0"}):
+                transcriber.transcribe_audio(original, backend=SpeechBackend(), preprocess=True,
+                                             on_chunk=lambda text, chunk_segments: segments.extend(chunk_segments))
+        self.assertEqual(len(segments), 2)
+        for segment, (start, end) in zip(segments, [(2.0, 4.0), (7.0, 8.0)]):
+            self.assertAlmostEqual(segment["start"], start, delta=0.02)
+            self.assertAlmostEqual(segment["end"], end, delta=0.02)
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_encodes_mono_16k_opus_and_trims_silence(self):
+        """Test a stereo 44.1 kHz WAV becomes mono 16 kHz Opus trimmed at both ends only, and the savings are reported"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "call.wav")
+            # 2s of silence, 2s of tone, a 3s pause, 1s of tone, 2s of silence
+            frames = write_tone_wav(path, [(2, False), (2, True), (3, False), (1, True), (2, False)], rate=44100, channels=2)
+
+            report = preprocess.preprocess_audio(path, output_dir=directory)
+
+            self.assertTrue(report["is_temporary"])
+            with open(report["path"], "rb") as encoded:
+                data = encoded.read()
+            # The OpusHead packet records the channel count and the input sample rate
+            head = data.index(b"OpusHead")
+            self.assertEqual(data[head + 9], 1)
+            self.assertEqual(struct.unpack_from("<I", data, head + 12)[0], preprocess.TARGET_SAMPLE_RATE)
+
+            decoded = subprocess.run(
+                ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", report["path"], "-f", "s16le", "-ac", "1", "-ar", "16000", "-"],
+                check=True, capture_output=True
+            ).stdout
+            seconds = len(decoded) / (2 * 16000)
+            # Both tones and the whole pause between them, plus the padding at each end
+            self.assertAlmostEqual(seconds, 6 + 2 * preprocess.TRIM_PADDING_SECONDS, delta=0.1)
+            self.assertAlmostEqual(report["trim_start_seconds"], 2 - preprocess.TRIM_PADDING_SECONDS, delta=0.05)
+
+        self.assertEqual(report["original_bytes"], 44 + frames * 4)
+        self.assertEqual(report["encoded_bytes"], len(data))
+        self.assertEqual(report["bytes_saved"], report["original_bytes"] - report["encoded_bytes"])
+        self.assertAlmostEqual(report["upload_seconds_saved"],
+                               report["bytes_saved"] * 8 / (preprocess.UPLOAD_BANDWIDTH_MBPS * 1_000_000))
+        self.assertGreater(report["encode_seconds"], 0)
+        self.assertAlmostEqual(report["time_saved"], report["upload_seconds_saved"] - report["encode_seconds"])
+
+
+if __name__ == '__main__':
+    unittest.main()
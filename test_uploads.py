@@ -0,0 +1,74 @@
+import io
+import os
+import unittest
+from unittest import mock
+
+import uploads
+from uploads import UploadTooLarge, save_upload, temporary_upload
+
+
+class TestUploads(unittest.TestCase):
+    def setUp(self):
+        self.chunk_size = mock.patch.object(uploads, "UPLOAD_CHUNK_SIZE", 1024)
+        self.chunk_size.start()
+
+    def tearDown(self):
+        self.chunk_size.stop()
+
+    def test_stream_is_copied_in_chunks(self):
+        """Test the upload is copied intact, reading no more than one chunk at a time"""
+        data = os.urandom(10 * 1024 + 7)
+        stream = io.BytesIO(data)
+        with mock.patch.object(stream, "read", wraps=stream.read) as read:
+            path = save_upload(stream, suffix=".mp3")
+        try:
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), data)
+            self.assertTrue(all(call.args[0] <= 1024 for call in read.call_args_list))
+        finally:
+            os.unlink(path)
+
+    def track_temporary_files(self):
+        """Patch mkstemp to record the paths it creates"""
+        created = []
+        original = uploads.tempfile.mkstemp
+
+        def mkstemp(**kwargs):
+            fd, path = original(**kwargs)
+            created.append(path)
+            return fd, path
+        return mock.patch.object(uploads.tempfile, "mkstemp", side_effect=mkstemp), created
+
+    def test_oversized_upload_is_rejected_and_removed(self):
+        """Test the size cap applies while streaming and leaves no temporary file"""
+        patch, created = self.track_temporary_files()
+        with patch, self.assertRaises(UploadTooLarge):
+            save_upload(io.BytesIO(b"x" * 5000), max_bytes=4096)
+        self.assertEqual(len(created), 1)
+        self.assertFalse(os.path.exists(created[0]))
+
+    def test_declared_oversized_upload_is_rejected_before_reading(self):
+        """Test a Content-Length over the cap is refused without creating a file"""
+        patch, created = self.track_temporary_files()
+        with patch, self.assertRaises(UploadTooLarge):
+            save_upload(io.BytesIO(b""), length=5000, max_bytes=4096)
+        self.assertEqual(created, [])
+
+    def test_truncated_upload_raises(self):
+        """Test a body shorter than its declared length is reported and cleaned up"""
+        patch, created = self.track_temporary_files()
+        with patch, self.assertRaises(ConnectionError):
+            save_upload(io.BytesIO(b"x" * 100), length=200)
+        self.assertFalse(os.path.exists(created[0]))
+
+    def test_temporary_upload_is_removed_when_processing_fails(self):
+        """Test the temporary file is deleted even if the caller raises"""
+        with self.assertRaises(RuntimeError):
+            with temporary_upload(io.BytesIO(b"audio")) as path:
+                self.assertTrue(os.path.exists(path))
+                raise RuntimeError("transcription failed")
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,32 +1,103 @@
+"""
+Calendar and web search tools used by the agent.
+
+LangChain and SerpAPI are slow to import, so they are loaded on first use;
+the LangChain Tool wrappers (calendar_tool, tools) are built the first
+time they are accessed. Dates are parsed by dates.py.
+"""
+import hashlib
 import os
+import threading
 from dotenv import load_dotenv
-from langchain.tools import Tool
-from serpapi import GoogleSearch
-from datetime import datetime, timedelta
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-import dateparser
+from datetime import timedelta
+from cache import get_search_cache
+from clients import get_calendar_service
+from dates import parse_datetime
+from ratelimit import RateLimitedError, get_limiter
+from tracing import current_span, record_tool_call, span
 
 load_dotenv()
 
 # --- Web Search Tool (SerpAPI) ---
 SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
+# Overrides https://serpapi.com, e.g. to point at the benchmark's fake server
+SERPAPI_BACKEND = os.getenv("SERPAPI_BACKEND")
 
-def serpapi_search(query: str) -> str:
+class SearchError(Exception):
+    """Raised when SerpAPI returns an error instead of results."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        # 5xx codes make the limiter retry the request
+        self.status_code = status_code
+
+
+def _serpapi_request(search):
+    """Send one SerpAPI request, surfacing throttling and server errors as exceptions so they are retried."""
+    response = search.get_response()
+    if response.status_code == 429:
+        raise RateLimitedError("SerpAPI rate limit exceeded", response.headers.get("Retry-After"))
+    if response.status_code >= 500:
+        raise SearchError(f"SerpAPI returned HTTP {response.status_code}", response.status_code)
+    return response
+
+
+def _serpapi_fetch(query: str) -> str:
+    if current_span() is not None:
+        current_span().set(cache_hit=False)
     params = {
         "q": query,
         "api_key": SERPAPI_API_KEY,
         "engine": "google",
         "num": 3
     }
+    from serpapi import GoogleSearch
     search = GoogleSearch(params)
-    results = search.get_dict()
+    if SERPAPI_BACKEND:
+        search.BACKEND = SERPAPI_BACKEND
+    response = get_limiter("serpapi").call(_serpapi_request, search)
+    results = response.json()
     if "organic_results" in results:
         return "\n".join([f"{r['title']}: {r['link']}" for r in results["organic_results"][:3]])
+    if "error" in results and "hasn't returned any results" not in results["error"]:
+        # Errors are not cached, so the next call retries
+        raise SearchError(results["error"])
     return "No results found."
 
+
+def serpapi_search(query: str) -> str:
+    """
+    Search the web via SerpAPI. Results are cached by normalized query with a
+    TTL, and concurrent identical queries share a single request.
+    """
+    cache = get_search_cache()
+    with span("tool.web_search", query=query, cache_hit=True) as s:
+        try:
+            if cache is None:
+                result = _serpapi_fetch(query)
+            else:
+                result = cache.get_or_compute(query, _serpapi_fetch)
+        except (SearchError, RateLimitedError) as e:
+            s.set(failed=True)
+            record_tool_call("web_search", "error")
+            return f"Search failed: {e}"
+        record_tool_call("web_search", "ok")
+        return result
+
 # --- Calendar Tool (Google Calendar API) ---
-SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
+
+
+def calendar_event_id(summary: str, start, duration_minutes: int) -> str:
+    """
+    Return a deterministic Google Calendar event ID for a meeting.
+
+    A request that timed out may still have created the event, so the same
+    meeting always gets the same ID and a retry is rejected as a duplicate
+    instead of creating a second event. Calendar IDs use the base32hex
+    alphabet (0-9, a-v), of which hex digits are a subset.
+    """
+    key = f"{' '.join(summary.lower().split())}|{start.isoformat()}|{duration_minutes}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
 
 
 def schedule_event(summary: str, start_time: str = None, duration_minutes: int = 30) -> str:
@@ -34,27 +105,17 @@ def schedule_event(summary: str, start_time: str = None, duration_minutes: int =
     Schedule an event in Google Calendar.
     If start_time is not provided, attempts to parse it from the summary.
     Handles both ISO 8601 and natural language date/time strings.
+    Scheduling the same meeting twice returns the existing event.
     """
-    # Try to extract start_time if not provided
-    if not start_time:
-        # Try to extract a date/time from the summary using dateparser
-        dt = dateparser.parse(summary)
-        if not dt:
-            return "Could not determine event time from the provided information. Please specify a date and time."
-    else:
-        # Try ISO 8601 first
-        try:
-            dt = datetime.fromisoformat(start_time)
-        except ValueError:
-            # Fallback to dateparser
-            dt = dateparser.parse(start_time)
-        if not dt:
-            return "Could not determine event time from the provided information. Please specify a date and time."
+    # ISO 8601 and common spoken forms are parsed directly; dateparser is the fallback.
+    # Without a start_time, the first date/time mentioned in the summary is used.
+    dt = parse_datetime(start_time or summary)
+    if not dt:
+        return "Could not determine event time from the provided information. Please specify a date and time."
 
     end_time = dt + timedelta(minutes=duration_minutes)
-    creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
     event = {
+        'id': calendar_event_id(summary, dt, duration_minutes),
         'summary': summary,
         'start': {
             'dateTime': dt.isoformat(),
@@ -65,23 +126,52 @@ def schedule_event(summary: str, start_time: str = None, duration_minutes: int =
             'timeZone': 'UTC',
         },
     }
-    try:
-        event_result = service.events().insert(calendarId='primary', body=event).execute()
+    with span("tool.calendar", start_time=dt.isoformat()) as s:
+        try:
+            service = get_calendar_service()
+            try:
+                event_result = service.events().insert(calendarId='primary', body=event).execute()
+            except Exception as e:
+                # 409: an earlier attempt already created this event
+                if getattr(getattr(e, "resp", None), "status", None) != 409:
+                    raise
+                s.set(duplicate=True)
+                event_result = service.events().get(calendarId='primary', eventId=event['id']).execute()
+        except Exception as e:
+            s.set(failed=True)
+            record_tool_call("calendar", "error")
+            return f"Failed to create event: {e}"
+        record_tool_call("calendar", "ok")
         return f"Event created: {event_result.get('htmlLink')}"
-    except Exception as e:
-        return f"Failed to create event: {e}"
-
-calendar_tool = Tool(
-    name="Calendar",
-    func=schedule_event,
-    description="Schedules a meeting or demo in Google Calendar. Input should include the meeting summary and date/time (ISO 8601 or natural language)."
-)
-
-tools = [
-    Tool(
-        name="Web Search",
-        func=serpapi_search,
-        description="Searches the web for real-time information about competitors, products, or market trends. Input should be a search query."
-    ),
-    calendar_tool
-] 
\ No newline at end of file
+
+_langchain_tools = {}
+_langchain_tools_lock = threading.Lock()
+
+
+def _build_langchain_tools():
+    """Wrap the tools for the LangChain agent, once per process."""
+    with _langchain_tools_lock:
+        if not _langchain_tools:
+            from langchain.tools import Tool
+            calendar_tool = Tool(
+                name="Calendar",
+                func=schedule_event,
+                description="Schedules a meeting or demo in Google Calendar. Input should include the meeting summary and date/time (ISO 8601 or natural language)."
+            )
+            _langchain_tools["calendar_tool"] = calendar_tool
+            _langchain_tools["tools"] = [
+                Tool(
+                    name="Web Search",
+                    func=serpapi_search,
+                    description="Searches the web for real-time information about competitors, products, or market trends. Input should be a search query."
+                ),
+                calendar_tool
+            ]
+        return _langchain_tools
+
+
+def __getattr__(name):
+    # calendar_tool and tools import LangChain, so they are only built when first used
+    if name in ("calendar_tool", "tools"):
+        return _build_langchain_tools()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}") 
\ No newline at end of file
@@ -0,0 +1,269 @@
+"""
+Lightweight tracing and metrics for the call pipeline.
+
+Spans time each stage (upload, transcription, LLM calls, tools) and are
+emitted as JSON log lines on the "tracing" logger. Aggregated counters and
+latency histograms are exposed in Prometheus text format by render_metrics(),
+served by service.py at /metrics or standalone via start_metrics_server().
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger("tracing")
+
+# USD per 1M tokens as (prompt, completion); override with LLM_PRICES='{"model": [in, out]}'
+LLM_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo-preview": (10.00, 30.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+LLM_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Metrics:
+    """Thread-safe counters and histograms keyed by metric name and label set."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def inc(self, name, value=1, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("counter", help_text))
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help_text))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        def fmt_labels(labels):
+            if not labels:
+                return ""
+            escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels]
+            return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+        lines = []
+        with self._lock:
+            for name in sorted(self._help):
+                kind, help_text = self._help[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for (metric, labels), value in sorted(self._counters.items()):
+                        if metric == name:
+                            lines.append(f"{name}{fmt_labels(labels)} {value}")
+                    continue
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                        lines.append(f"{name}_bucket{fmt_labels(labels + (('le', bound),))} {count}")
+                    lines.append(f"{name}_bucket{fmt_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                    lines.append(f"{name}_sum{fmt_labels(labels)} {histogram['sum']}")
+                    lines.append(f"{name}_count{fmt_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+_listeners = []
+
+
+def add_span_listener(callback):
+    """Register callback(span) to be called for every finished span."""
+    _listeners.append(callback)
+
+
+def remove_span_listener(callback):
+    _listeners.remove(callback)
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block of work as a span nested under the current one.
+
+    Usage:
+        with span("transcribe", backend="openai") as s:
+            ...
+            s.set(cached=True)
+    """
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = str(e)
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _current_span.reset(token)
+        metrics.observe("span_duration_seconds", current.duration,
+                        "Duration of each pipeline stage", span=name, status=current.status)
+        logger.info(json.dumps(current.to_dict(), default=str))
+        for listener in list(_listeners):
+            listener(current)
+
+
+def in_current_context(func):
+    """
+    Wrap func so it runs inside a copy of the caller's tracing context.
+
+    Thread pools do not carry context variables over, so work submitted to
+    one would otherwise start new traces instead of nesting under the caller.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def record_llm_call(model, prompt_tokens=0, completion_tokens=0, stage="analysis"):
+    """Count one LLM call with its token usage and estimated cost."""
+    metrics.inc("llm_calls_total", 1, "LLM completions made", model=model, stage=stage)
+    metrics.inc("llm_prompt_tokens_total", prompt_tokens, "Prompt tokens sent", model=model, stage=stage)
+    metrics.inc("llm_completion_tokens_total", completion_tokens, "Completion tokens received", model=model, stage=stage)
+    # Responses name dated snapshots ("gpt-4o-mini-2024-07-18"), so match the longest known prefix
+    matches = [known for known in LLM_PRICES if model.startswith(known)]
+    prices = LLM_PRICES[max(matches, key=len)] if matches else None
+    cost = 0.0
+    if prices:
+        cost = (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+        metrics.inc("llm_cost_usd_total", cost, "Estimated LLM spend in USD", model=model, stage=stage)
+    current = _current_span.get()
+    if current is not None:
+        current.set(
+            model=model,
+            prompt_tokens=current.attributes.get("prompt_tokens", 0) + prompt_tokens,
+            completion_tokens=current.attributes.get("completion_tokens", 0) + completion_tokens,
+            llm_calls=current.attributes.get("llm_calls", 0) + 1,
+            cost_usd=round(current.attributes.get("cost_usd", 0.0) + cost, 6),
+        )
+
+
+def record_llm_response(response, stage="analysis"):
+    """record_llm_call() from an OpenAI chat completion response."""
+    usage = getattr(response, "usage", None)
+    record_llm_call(
+        getattr(response, "model", None) or "unknown",
+        getattr(usage, "prompt_tokens", 0) or 0,
+        getattr(usage, "completion_tokens", 0) or 0,
+        stage,
+    )
+
+
+def record_tool_call(tool, status="ok"):
+    """Count one tool invocation."""
+    metrics.inc("tool_invocations_total", 1, "Tool invocations", tool=tool, status=status)
+
+
+def render_metrics():
+    return metrics.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host="0.0.0.0"):
+    """
+    Serve /metrics on a background thread, once per process. Used by the
+    Streamlit app when METRICS_PORT is set; service.py serves /metrics itself.
+    """
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, int(port or os.getenv("METRICS_PORT", "9100"))), _MetricsHandler)
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics", daemon=True).start()
+        return _metrics_server
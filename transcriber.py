@@ -1,32 +1,398 @@
+import io
 import os
-from openai import OpenAI
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from cache import get_transcription_cache, hash_audio_file
+from clients import get_openai_client
+from preprocess import preprocess_audio
+from ratelimit import get_limiter
+from tracing import in_current_context, metrics, span
 
 # Load environment variables
 load_dotenv()
 
-def transcribe_audio(audio_file_path):
+WHISPER_MODEL = "whisper-1"
+
+# The Whisper API rejects uploads above 25 MB
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+
+# Chunked mode settings
+CHUNK_MAX_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "120"))
+CHUNK_MAX_WORKERS = int(os.getenv("TRANSCRIBE_MAX_WORKERS", "4"))
+# Shorter chunks when streaming, so the first text arrives sooner
+STREAM_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_STREAM_CHUNK_SECONDS", "30"))
+MIN_SILENCE_MS = 700
+SILENCE_SEEK_STEP_MS = 50
+
+
+def plan_chunks(duration_ms, silences, max_chunk_ms):
+    """
+    Choose chunk boundaries that cut at silence wherever possible.
+
+    Args:
+        duration_ms (int): Total audio length in milliseconds
+        silences (list): [start_ms, end_ms] ranges of detected silence
+        max_chunk_ms (int): Upper bound on a single chunk's length
+
+    Returns:
+        list: (start_ms, end_ms) tuples covering the whole audio
+    """
+    cut_points = [(start + end) // 2 for start, end in silences]
+    chunks = []
+    start = 0
+    while start < duration_ms:
+        limit = start + max_chunk_ms
+        if limit >= duration_ms:
+            end = duration_ms
+        else:
+            # Cut at the last silence inside the window, or hard-cut at the limit
+            candidates = [p for p in cut_points if start < p <= limit]
+            end = candidates[-1] if candidates else limit
+        chunks.append((start, end))
+        start = end
+    return chunks
+
+
+def split_audio(audio_file_path, max_chunk_seconds=None):
+    """
+    Split an audio file on silence into bounded segments using pydub.
+
+    Args:
+        audio_file_path (str): Path to the audio file
+        max_chunk_seconds (float, optional): Upper bound on segment length
+
+    Returns:
+        list: (offset_seconds, AudioSegment) tuples in playback order
+    """
+    from pydub import AudioSegment
+    from pydub.silence import detect_silence
+
+    max_chunk_ms = int((max_chunk_seconds or CHUNK_MAX_SECONDS) * 1000)
+    audio = AudioSegment.from_file(audio_file_path)
+    silences = detect_silence(
+        audio,
+        min_silence_len=MIN_SILENCE_MS,
+        silence_thresh=audio.dBFS - 16,
+        seek_step=SILENCE_SEEK_STEP_MS
+    )
+    return [
+        (start / 1000.0, audio[start:end])
+        for start, end in plan_chunks(len(audio), silences, max_chunk_ms)
+    ]
+
+
+class OpenAIWhisperBackend:
+    """
+    Transcribes through the hosted Whisper API, sending segments concurrently.
+    """
+
+    name = "openai"
+
+    # Smaller uploads are faster uploads
+    wants_preprocessing = True
+
+    def __init__(self, model=WHISPER_MODEL, max_workers=None):
+        self.model = model
+        self.max_workers = max_workers or CHUNK_MAX_WORKERS
+        # Segments longer than this are split before upload
+        self.max_chunk_seconds = CHUNK_MAX_SECONDS
+
+    @property
+    def model_id(self):
+        return self.model
+
+    def _client(self):
+        return get_openai_client()
+
+    def transcribe_file(self, audio_file_path):
+        """Transcribe a whole file in a single API call."""
+        def create():
+            metrics.inc("whisper_requests_total", 1, "Whisper API requests", model=self.model)
+            # Reopened per attempt so a retry uploads the file from the start
+            with open(audio_file_path, "rb") as audio_file:
+                return self._client().audio.transcriptions.create(
+                    model=self.model,
+                    file=audio_file
+                )
+        with span("whisper.request", bytes=os.path.getsize(audio_file_path)):
+            return get_limiter("openai").call(create).text
+
+    def _transcribe_segment(self, client, offset, segment):
+        """Transcribe one AudioSegment and shift its timestamps by offset seconds."""
+        buffer = io.BytesIO()
+        segment.set_channels(1).set_frame_rate(16000).export(buffer, format="mp3", bitrate="32k")
+        with span("whisper.request", offset=offset, bytes=buffer.tell()):
+            metrics.inc("whisper_requests_total", 1, "Whisper API requests", model=self.model)
+            transcript = get_limiter("openai").call(
+                client.audio.transcriptions.create,
+                model=self.model,
+                file=("chunk.mp3", buffer.getvalue()),
+                response_format="verbose_json"
+            )
+        segments = [
+            {
+                "start": offset + s.start,
+                "end": offset + s.end,
+                "text": s.text.strip()
+            }
+            for s in (transcript.segments or [])
+        ]
+        return transcript.text.strip(), segments
+
+    def transcribe_segments(self, chunks, max_workers=None, on_chunk=None):
+        """
+        Transcribe (offset_seconds, AudioSegment) chunks concurrently.
+
+        Args:
+            on_chunk (callable, optional): Called as on_chunk(text, segments)
+                for each chunk, in order, as soon as it and every chunk before
+                it have finished
+
+        Returns:
+            list: (text, segments) per chunk, in input order
+        """
+        client = self._client()
+        transcribe = in_current_context(lambda chunk: self._transcribe_segment(client, *chunk))
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as pool:
+            futures = [pool.submit(transcribe, chunk) for chunk in chunks]
+            results = []
+            # Waiting in submission order keeps results in chunk order regardless of completion order
+            for future in futures:
+                results.append(future.result())
+                if on_chunk:
+                    on_chunk(*results[-1])
+            return results
+
+
+# Local models are loaded once per process and shared by every caller
+_local_models = {}
+_local_models_lock = threading.Lock()
+
+
+def load_local_whisper_model(model_name):
+    """
+    Return the resident local Whisper model, loading it on first use.
+
+    Args:
+        model_name (str): Whisper checkpoint name, e.g. "base" or "small"
+
+    Returns:
+        whisper.model.Whisper: The model, on CPU
+    """
+    with _local_models_lock:
+        if model_name not in _local_models:
+            import whisper
+            _local_models[model_name] = whisper.load_model(model_name, device="cpu")
+        return _local_models[model_name]
+
+
+class LocalWhisperBackend:
+    """
+    Runs open-source Whisper on CPU in-process, decoding segments in batches.
+    """
+
+    name = "local"
+
+    # The model resamples to 16 kHz mono itself and nothing is uploaded
+    wants_preprocessing = False
+
+    # Whisper's encoder works on fixed 30 second windows
+    max_chunk_seconds = 30
+
+    def __init__(self, model_name=None, batch_size=None, language=None):
+        self.model_name = model_name or os.getenv("LOCAL_WHISPER_MODEL", "base")
+        self.batch_size = batch_size or int(os.getenv("LOCAL_WHISPER_BATCH_SIZE", "8"))
+        # Unset lets Whisper detect the language of each window
+        self.language = language or os.getenv("LOCAL_WHISPER_LANGUAGE") or None
+        # Decoding holds the model; serialize batches rather than thrash the CPU
+        self._decode_lock = threading.Lock()
+
+    @property
+    def model_id(self):
+        return f"local-whisper-{self.model_name}"
+
+    def transcribe_file(self, audio_file_path):
+        """Transcribe a whole file by splitting it into 30 second windows."""
+        results = self.transcribe_segments(split_audio(audio_file_path, self.max_chunk_seconds))
+        return " ".join(text for text, _ in results if text)
+
+    def transcribe_segments(self, chunks, max_workers=None, on_chunk=None):
+        """
+        Transcribe (offset_seconds, AudioSegment) chunks in batches through the
+        resident model. Chunks longer than 30 seconds are truncated by Whisper.
+
+        Args:
+            on_chunk (callable, optional): Called as on_chunk(text, segments)
+                for each chunk, in order, as its batch finishes
+
+        Returns:
+            list: (text, segments) per chunk, in input order
+        """
+        import numpy as np
+        import torch
+        import whisper
+
+        model = load_local_whisper_model(self.model_name)
+        options = whisper.DecodingOptions(language=self.language, without_timestamps=True, fp16=False)
+        results = []
+        for i in range(0, len(chunks), self.batch_size):
+            batch = chunks[i:i + self.batch_size]
+            mels = []
+            for _, segment in batch:
+                segment = segment.set_frame_rate(whisper.audio.SAMPLE_RATE).set_channels(1).set_sample_width(2)
+                samples = np.array(segment.get_array_of_samples(), dtype=np.float32) / 32768.0
+                audio = whisper.pad_or_trim(torch.from_numpy(samples))
+                mels.append(whisper.log_mel_spectrogram(audio, n_mels=model.dims.n_mels))
+            with self._decode_lock, torch.inference_mode(), span("whisper.local_batch", size=len(batch)):
+                decoded = whisper.decode(model, torch.stack(mels).to(model.device), options)
+            for (offset, segment), result in zip(batch, decoded):
+                text = result.text.strip()
+                results.append((text, [{
+                    "start": offset,
+                    "end": offset + len(segment) / 1000.0,
+                    "text": text
+                }]))
+                if on_chunk:
+                    on_chunk(*results[-1])
+        return results
+
+
+TRANSCRIPTION_BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    LocalWhisperBackend.name: LocalWhisperBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_transcription_backend(name=None):
+    """
+    Return the shared transcription backend selected by name or by the
+    TRANSCRIPTION_BACKEND environment variable ("openai" or "local").
+    """
+    name = name or os.getenv("TRANSCRIPTION_BACKEND", OpenAIWhisperBackend.name)
+    if name not in TRANSCRIPTION_BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = TRANSCRIPTION_BACKENDS[name]()
+        return _backends[name]
+
+
+def transcribe_audio_chunked(audio_file_path, max_chunk_seconds=None, max_workers=None, backend=None, on_chunk=None,
+                             start_offset=0.0):
     """
-    Transcribe audio file using OpenAI's Whisper API (OpenAI Python 1.x+).
-    
+    Transcribe a long recording by splitting it on silence and transcribing
+    the chunks concurrently (API backend) or in batches (local backend).
+
+    Args:
+        audio_file_path (str): Path to the audio file
+        max_chunk_seconds (float, optional): Upper bound on chunk length
+        max_workers (int, optional): Number of concurrent API calls
+        backend (optional): Transcription backend; defaults to the configured one
+        on_chunk (callable, optional): Called as on_chunk(text, segments) for
+            each chunk, in order, as soon as it is transcribed
+        start_offset (float): Where the file starts in the original
+            recording, e.g. the silence preprocessing trimmed off the front
+
+    Returns:
+        dict: {"text": str, "segments": list} with segment times relative to
+            the start of the whole recording
+    """
+    try:
+        backend = backend or get_transcription_backend()
+        max_chunk_seconds = min(max_chunk_seconds or backend.max_chunk_seconds, backend.max_chunk_seconds)
+        chunks = [(offset + start_offset, segment) for offset, segment in split_audio(audio_file_path, max_chunk_seconds)]
+        results = backend.transcribe_segments(chunks, max_workers=max_workers, on_chunk=on_chunk)
+
+        text = " ".join(chunk_text for chunk_text, _ in results if chunk_text)
+        segments = [segment for _, chunk_segments in results for segment in chunk_segments]
+        return {"text": text, "segments": segments}
+
+    except Exception as e:
+        raise Exception(f"Chunked transcription failed: {str(e)}")
+
+
+def transcribe_audio(audio_file_path, cache=None, chunked=None, backend=None, preprocess=None, on_chunk=None):
+    """
+    Transcribe audio file using the configured Whisper backend: OpenAI's
+    hosted API by default, or a local CPU model with TRANSCRIPTION_BACKEND=local.
+
+    Transcripts are cached by a hash of the audio bytes and model name, so a
+    repeat upload of the same recording skips the transcription entirely.
+
     Args:
         audio_file_path (str): Path to the audio file
-        
+        cache (TranscriptionCache, optional): Cache to use instead of the
+            process-wide one
+        chunked (bool, optional): Force chunked mode on or off. By default it
+            is used when TRANSCRIBE_CHUNKED=1 or the file exceeds the upload limit
+        backend (optional): Transcription backend; defaults to the configured one
+        preprocess (bool, optional): Re-encode to compact mono audio before
+            upload. Defaults to on for the API backend unless TRANSCRIBE_PREPROCESS=0
+        on_chunk (callable, optional): Stream the transcript: called as
+            on_chunk(text, segments) for each piece, in order, as it is
+            transcribed. Turns on chunked mode with short chunks unless
+            chunked=False, in which case the whole text arrives at once
+
     Returns:
         str: Transcribed text
     """
+    report = None
     try:
-        # Initialize OpenAI client
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        # Open the audio file
-        with open(audio_file_path, "rb") as audio_file:
-            # Create transcription
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file
-            )
-        return transcript.text
-        
+        with span("transcribe") as s:
+            backend = backend or get_transcription_backend()
+            s.set(backend=backend.name, model=backend.model_id, bytes=os.path.getsize(audio_file_path))
+            cache = cache if cache is not None else get_transcription_cache()
+            cache_key = None
+            if cache is not None:
+                # Keyed on the original upload so hits skip preprocessing too
+                cache_key = hash_audio_file(audio_file_path, backend.model_id)
+                cached = cache.get(cache_key)
+                s.set(cache_hit=cached is not None)
+                if cached is not None:
+                    if on_chunk:
+                        on_chunk(cached, [])
+                    return cached
+
+            if preprocess is None:
+                preprocess = backend.wants_preprocessing and os.getenv("TRANSCRIBE_PREPROCESS", "1") != "0"
+            source_path = audio_file_path
+            if preprocess:
+                with span("preprocess") as p:
+                    report = preprocess_audio(audio_file_path)
+                    p.set(bytes_saved=report["bytes_saved"], upload_seconds_saved=report["upload_seconds_saved"])
+                source_path = report["path"]
+
+            if chunked is None:
+                chunked = (
+                    on_chunk is not None
+                    or os.getenv("TRANSCRIBE_CHUNKED", "0") == "1"
+                    or os.path.getsize(source_path) > MAX_UPLOAD_BYTES
+                )
+            s.set(chunked=chunked, streamed=on_chunk is not None)
+
+            if chunked:
+                text = transcribe_audio_chunked(
+                    source_path,
+                    max_chunk_seconds=STREAM_CHUNK_SECONDS if on_chunk else None,
+                    backend=backend,
+                    on_chunk=on_chunk,
+                    start_offset=report["trim_start_seconds"] if source_path != audio_file_path else 0.0
+                )["text"]
+            else:
+                text = backend.transcribe_file(source_path)
+                if on_chunk:
+                    on_chunk(text, [])
+
+            if cache is not None:
+                cache.set(cache_key, text)
+            return text
+
     except Exception as e:
-        raise Exception(f"Transcription failed: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Transcription failed: {str(e)}")
+    finally:
+        if report and report["is_temporary"]:
+            os.unlink(report["path"])
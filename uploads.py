@@ -0,0 +1,90 @@
+"""
+Spool uploaded recordings to temporary files in bounded chunks, so memory
+use does not grow with the size of the upload. Shared by the Streamlit app
+and the HTTP job service.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "200")) * 1024 * 1024)
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the size cap."""
+
+    def __init__(self, max_bytes):
+        super().__init__(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+        self.max_bytes = max_bytes
+
+
+def remove_file(path):
+    """Delete path if it still exists."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def save_upload(stream, suffix=".mp3", length=None, max_bytes=None):
+    """
+    Copy an upload from stream into a new temporary file, one chunk at a time.
+
+    Args:
+        stream: Binary file-like object, read from its current position
+        suffix (str): Temporary file suffix, e.g. ".mp3"
+        length (int, optional): Exact number of bytes to read, e.g. the
+            Content-Length of a request; otherwise the stream is read to EOF
+        max_bytes (int, optional): Size cap; defaults to MAX_UPLOAD_BYTES
+
+    Returns:
+        str: Path of the temporary file; the caller deletes it
+
+    Raises:
+        UploadTooLarge: The upload is bigger than max_bytes
+        ConnectionError: The stream ended before length bytes were read
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    if length is not None and length > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            written = 0
+            while length is None or written < length:
+                size = UPLOAD_CHUNK_SIZE if length is None else min(UPLOAD_CHUNK_SIZE, length - written)
+                chunk = stream.read(size)
+                if not chunk:
+                    if length is not None:
+                        raise ConnectionError("Upload ended early")
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                tmp_file.write(chunk)
+    except BaseException:
+        remove_file(path)
+        raise
+    return path
+
+
+@contextmanager
+def temporary_upload(stream, suffix=".mp3", length=None, max_bytes=None):
+    """
+    save_upload() as a context manager that deletes the file on exit, even
+    when processing raises.
+
+    Usage:
+        with temporary_upload(uploaded_file) as audio_file_path:
+            transcribe_audio(audio_file_path)
+    """
+    path = save_upload(stream, suffix, length, max_bytes)
+    try:
+        yield path
+    finally:
+        remove_file(path)